@@ -1,11 +1,13 @@
 import dataclasses
 import datetime
-from typing import Tuple, Type, Optional, Set
+import functools
+import hashlib
+from typing import Tuple, Type, Optional, Set, Any, Dict, FrozenSet, get_origin, get_args
 import inspect
 
-from meda.dataclass.feature import Feature
+from meda.dataclass.feature import Feature, TypeInfo, TypeCategory
 from meda.dataclass.reflection import get_nested_type, is_mapping_str_to_any, is_tuple, has_nested_type, \
-    is_optional, get_type
+    is_optional, get_type, is_frozen_set
 
 
 # todo: implement an annotation checker for dataclasses on init instance. Otherwise we can get some strange behavior.
@@ -14,7 +16,206 @@ from meda.dataclass.reflection import get_nested_type, is_mapping_str_to_any, is
 
 class ExternMixin:
     """ A Mixin to indicate, that this class is initialized by a transformer"""
-    pass
+    __slots__ = ()
+
+
+_hash_cache = '__meda_hash__'
+""" The slot name of the per instance cached hash value, which is never part of the instance __dict__ """
+
+
+def _cached_hash(field_hash):
+    """ Wraps the dataclass generated __hash__, which recursively hashes all fields, by a per instance cache """
+
+    def __hash__(self) -> int:
+        try:
+            return getattr(self, _hash_cache)
+        except AttributeError:
+            value = field_hash(self)
+            object.__setattr__(self, _hash_cache, value)
+            return value
+
+    return __hash__
+
+
+def _dataclass_getstate(self) -> Dict[str, Any]:
+    """
+    pickle support for frozen dataclasses with and without __slots__.
+    Only the field values are pickled by name, since the cached hash is only valid within a process. The names keep
+    pickles valid when fields are reordered or added with a default.
+    """
+    return {field.name: getattr(self, field.name) for field in dataclasses.fields(self)}
+
+
+def _dataclass_setstate(self, state: Any):
+    """
+    Accepts the field values by name of _dataclass_getstate and the state of the default pickle protocol, i.e. the
+    instance __dict__ or a (__dict__, slots) tuple, as well as the positional field values of older compact classes.
+    """
+    fields = dataclasses.fields(self)
+    if isinstance(state, tuple) and len(state) == 2 and (state[0] is None or isinstance(state[0], dict)) \
+            and isinstance(state[1], dict) and set(state[1].keys()) <= {f.name for f in fields} | {_hash_cache}:
+        state = {**(state[0] or {}), **state[1]}
+    if not isinstance(state, dict):
+        if len(state) != len(fields):
+            raise ValueError(f"Error: the pickled state of {type(self).__name__} holds {len(state)} values "
+                             + f"for {len(fields)} fields")
+        state = {field.name: value for field, value in zip(fields, state)}
+
+    # only the fields are restored, a hash cached by another process is invalid since string hashes are salted
+    for field in fields:
+        if field.name in state:
+            value = state[field.name]
+        elif field.default is not dataclasses.MISSING:
+            value = field.default
+        else:
+            raise ValueError(f"Error: the pickled state of {type(self).__name__} lacks the field {field.name}")
+        object.__setattr__(self, field.name, value)
+
+
+def _inherited_slots(mro: Any) -> Set[str]:
+    return {slot for base in mro for slot in base.__dict__.get('__slots__', ())}
+
+
+def _slotted_class(cls: 'FeatureDataclassMeta') -> 'FeatureDataclassMeta':
+    """
+    Creates a twin of the already initialized dataclass cls, which stores its fields in __slots__ instead of a
+    per-instance __dict__. The field defaults are part of the dataclass __init__ and can be dropped from the class.
+    """
+    field_names = [field.name for field in dataclasses.fields(cls)]
+    inherited_slots = _inherited_slots(cls.__mro__[1:])
+
+    cls_dict = dict(cls.__dict__)
+    for name in field_names + [_hash_cache]:
+        cls_dict.pop(name, None)
+    cls_dict.pop('__dict__', None)
+    cls_dict.pop('__weakref__', None)
+    cls_dict['__slots__'] = tuple(name for name in field_names + [_hash_cache] if name not in inherited_slots)
+    cls_dict['__qualname__'] = cls.__qualname__
+    cls_dict['__compact__'] = True
+
+    # type.__new__ is used to bypass the metaclass __init__, since the class set up is already done
+    return type.__new__(type(cls), cls.__name__, cls.__bases__, cls_dict)
+
+
+def _stable_repr(value: Any) -> str:
+    """
+    A repr which does not depend on the process, e.g. on the hash seed determining the order of sets or on memory
+    addresses. Callables are represented by their qualified name only, their code is not part of the repr.
+    """
+    if value is dataclasses.MISSING:
+        return 'MISSING'
+    elif isinstance(value, (set, frozenset)):
+        return '{' + ', '.join(sorted(_stable_repr(v) for v in value)) + '}'
+    elif isinstance(value, tuple):
+        return '(' + ', '.join(_stable_repr(v) for v in value) + ')'
+    elif isinstance(value, dict):
+        return '{' + ', '.join(sorted(f"{_stable_repr(k)}: {_stable_repr(v)}" for k, v in value.items())) + '}'
+    elif isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    elif isinstance(value, functools.partial):
+        return f"partial({_stable_repr(value.func)}, {_stable_repr(value.args)}, {_stable_repr(value.keywords)})"
+    elif callable(value) and hasattr(value, '__qualname__'):
+        return f"{getattr(value, '__module__', None)}.{value.__qualname__}"
+    elif callable(value) or type(value).__repr__ is object.__repr__:
+        # the default repr holds the memory address
+        return _stable_repr(type(value))
+    return repr(value)
+
+
+def _type_token(t: Any) -> str:
+    """ The fingerprint token of an annotation. Nested dataclasses are represented by their name and fingerprint. """
+    if isinstance(t, FeatureDataclassMeta):
+        return f"{t.__name__}:{t.schema_fingerprint}"
+    elif get_origin(t) is not None:
+        origin = get_origin(t)
+        origin_name = getattr(origin, '__qualname__', None) or repr(origin)
+        return f"{origin_name}[{', '.join(_type_token(arg) for arg in get_args(t))}]"
+    elif isinstance(t, type):
+        return f"{t.__module__}.{t.__qualname__}"
+    return repr(t)
+
+
+def _schema_fingerprint(cls: 'FeatureDataclassMeta') -> str:
+    """
+    A sha256 digest over the class name and the declared data of all features, which is stable across processes and
+    Python versions. Transformer bodies are not part of it, see Feature.transformer_key.
+    """
+    tokens = [cls.__name__, ','.join(base.__name__ for base in cls.__mro__[1:] if base.__module__ == __name__)]
+    for field in cls.features:
+        tokens.append('|'.join([field.name,
+                                _type_token(field.type),
+                                _stable_repr(field.unique_index),
+                                _stable_repr(field.comment),
+                                _stable_repr(field.transformer),
+                                _stable_repr(field.transformer_key),
+                                _stable_repr(field.batch_transformer),
+                                _stable_repr(field.is_ident_field),
+                                _stable_repr(field.is_series_ident_field),
+                                _stable_repr(field.is_error_field),
+                                _stable_repr(field.temporary),
+                                _stable_repr(field.input_key),
+                                _stable_repr(field.depends_on),
+                                _stable_repr(field.code_map),
+                                _stable_repr(field.lookup_table),
+                                _stable_repr(field.null_defaults),
+                                _stable_repr(field.default)]))
+    return hashlib.sha256('\n'.join(tokens).encode('utf-8')).hexdigest()
+
+
+def _generation_order(cls: 'FeatureDataclassMeta') -> Tuple[Feature, ...]:
+    """ The features in declaration order, except that derived features follow the features they depend on """
+    order: Dict[str, Feature] = {}
+    visiting: Set[str] = set()
+
+    def visit(field: Feature):
+        if field.name in order:
+            return
+        elif field.name in visiting:
+            raise ValueError(f"Error: cyclic depends_on for field {field.name} in dataclass {cls.__name__}")
+        visiting.add(field.name)
+        for name in field.depends_on:
+            if name not in cls.features_by_name:
+                raise KeyError(f"Error: field {field.name} of dataclass {cls.__name__} depends on unknown field {name}")
+            visit(cls.features_by_name[name])
+        visiting.remove(field.name)
+        order[field.name] = field
+
+    for feature in cls.features:
+        visit(feature)
+    return tuple(order.values())
+
+
+def resolve_type_info(t: Type) -> TypeInfo:
+    """
+    Resolves the field annotation t, see TypeInfo.
+    Note: The dataclass base classes are defined below, but only referenced for dataclass annotations.
+    """
+    base_type = get_type(t)
+    container = frozenset if is_frozen_set(t) else (tuple if is_tuple(t) else None)
+
+    if is_mapping_str_to_any(base_type):
+        category = TypeCategory.JSON
+    elif any(base_type is data_type for data_type in FeatureDataclassMeta.base_data_types):
+        # compared by identity, since annotations might be unhashable, e.g. Literal[[1]]
+        category = TypeCategory.BASE
+    elif not isinstance(base_type, FeatureDataclassMeta):
+        category = TypeCategory.OTHER
+    elif issubclass(base_type, SeriesDataclassIdent):
+        category = TypeCategory.SERIES_IDENT
+    elif issubclass(base_type, SeriesUniqueCommonFeatureDataclass):
+        category = TypeCategory.SERIES_UNIQUE_COMMON
+    elif issubclass(base_type, UniqueCommonFeatureDataclass):
+        category = TypeCategory.UNIQUE_COMMON
+    elif issubclass(base_type, HeadSeriesFeatureDataclass):
+        category = TypeCategory.HEAD_SERIES
+    elif issubclass(base_type, NestSeriesFeatureDataclass):
+        category = TypeCategory.NEST_SERIES
+    elif issubclass(base_type, FeatureDataclass):
+        category = TypeCategory.FEATURE_DATACLASS
+    else:
+        category = TypeCategory.DATACLASS
+
+    return TypeInfo(base_type=base_type, optional=is_optional(t), container=container, category=category)
 
 
 class FeatureDataclassMeta(type):
@@ -23,13 +224,47 @@ class FeatureDataclassMeta(type):
     This metaclass provides hashing and comparing functionality for dataclasses with fields and features (fields with
     units.
 
-    It may be used to cross-version type comparison of FeatureDataclass classes.
+    It may be used to cross-version type comparison of FeatureDataclass classes. Therefore, each class carries a
+    schema_fingerprint, a sha256 hex digest over its name and features computed once on class creation. It is stable
+    across processes and used for hashing and comparing the classes.
+
+    The generation_order of a class lists its features such that derived features (see Feature.depends_on) follow
+    the features they depend on. Cyclic or unknown dependencies raise on class creation.
+
+    Compact mode:
+    A class created with the class keyword compact=True, e.g.
+    >>> class Record(FeatureDataclass, compact=True):
+    >>>     value: float = Feature(input_key='value')
+    stores its fields in __slots__ and its instances do not carry a per-instance __dict__. The frozen semantics,
+    equality, hashing and pickling are kept. Subclasses of compact classes are compact by default. Note that all
+    dataclasses in the class hierarchy should be compact, otherwise the instances still carry a __dict__.
     """
     base_data_types = {int, float, str, bytes, bool, datetime.date, datetime.datetime, datetime.timedelta}
 
-    def __init__(cls, *args, **kwargs):
+    def __new__(mcs, name, bases, namespace, compact: Optional[bool] = None, **kwargs):
+        if '__slots__' not in namespace:
+            # the cached hash is kept in a slot instead of the instance __dict__, see _cached_hash
+            mro = [klass for base in bases for klass in base.__mro__]
+            slots = [slot for slot, provided in [(_hash_cache, _hash_cache in _inherited_slots(mro)),
+                                                 ('__dict__', any('__dict__' in k.__dict__ for k in mro)),
+                                                 ('__weakref__', any('__weakref__' in k.__dict__ for k in mro))]
+                     if not provided]
+            namespace = {**namespace, '__slots__': tuple(slots)}
+        cls = super().__new__(mcs, name, bases, namespace, **kwargs)
+        if compact is None:
+            compact = any(getattr(base, '__compact__', False) for base in bases)
+        if compact:
+            # set up the plain class and replace it by its slotted twin
+            mcs.__init__(cls, name, bases, namespace, **kwargs)
+            cls = _slotted_class(cls)
+        return cls
+
+    def __init__(cls, *args, compact: Optional[bool] = None, **kwargs):
         # todo: implement test cases for all raises
         super().__init__(*args, **kwargs)
+        if cls.__dict__.get('__compact__', False):
+            # the slotted twin of a compact class is already set up by __new__
+            return
 
         annotations = args[2].get("__annotations__", {})
 
@@ -63,75 +298,95 @@ class FeatureDataclassMeta(type):
             else:
                 raise TypeError(f"Error: The field {name} is not a feature or a FeatureDataclass")
 
+        class_hash = cls.__dict__.get('__hash__', None)
+        explicit_hash = class_hash is not None or ('__hash__' in cls.__dict__ and '__eq__' not in cls.__dict__)
         dataclasses.dataclass(cls, frozen=True)
         cls.features: Tuple[Feature] = dataclasses.fields(cls)
+        cls.features_by_name: Dict[str, Feature] = {field.name: field for field in cls.features}
+        for field in cls.features:
+            field.type_info = resolve_type_info(field.type)
+
+        # frozen instances never change their hash, hence it is computed once per instance
+        if not explicit_hash and cls.__dict__.get('__hash__') is not None:
+            cls.__hash__ = _cached_hash(cls.__dict__['__hash__'])
+        for name, method in (('__getstate__', _dataclass_getstate), ('__setstate__', _dataclass_setstate)):
+            if not any(name in base.__dict__ for base in cls.__mro__[:-1]):
+                setattr(cls, name, method)
 
         # A loop to validate all features
         for field in cls.features:
             # get the value type
-            value_type = get_nested_type(field.type) if has_nested_type(field.type) else field.type
+            type_info = field.type_info
+            value_type = type_info.base_type
 
             # skip temporary, json, feature_dataclass fields and raise if tuple
             if (field.temporary
-                    or is_mapping_str_to_any(value_type)
-                    or isinstance(value_type, FeatureDataclassMeta)):
+                    or type_info.category is TypeCategory.JSON
+                    or type_info.is_dataclass):
                 continue
             elif field.is_error_field:
-                field_type = get_type(field.type)
-                if field_type is str and is_optional(field.type):
+                if value_type is str and type_info.optional:
                     continue
                 else:
                     raise TypeError(f"The type of the series ident field {field} is not a str or not optional.")
             elif field.is_ident_field:
-                field_type = get_type(field.type)
-                if (field_type is str) or (field_type is int):
+                if (value_type is str) or (value_type is int):
                     continue
                 else:
                     raise TypeError(f"The type of the ident field {field} is neither a str nor int.")
             elif field.is_series_ident_field:
-                field_type = get_type(field.type)
-                if (field_type is str) or (field_type is int):
+                if (value_type is str) or (value_type is int):
                     continue
                 else:
                     raise TypeError(f"The type of the series ident field {field} is neither a str nor int.")
-            elif is_tuple(field.type):
+            elif type_info.container is tuple:
                 raise TypeError(f"The field {field} is a tuple field. Tuple fields are not supported")
 
             # check conditions on feature arguments
-            if (is_optional(field.type) and not any([isinstance(value_type, FeatureDataclassMeta),
-                                                     issubclass(cls, ExternMixin),
-                                                     field.transformer is not None,
-                                                     field.null_defaults is not None])):
+            if (type_info.optional and not any([issubclass(cls, ExternMixin),
+                                                field.has_transformer,
+                                                field.null_defaults is not None])):
                 # here we check when the field might be optional
                 raise KeyError(f"Error: field={field.name} of dataclass={cls.__name__} is optional, "
                                + f"but neither a transformer or a null_set is provided ")
-            elif (field.input_key is None) and not any([isinstance(value_type, FeatureDataclassMeta),
-                                                        issubclass(cls, ExternMixin),
+            elif (field.input_key is None) and not any([issubclass(cls, ExternMixin),
+                                                        bool(field.depends_on),
                                                         field.default is not dataclasses.MISSING]):
                 # here we check when the field input_key might be optional
                 raise KeyError(f"Error: input_key missing for field {field.name} in dataclass {cls.__name__}")
 
             # check value type
-            if value_type in cls.base_data_types:
-                pass
-            elif isinstance(value_type, FeatureDataclassMeta):
-                pass
+            if type_info.category is TypeCategory.BASE:
+                if (field.code_map is not None) and not all([isinstance(value, value_type) or
+                                                             (value is None and type_info.optional)
+                                                             for value in field.code_map.values()]):
+                    raise TypeError(f"Error: the code_map of field={field.name} has values not of type={value_type}")
+                if field.intern_strings and value_type is not str:
+                    raise TypeError(f"Error: intern_strings is set for field={field.name} of type={value_type}")
+                if field.lookup_table and value_type is not str:
+                    raise TypeError(f"Error: lookup_table is set for field={field.name} of type={value_type}")
             else:
                 raise TypeError(f"Error: The field={field} of type={value_type} "
                                 + "is neither a supported data type nor a DataclassMeta instance.")
 
+        cls.generation_order: Tuple[Feature, ...] = _generation_order(cls)
+        cls.schema_fingerprint: str = _schema_fingerprint(cls)
+
     def __eq__(cls, other):
-        if hasattr(other, '__name__') and hasattr(other, 'features'):
-            return cls.__name__ == other.__name__ and cls.features == other.features
+        if cls is other:
+            return True
+        elif hasattr(other, 'schema_fingerprint'):
+            return cls.schema_fingerprint == other.schema_fingerprint
         else:
             return False
 
     def __hash__(cls):
-        return hash(cls.__name__) * hash(cls.features)
+        # the hash of the fingerprint string is cached by the str object itself
+        return hash(cls.schema_fingerprint)
 
 
 class FeatureDataclass(metaclass=FeatureDataclassMeta):
-    pass
+    __slots__ = ()
 
 
 class UniqueCommonFeatureDataclass(metaclass=FeatureDataclassMeta):
@@ -143,7 +398,7 @@ class UniqueCommonFeatureDataclass(metaclass=FeatureDataclassMeta):
     - N -> 1 relationship: Other tables may have an foreign-key link to this table
     - all data-fields should full fill an unique constraint
     """
-    pass
+    __slots__ = ()
 
 
 class SeriesDataclassIdent(UniqueCommonFeatureDataclass):
@@ -163,9 +418,19 @@ class SeriesDataclassIdent(UniqueCommonFeatureDataclass):
                     self.series_ident == other.series_ident])
 
 
-def dynamic_series_ident_cls(cls_name: str) -> SeriesDataclassIdent:
-    # we have to include the __eq__ function here. Otherwise it will be 'NotImplemented'
-    return type(cls_name, (SeriesDataclassIdent,), {'__eq__': SeriesDataclassIdent.__eq__})
+_series_ident_classes: Dict[str, Type[SeriesDataclassIdent]] = {}
+""" The dynamic series ident classes by name, shared by the HeadSeriesFeatureDataclassMeta and unpickling """
+
+
+def dynamic_series_ident_cls(cls_name: str) -> Type[SeriesDataclassIdent]:
+    """ The series ident class of cls_name, which is created once per name such that its identity is stable """
+    ident_cls = _series_ident_classes.get(cls_name)
+    if ident_cls is None:
+        # we have to include the __eq__ function here. Otherwise it will be 'NotImplemented'
+        ident_cls = type(cls_name, (SeriesDataclassIdent,), {'__eq__': SeriesDataclassIdent.__eq__})
+        # setdefault keeps the first class, if two threads create it concurrently
+        ident_cls = _series_ident_classes.setdefault(cls_name, ident_cls)
+    return ident_cls
 
 
 def dynamic_series_ident(cls_name: str, ident: str) -> SeriesDataclassIdent:
@@ -181,7 +446,7 @@ class HeadSeriesFeatureDataclassMeta(NestSeriesFeatureDataclassMeta):
     def __init__(cls, *args, **kwargs):
         """dynamically creation of an ident feature class"""
         series_ident_field = 'series_ident'
-        if '__annotations__' in args[2]:
+        if '__annotations__' in args[2] and not cls.__dict__.get('__compact__', False):
             series_ident_cls = dynamic_series_ident_cls(cls_name=cls.__name__ + 'Ident')
             args[2]['__annotations__'].update({series_ident_field: Optional[series_ident_cls]})
             setattr(cls, series_ident_field, None)
@@ -190,29 +455,46 @@ class HeadSeriesFeatureDataclassMeta(NestSeriesFeatureDataclassMeta):
 
 class SeriesUniqueCommonFeatureDataclass(UniqueCommonFeatureDataclass):
     # todo: consider a check on features via metaclass
-    pass
+    __slots__ = ()
 
 
 class NestSeriesFeatureDataclass(metaclass=NestSeriesFeatureDataclassMeta):
     # todo: Metaclass: Check that non-optional features implement the same keys, also subclasses
     # todo: Metaclass: Check that sub_dataclasses are of type SeriesFeatureDataclass
     # todo: this class is a motivation for a none_cascade feature-flag in case of transformation errors
-    pass
+    __slots__ = ()
 
 
 class HeadSeriesFeatureDataclass(metaclass=HeadSeriesFeatureDataclassMeta):
-    pass
+    __slots__ = ()
+
+
+_type_info_cache: Dict[int, Tuple[Any, TypeInfo]] = {}
+""" The resolved annotations by id, each entry pins its annotation such that the id is not reused """
+_type_info_cache_size = 1024
+
+
+def _cached_type_info(t: Type) -> TypeInfo:
+    """
+    The TypeInfo of the annotation t, cached by identity: dataclasses with equal fingerprints compare equal, but
+    resolve to their own base_type, and unhashable annotations are supported.
+    """
+    entry = _type_info_cache.get(id(t))
+    if entry is None or entry[0] is not t:
+        if len(_type_info_cache) >= _type_info_cache_size:
+            _type_info_cache.clear()
+        entry = _type_info_cache[id(t)] = (t, resolve_type_info(t))
+    return entry[1]
 
 
 def get_feature(cls: FeatureDataclassMeta, name: str) -> Feature:
     """
     This free function can be used to determine the unit of a feature.
     """
-    for f in cls.features:
-        if f.name == name:
-            return f
-    else:
-        raise KeyError(f"Dataclass {cls} does not have the feature {Feature}.")
+    try:
+        return cls.features_by_name[name]
+    except KeyError:
+        raise KeyError(f"Dataclass {cls} does not have the feature {name}.")
 
 
 def get_nested_keys(cls: NestSeriesFeatureDataclassMeta) -> Set[str]:
@@ -232,12 +514,56 @@ def get_nested_keys(cls: NestSeriesFeatureDataclassMeta) -> Set[str]:
     return keys
 
 
+def required_input_keys(cls: FeatureDataclassMeta, series_dataclass_key: Optional[str] = None) -> FrozenSet[str]:
+    """
+    All data_dict keys read by the FeatureDataclassFactory to generate cls, i.e. the input columns a reader has to
+    provide. The whole tree is walked: plain and transformer input keys, series input key mappings and nested
+    dataclasses of all series keys.
+    """
+    keys: Set[str] = set()
+    if is_series_dataclass_ident(cls):
+        return frozenset(keys)
+    is_series = issubclass(cls, (HeadSeriesFeatureDataclass, NestSeriesFeatureDataclass,
+                                 SeriesUniqueCommonFeatureDataclass))
+    for field in cls.features:
+        type_info = field.type_info
+        if field.temporary or field.is_error_field or field.is_series_ident_field or field.depends_on:
+            continue
+        elif field.is_ident_field:
+            keys.add(field.input_key)
+        elif field.has_transformer:
+            keys.update(dict(field.input_key)[series_dataclass_key] if is_series else field.input_key)
+        elif (type_info.is_unique_common
+              or (type_info.category is TypeCategory.FEATURE_DATACLASS)
+              or ((type_info.category is TypeCategory.NEST_SERIES) and is_series)):
+            keys.update(required_input_keys(type_info.base_type, series_dataclass_key))
+        elif not is_series and type_info.is_series:
+            for key in get_nested_keys(type_info.base_type):
+                keys.update(required_input_keys(type_info.base_type, key))
+        elif field.input_key is None:
+            continue
+        elif is_series:
+            if series_dataclass_key in dict(field.input_key):
+                keys.add(dict(field.input_key)[series_dataclass_key])
+        else:
+            keys.add(field.input_key)
+    return frozenset(keys)
+
+
+def ident_input_key(cls: FeatureDataclassMeta) -> str:
+    """ The input key of the is_ident_field of cls, i.e. the data key to group or join sources by """
+    input_keys = [field.input_key for field in cls.features if field.is_ident_field]
+    if len(input_keys) != 1:
+        raise ValueError(f"Error: {cls.__name__} should have a single is_ident_field, but has {len(input_keys)}")
+    return input_keys[0]
+
+
 def is_feature_dataclass_meta(t: Type) -> bool:
-    return isinstance(get_nested_type(t) if has_nested_type(t) else t, FeatureDataclassMeta)
+    return _cached_type_info(t).is_dataclass
 
 
 def is_series_dataclass(t: Type) -> bool:
-    return isinstance(get_nested_type(t) if has_nested_type(t) else t, NestSeriesFeatureDataclassMeta)
+    return _cached_type_info(t).is_series
 
 
 def is_nested_dataclass(t: Type, data_class: FeatureDataclassMeta) -> bool:
@@ -248,23 +574,23 @@ def is_nested_dataclass(t: Type, data_class: FeatureDataclassMeta) -> bool:
 
 # todo: remove special cases below and use the more general upper one
 def is_series_dataclass_ident(t: Type) -> bool:
-    return is_nested_dataclass(t, SeriesDataclassIdent)
+    return _cached_type_info(t).category is TypeCategory.SERIES_IDENT
 
 
 def is_nest_series_feature_dataclass(t: Type) -> bool:
-    return is_nested_dataclass(t, NestSeriesFeatureDataclass)
+    return _cached_type_info(t).category is TypeCategory.NEST_SERIES
 
 
 def is_feature_dataclass(t: Type) -> bool:
-    return is_nested_dataclass(t, FeatureDataclass)
+    return _cached_type_info(t).category is TypeCategory.FEATURE_DATACLASS
 
 
 def is_unique_common_feature_dataclass(t: Type) -> bool:
-    return is_nested_dataclass(t, UniqueCommonFeatureDataclass)
+    return _cached_type_info(t).is_unique_common
 
 
 def is_head_series_feature_dataclass(t: Type) -> bool:
-    return is_nested_dataclass(t, HeadSeriesFeatureDataclass)
+    return _cached_type_info(t).category is TypeCategory.HEAD_SERIES
 
 
 def get_nested_dataclass(t: Type, data_class: FeatureDataclassMeta) -> Optional[FeatureDataclassMeta]:
@@ -1,17 +1,325 @@
 from datetime import date, timedelta
 from datetime import datetime
-from typing import Union, Dict, Optional, Any, Tuple
+import sys
+import threading
+from collections.abc import Mapping as AbcMapping
+from typing import Union, Dict, Optional, Any, Tuple, List, Sequence, Mapping, Iterator, AbstractSet, Set
 
 from meda.dataclass.dataclass import FeatureDataclass, FeatureDataclassMeta, UniqueCommonFeatureDataclass, \
-    HeadSeriesFeatureDataclass, \
-    is_nest_series_feature_dataclass, NestSeriesFeatureDataclass, is_series_dataclass_ident, SeriesDataclassIdent, \
-    SeriesUniqueCommonFeatureDataclass, get_nested_keys, is_feature_dataclass_meta, get_nested_dataclass
+    HeadSeriesFeatureDataclass, NestSeriesFeatureDataclass, is_series_dataclass_ident, SeriesDataclassIdent, \
+    SeriesUniqueCommonFeatureDataclass, get_nested_keys, required_input_keys
 from meda.dataclass.defaults import BooleanCases
-from meda.dataclass.feature import Feature
-from meda.dataclass.reflection import is_optional, get_nested_type, has_nested_type
+from meda.dataclass.feature import Feature, TypeCategory
+from meda.dataclass.generation_error import ErrorKind, GenerationError, GenerationErrorNode
+from meda.utils.helper import normalize_numeric
 from meda.utils.regex_date_time import RegexDateTime
 
 
+class _Batch:
+    """
+    The state of a batched generation: the rows of the batch, the index of the row in generation, the evaluated
+    batch_transformer columns and the columns decoded by a FieldDecoder, which are computed on first access for the
+    whole batch.
+    """
+
+    def __init__(self, data_dicts: Sequence[Mapping[str, str]]):
+        self.data_dicts = data_dicts
+        self.index = 0
+        self._results: Dict[Tuple[int, Tuple[str, ...]], Tuple[Feature, List[Any], List[bool]]] = {}
+        self._decoded: Dict[Tuple[int, str], Tuple['FieldDecoder', List[Any], List[bool]]] = {}
+
+    def value(self, field: Feature, data_keys: Tuple[str, ...]) -> Tuple[Any, bool]:
+        """ The value and error flag of field for the current row """
+        key = (id(field), data_keys)
+        if key not in self._results:
+            # the field is kept alive by the result entry, such that its id can not be reused
+            self._results[key] = (field, *self._evaluate(field, data_keys))
+        _, values, errors = self._results[key]
+        return values[self.index], errors[self.index]
+
+    def decoded(self, decoder: 'FieldDecoder', data_key: str) -> Any:
+        """ The decoded value of the data_key column for the current row, _MISSING if the lookup missed """
+        key = (id(decoder), data_key)
+        if key not in self._decoded:
+            # the decoder is kept alive by the entry, such that its id can not be reused
+            self._decoded[key] = (decoder, *decoder.map([data_dict[data_key] for data_dict in self.data_dicts]))
+        _, values, missed = self._decoded[key]
+        return _MISSING if missed[self.index] else values[self.index]
+
+    def _evaluate(self, field: Feature, data_keys: Tuple[str, ...]) -> Tuple[List[Any], List[bool]]:
+        columns = [[data_dict[key] for data_dict in self.data_dicts] for key in data_keys]
+        try:
+            return self._call(field, columns, len(self.data_dicts))
+        except Exception:
+            # the batch failed as a whole, fall back to a per row evaluation
+            values, errors = [], []
+            for index in range(len(self.data_dicts)):
+                try:
+                    row_values, row_errors = self._call(field, [column[index:index + 1] for column in columns], 1)
+                except Exception:
+                    row_values, row_errors = [None], [True]
+                values.append(row_values[0])
+                errors.append(row_errors[0])
+            return values, errors
+
+    @staticmethod
+    def _call(field: Feature, columns: List[List[str]], length: int) -> Tuple[List[Any], List[bool]]:
+        values, errors = field.batch_transformer(*columns)
+        values = values.tolist() if hasattr(values, 'tolist') else list(values)
+        errors = [False] * length if errors is None else [bool(error) for error in errors]
+        if len(values) != length or len(errors) != length:
+            raise ValueError(f"Error: batch_transformer of {field.name} returned {len(values)} values "
+                             + f"and {len(errors)} error flags for {length} rows.")
+        return values, errors
+
+
+_MISSING = object()
+""" The sentinel of a missed FieldDecoder lookup """
+
+_EMPTY = object()
+""" The sentinel of an unassigned field value """
+
+_fall_back_attr = '__meda_fall_back__'
+""" The class attribute holding the fall back instances of a dataclass, see FeatureDataclassFactory """
+
+_FieldResult = Tuple[Any, Optional[Union[GenerationError, GenerationErrorNode, Tuple[GenerationErrorNode, ...]]], bool]
+""" The value or its fall back, the error and the cascade flag of a generated field """
+
+
+class FieldDecoder:
+    """
+    The compiled decoding of input strings of a single field: one dict from input string to the final value, which
+    covers the null_defaults, the boolean cases (null cases only for optional fields) and the code_map of the field.
+    Boolean and code_map fields are strict, i.e. a missed lookup is an error of error_kind, while the input strings
+    of other fields are converted by their type.
+
+    For interned str fields the table doubles as dictionary encoding: missed strings are learned as entries mapping to
+    themselves, such that equal values share one object. Learning stops after string_limit distinct strings. The
+    decoder is shared by all generation calls of a factory, hence learning is guarded by a lock.
+    """
+    __slots__ = ('table', 'error_kind', 'string_limit', '_learned', '_lock')
+
+    def __init__(self, field: Feature, boolean_cases: BooleanCases, string_limit: Optional[int] = None):
+        type_info = field.type_info
+        table: Dict[str, Any] = {}
+        if type_info.base_type is bool:
+            table.update({string: True for string in boolean_cases.true})
+            table.update({string: False for string in boolean_cases.false})
+            if type_info.optional:
+                table.update({string: None for string in boolean_cases.null})
+        if field.code_map is not None:
+            table.update(field.code_map)
+        if field.null_defaults is not None:
+            table.update({string: None for string in field.null_defaults})
+        self.table = table
+
+        self.error_kind: Optional[ErrorKind] = None
+        if type_info.base_type is bool:
+            self.error_kind = ErrorKind.UNKNOWN_BOOLEAN
+        elif field.code_map is not None:
+            self.error_kind = ErrorKind.UNKNOWN_CODE
+
+        self.string_limit: Optional[int] = None
+        """ The maximal number of learned strings, None if the field is not interned """
+        if (type_info.base_type is str) and (self.error_kind is None) and (field.intern_strings is not False):
+            self.string_limit = string_limit if field.intern_strings is None else sys.maxsize
+        self._learned = 0
+        self._lock = threading.Lock()
+
+    def learn(self, string: str) -> str:
+        """ Returns the shared object equal to string, or string itself if the field is not or no longer interned """
+        if self.string_limit is None:
+            return string
+        with self._lock:
+            # the limit is read again under the lock, another thread might have stopped learning meanwhile
+            string_limit = self.string_limit
+            if string_limit is None:
+                return string
+            elif self._learned >= string_limit:
+                # the vocabulary is too large, further strings are not interned
+                self.string_limit = None
+                return string
+            self._learned += 1
+            return self.table.setdefault(string, string)
+
+    def map(self, column: Sequence[str]) -> Tuple[List[Any], List[bool]]:
+        """ Decodes a whole column, returns the values and a mask of missed lookups, which hold None values """
+        get = self.table.get
+        values = [get(string, _MISSING) for string in column]
+        missed = [value is _MISSING for value in values]
+        return [None if miss else value for value, miss in zip(values, missed)], missed
+
+
+class _GenerationContext:
+    """
+    The state of a single generation call: the errors of the generated dataclasses and the optional batch.
+    It is passed through the recursion, such that a factory can be shared across threads and calls may nest.
+    """
+    __slots__ = ('errors', 'batch')
+
+    def __init__(self, batch: Optional[_Batch] = None):
+        self.errors: Dict[Tuple[str, Optional[str]], GenerationErrorNode] = {}
+        self.batch = batch
+
+
+class _ProjectionMemo:
+    """
+    The generated instances and error nodes of a UniqueCommonFeatureDataclass subtree by the tuple of its raw input
+    values. The subtree is a function of the projected values only, such that a repeated tuple reuses the result.
+    New tuples are only stored up to limit entries.
+    """
+    __slots__ = ('feature_dataclass', 'getter', 'limit', 'entries')
+
+    def __init__(self, feature_dataclass: FeatureDataclassMeta, series_dataclass_key: Optional[str], limit: int):
+        keys = sorted(required_input_keys(feature_dataclass, series_dataclass_key))
+        self.feature_dataclass = feature_dataclass
+        """ the dataclass is kept to pin its id """
+        self.getter = lambda data_dict: tuple([data_dict[key] for key in keys])
+        self.limit = limit
+        self.entries: Dict[Tuple[str, ...], Tuple[Optional[UniqueCommonFeatureDataclass],
+                                                  Optional[GenerationErrorNode]]] = {}
+
+
+class _RowView(AbcMapping):
+    """ A read only data_dict view on a positional row, indexed by the precomputed positions of its keys """
+    __slots__ = ('_positions', '_row')
+
+    def __init__(self, positions: Dict[str, int], row: Sequence[str]):
+        self._positions = positions
+        self._row = row
+
+    def __getitem__(self, key: str) -> str:
+        return self._row[self._positions[key]]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._positions)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+
+class BoundGenerator:
+    """
+    The generator of a feature_dataclass bound to the header of a source, see FeatureDataclassFactory.bind.
+    Rows are plain sequences of strings ordered like the header, such that no data_dict is allocated per row.
+    """
+
+    def __init__(self,
+                 factory: 'FeatureDataclassFactory',
+                 feature_dataclass: FeatureDataclassMeta,
+                 header: Sequence[str],
+                 series_dataclass_key: Optional[str] = None):
+        factory._validate_series_dataclass_key(feature_dataclass, series_dataclass_key)
+        keys = required_input_keys(feature_dataclass, series_dataclass_key)
+        positions: Dict[str, int] = {}
+        for position, column in enumerate(header):
+            if column in keys and column in positions:
+                raise ValueError(f"Error: the input key {column} is not unique in the header")
+            positions[column] = position
+        missing = sorted(keys - positions.keys())
+        if len(missing) > 0:
+            raise KeyError(f"Error: input keys {missing} of {feature_dataclass.__name__} are missing in the header")
+
+        self._factory = factory
+        self._feature_dataclass = feature_dataclass
+        self._series_dataclass_key = series_dataclass_key
+        self._positions = {key: positions[key] for key in keys}
+        self._width = len(header)
+
+    def _view(self, row: Sequence[str]) -> _RowView:
+        if len(row) != self._width:
+            raise ValueError(f"Error: the row has {len(row)} columns, but the header has {self._width}")
+        return _RowView(self._positions, row)
+
+    def generator(self, row: Sequence[str], render_errors: bool = True) \
+            -> Tuple[Optional[Union[FeatureDataclass, UniqueCommonFeatureDataclass]],
+                     Optional[Union[str, GenerationErrorNode]]]:
+        """ See FeatureDataclassFactory.generator """
+        return self._factory._generate(self._feature_dataclass, self._view(row), self._series_dataclass_key,
+                                       render_errors=render_errors)
+
+    def lazy(self, row: Sequence[str]) -> 'LazyRecord':
+        """ See FeatureDataclassFactory.lazy """
+        return LazyRecord(self._factory, self._feature_dataclass, self._view(row), self._series_dataclass_key)
+
+    def batch_generator(self, rows: Sequence[Sequence[str]], render_errors: bool = True) \
+            -> List[Tuple[Optional[Union[FeatureDataclass, UniqueCommonFeatureDataclass]],
+                          Optional[Union[str, GenerationErrorNode]]]]:
+        """ See FeatureDataclassFactory.batch_generator """
+        return self._factory.batch_generator(self._feature_dataclass,
+                                             [self._view(row) for row in rows],
+                                             self._series_dataclass_key,
+                                             render_errors=render_errors)
+
+
+class LazyRecord:
+    """
+    A proxy of a feature_dataclass bound to a raw row, see FeatureDataclassFactory.lazy. A field is generated on first
+    attribute access and cached, i.e. nothing is parsed for fields which are never read. The value of a field equals
+    the value passed to the dataclass by the generator, including the fall back value of a failed field. Derived
+    fields generate their depends_on fields first, while the error field requires the full generation. The full
+    generation by materialize reuses the cached fields and only generates the remaining ones.
+    """
+    __slots__ = ('_factory', '_feature_dataclass', '_data_dict', '_series_dataclass_key', '_is_series_dataclass',
+                 '_fields')
+
+    def __init__(self,
+                 factory: 'FeatureDataclassFactory',
+                 feature_dataclass: FeatureDataclassMeta,
+                 data_dict: Mapping[str, str],
+                 series_dataclass_key: Optional[str] = None):
+        self._factory = factory
+        self._feature_dataclass = feature_dataclass
+        self._data_dict = data_dict
+        self._series_dataclass_key = series_dataclass_key
+        self._is_series_dataclass = issubclass(feature_dataclass, (HeadSeriesFeatureDataclass,
+                                                                   NestSeriesFeatureDataclass,
+                                                                   SeriesUniqueCommonFeatureDataclass))
+        self._fields: Dict[str, _FieldResult] = {}
+        """ The value, error and cascade flag of each generated field, see FeatureDataclassFactory._field_value """
+
+    def __getattr__(self, name: str) -> Any:
+        field = self._feature_dataclass.features_by_name.get(name)
+        if field is None:
+            raise AttributeError(f"Error: {self._feature_dataclass.__name__} has no field {name}")
+        if name not in self._fields:
+            self._fields[name] = self._generate_field(field)
+        return self._fields[name][0]
+
+    def _generate_field(self, field: Feature) -> _FieldResult:
+        if field.is_error_field:
+            return self.materialize(render_errors=True)[1], None, False
+        kwargs = {name: getattr(self, name) for name in field.depends_on}
+        failed = frozenset(name for name in field.depends_on if self._fields[name][1] is not None)
+        decoder = None if field.type_info.is_dataclass else self._factory.decoder(field)
+        return self._factory._field_value(field, decoder, self._data_dict, self._series_dataclass_key,
+                                          self._is_series_dataclass, _GenerationContext(), kwargs, failed)
+
+    def field_error(self, name: str) -> Optional[Union[GenerationError, GenerationErrorNode,
+                                                       Tuple[GenerationErrorNode, ...]]]:
+        """ The error of the field name, which is generated if not accessed before """
+        getattr(self, name)
+        return self._fields[name][1]
+
+    def materialize(self, render_errors: bool = True) \
+            -> Tuple[Optional[Union[FeatureDataclass, UniqueCommonFeatureDataclass]],
+                     Optional[Union[str, GenerationErrorNode]]]:
+        """ The dataclass and errors as returned by FeatureDataclassFactory.generator for the row """
+        context = _GenerationContext()
+        instance = self._factory._build(self._feature_dataclass, self._data_dict, self._series_dataclass_key,
+                                        context, fields=self._fields)
+        errors = self._factory._get_generator_error(context=context,
+                                                    feature_dataclass=self._feature_dataclass,
+                                                    series_dataclass_key=self._series_dataclass_key)
+        if render_errors and errors is not None:
+            return instance, errors.render()
+        return instance, errors
+
+    def __repr__(self) -> str:
+        values = ', '.join(f"{name}={result[0]!r}" for name, result in self._fields.items())
+        return f"LazyRecord({self._feature_dataclass.__name__}, {values})"
+
+
 class FeatureDataclassFactory:
     """
     todo: write a docu
@@ -25,13 +333,46 @@ class FeatureDataclassFactory:
                        datetime: datetime(day=1, month=1, year=2358, hour=13, minute=21),
                        timedelta: timedelta(seconds=1)}
 
+    _fall_back_lock = threading.Lock()
+
     @classmethod
     def _dataclass_fall_back(cls, data_class: FeatureDataclassMeta):
+        """
+        The placeholder instance of data_class, which is built once and shared since it is immutable. The instances
+        are stored by factory class on data_class itself, not inherited by its subclasses, such that they are released
+        together with data_class and never shared by distinct classes of equal schema_fingerprint.
+        """
+        fall_backs = data_class.__dict__.get(_fall_back_attr)
+        instance = None if fall_backs is None else fall_backs.get(cls)
+        if instance is None:
+            instance = cls._build_dataclass_fall_back(data_class)
+            with cls._fall_back_lock:
+                fall_backs = data_class.__dict__.get(_fall_back_attr)
+                if fall_backs is None:
+                    fall_backs = {}
+                    setattr(data_class, _fall_back_attr, fall_backs)
+                instance = fall_backs.setdefault(cls, instance)
+        return instance
+
+    @classmethod
+    def is_fall_back(cls, instance: Any) -> bool:
+        """ True if instance is a fall back placeholder, e.g. such that writers can skip it """
+        fall_backs = type(instance).__dict__.get(_fall_back_attr)
+        return fall_backs is not None and fall_backs.get(cls) is instance
+
+    @classmethod
+    def _build_dataclass_fall_back(cls, data_class: FeatureDataclassMeta):
         kw_args = {}
         for field in data_class.features:
-            if is_feature_dataclass_meta(field.type):
-                kw_args.update({field.name: cls._dataclass_fall_back(get_nested_dataclass(field.type))})
-            elif is_optional(field.type):
+            type_info = field.type_info
+            if field.temporary:
+                kw_args.update({field.name: None})
+            elif type_info.is_dataclass and type_info.container is frozenset:
+                # the generator produces tuples for series fields
+                kw_args.update({field.name: tuple()})
+            elif type_info.is_dataclass:
+                kw_args.update({field.name: cls._dataclass_fall_back(type_info.base_type)})
+            elif type_info.optional:
                 kw_args.update({field.name: None})
             elif field.type in cls.value_fall_back.keys():
                 kw_args.update({field.name: cls.value_fall_back[field.type]})
@@ -39,16 +380,140 @@ class FeatureDataclassFactory:
                 raise ValueError(f'Error: no fall back value for type: {field.type}')
         return data_class(**kw_args)
 
-    def __init__(self, boolean_cases: BooleanCases):
+    def __init__(self,
+                 boolean_cases: BooleanCases,
+                 intern: bool = False,
+                 string_intern_limit: Optional[int] = None,
+                 unique_common_memo_limit: Optional[int] = None):
+        """
+        :param boolean_cases: The strings mapped to True and False for boolean fields.
+        :param intern: If set, generated UniqueCommonFeatureDataclass instances are looked up in an intern table, such
+                       that equal immutable subtrees (e.g. configurations, series idents) share a single instance.
+        :param string_intern_limit: If set, the values of str features with intern_strings=None are interned until more
+                                    than string_intern_limit distinct values are observed for the feature.
+        :param unique_common_memo_limit: If set, generated UniqueCommonFeatureDataclass subtrees are memoized by the
+                                         tuple of their raw input values, for up to unique_common_memo_limit distinct
+                                         tuples per class and series key. Transformers are assumed to be pure.
+        """
         self._boolean_cases = boolean_cases
-        self._generator_errors = {}
+        self._string_intern_limit = string_intern_limit
+        self._intern_lock = threading.Lock()
+        self._decoders: Dict[int, Tuple[Feature, FieldDecoder]] = {}
+        self._decoders_by_class: Dict[int, Tuple[FeatureDataclassMeta, Tuple[Optional[FieldDecoder], ...]]] = {}
+        self._intern_table: Optional[Dict[UniqueCommonFeatureDataclass, UniqueCommonFeatureDataclass]] = \
+            {} if intern else None
+        self._unique_common_memo_limit = unique_common_memo_limit
+        self._memos: Dict[Tuple[int, Optional[str]], _ProjectionMemo] = {}
+
+    def clear_intern_table(self):
+        """ Releases all interned instances """
+        if self._intern_table is not None:
+            with self._intern_lock:
+                self._intern_table.clear()
+
+    def decoder(self, field: Feature) -> FieldDecoder:
+        """ The FieldDecoder of field, compiled once per factory """
+        entry = self._decoders.get(id(field))
+        if entry is None:
+            # the field is kept alive by the entry, such that its id can not be reused
+            decoder = FieldDecoder(field, self._boolean_cases, self._string_intern_limit)
+            entry = self._decoders.setdefault(id(field), (field, decoder))
+        return entry[1]
+
+    def _class_decoders(self, feature_dataclass: FeatureDataclassMeta) -> Tuple[Optional[FieldDecoder], ...]:
+        """ The decoders of all non dataclass fields aligned with the generation_order, else None """
+        entry = self._decoders_by_class.get(id(feature_dataclass))
+        if entry is None:
+            decoders = tuple(None if field.type_info.is_dataclass else self.decoder(field)
+                             for field in feature_dataclass.generation_order)
+            entry = self._decoders_by_class.setdefault(id(feature_dataclass), (feature_dataclass, decoders))
+        return entry[1]
+
+    def clear_memo(self):
+        """ Releases all memoized UniqueCommonFeatureDataclass subtrees """
+        self._memos.clear()
+
+    def _memo(self, feature_dataclass: FeatureDataclassMeta, series_dataclass_key: Optional[str]) -> _ProjectionMemo:
+        key = (id(feature_dataclass), series_dataclass_key)
+        memo = self._memos.get(key)
+        if memo is None:
+            memo = self._memos.setdefault(key, _ProjectionMemo(feature_dataclass, series_dataclass_key,
+                                                               self._unique_common_memo_limit))
+        return memo
+
+    def _intern(self, instance: Union[FeatureDataclass, UniqueCommonFeatureDataclass]) \
+            -> Union[FeatureDataclass, UniqueCommonFeatureDataclass]:
+        if self._intern_table is None or not isinstance(instance, UniqueCommonFeatureDataclass):
+            return instance
+        try:
+            with self._intern_lock:
+                return self._intern_table.setdefault(instance, instance)
+        except TypeError:
+            # unhashable fields, e.g. json mappings
+            return instance
 
     def generator(self,
                   feature_dataclass: FeatureDataclassMeta,
                   data_dict: Dict[str, str],
-                  series_dataclass_key: Optional[str] = None) \
-            -> Tuple[Optional[Union[FeatureDataclass, UniqueCommonFeatureDataclass]], Optional[str]]:
+                  series_dataclass_key: Optional[str] = None,
+                  render_errors: bool = True) \
+            -> Tuple[Optional[Union[FeatureDataclass, UniqueCommonFeatureDataclass]],
+                     Optional[Union[str, GenerationErrorNode]]]:
         # todo write a docu
+        # render_errors: return the errors as string, else as GenerationErrorNode which provides the records
+        self._validate_series_dataclass_key(feature_dataclass, series_dataclass_key)
+        return self._generate(feature_dataclass, data_dict, series_dataclass_key, render_errors=render_errors)
+
+    def batch_generator(self,
+                        feature_dataclass: FeatureDataclassMeta,
+                        data_dicts: Sequence[Mapping[str, str]],
+                        series_dataclass_key: Optional[str] = None,
+                        render_errors: bool = True) \
+            -> List[Tuple[Optional[Union[FeatureDataclass, UniqueCommonFeatureDataclass]],
+                          Optional[Union[str, GenerationErrorNode]]]]:
+        """
+        The batched generation path, which returns the same (dataclass, errors) tuples as the generator
+        for each of the data_dicts. The batch_transformer of a feature is called once per batch with the input columns
+        over all data_dicts, while all other features are generated row by row.
+        """
+        self._validate_series_dataclass_key(feature_dataclass, series_dataclass_key)
+        batch = _Batch(data_dicts)
+        results = []
+        for index, data_dict in enumerate(data_dicts):
+            batch.index = index
+            results.append(self._generate(feature_dataclass, data_dict, series_dataclass_key,
+                                          _GenerationContext(batch), render_errors))
+        return results
+
+    def lazy(self,
+             feature_dataclass: FeatureDataclassMeta,
+             data_dict: Mapping[str, str],
+             series_dataclass_key: Optional[str] = None) -> LazyRecord:
+        """
+        A LazyRecord of feature_dataclass, which generates a field on first access, e.g. to filter rows before the
+        full generation:
+        >>> record = factory.lazy(SomeDataclass, data_dict)
+        >>> if record.visit_date.year >= 2020:
+        >>>     instance, errors = record.materialize()
+        """
+        self._validate_series_dataclass_key(feature_dataclass, series_dataclass_key)
+        return LazyRecord(self, feature_dataclass, data_dict, series_dataclass_key)
+
+    def bind(self,
+             feature_dataclass: FeatureDataclassMeta,
+             header: Sequence[str],
+             series_dataclass_key: Optional[str] = None) -> BoundGenerator:
+        """
+        Binds the generation of feature_dataclass to the header of a source. All required input keys are validated
+        once, instead of raising a KeyError in the middle of a run, and rows are passed as plain sequences:
+        >>> bound = factory.bind(SomeDataclass, reader.header)
+        >>> for row in reader.rows():
+        >>>     instance, errors = bound.generator(row)
+        """
+        return BoundGenerator(self, feature_dataclass, header, series_dataclass_key)
+
+    @staticmethod
+    def _validate_series_dataclass_key(feature_dataclass: FeatureDataclassMeta, series_dataclass_key: Optional[str]):
         if issubclass(feature_dataclass, FeatureDataclass) and (series_dataclass_key is None):
             pass
         elif issubclass(feature_dataclass, HeadSeriesFeatureDataclass) and (type(series_dataclass_key) is str):
@@ -59,17 +524,27 @@ class FeatureDataclassFactory:
             raise ValueError(f"Error: series_dataclass_key should be a string for SeriesFeatureDataclass else None. "
                              + f"feature_dataclass={feature_dataclass} and series_dataclass_key={series_dataclass_key}")
 
-        self._generator_errors = {}
+    def _generate(self,
+                  feature_dataclass: FeatureDataclassMeta,
+                  data_dict: Mapping[str, str],
+                  series_dataclass_key: Optional[str] = None,
+                  context: Optional[_GenerationContext] = None,
+                  render_errors: bool = True) \
+            -> Tuple[Optional[Union[FeatureDataclass, UniqueCommonFeatureDataclass]],
+                     Optional[Union[str, GenerationErrorNode]]]:
+        context = _GenerationContext() if context is None else context
 
         initialized_dataclass = self._generator(feature_dataclass=feature_dataclass,
                                                 data_dict=data_dict,
-                                                series_dataclass_key=series_dataclass_key)
+                                                series_dataclass_key=series_dataclass_key,
+                                                context=context)
 
-        errors = self._get_generator_error(feature_dataclass=feature_dataclass,
+        errors = self._get_generator_error(context=context,
+                                           feature_dataclass=feature_dataclass,
                                            series_dataclass_key=series_dataclass_key)
-        errors_str = None if errors is None else str(errors)
-
-        return initialized_dataclass, errors_str
+        if render_errors and errors is not None:
+            return initialized_dataclass, errors.render()
+        return initialized_dataclass, errors
 
     @staticmethod
     def _has_error_field(feature_dataclass: FeatureDataclassMeta) -> bool:
@@ -80,25 +555,29 @@ class FeatureDataclassFactory:
 
     @staticmethod
     def _error_key(feature_dataclass: FeatureDataclassMeta,
-                   series_dataclass_key: Optional[str] = None) -> str:
-        return feature_dataclass.__name__ + ("" if series_dataclass_key is None else f"_{series_dataclass_key}")
+                   series_dataclass_key: Optional[str] = None) -> Tuple[str, Optional[str]]:
+        return feature_dataclass.__name__, series_dataclass_key
 
     def _set_generator_error(self,
-                             msg: str,
+                             context: _GenerationContext,
+                             node: GenerationErrorNode,
                              feature_dataclass: FeatureDataclassMeta,
                              series_dataclass_key: Optional[str] = None):
-        self._generator_errors.update({self._error_key(feature_dataclass, series_dataclass_key): msg})
+        context.errors[self._error_key(feature_dataclass, series_dataclass_key)] = node
 
     def _get_generator_error(self,
+                             context: _GenerationContext,
                              feature_dataclass: FeatureDataclassMeta,
                              series_dataclass_key: Optional[str] = None) \
-            -> Optional[str]:
-        return self._generator_errors.get(self._error_key(feature_dataclass, series_dataclass_key))
+            -> Optional[GenerationErrorNode]:
+        # the errors are popped, such that a later generation of the same class does not pick them up
+        return context.errors.pop(self._error_key(feature_dataclass, series_dataclass_key), None)
 
     def _generator(self,
                    feature_dataclass: FeatureDataclassMeta,
-                   data_dict: Dict[str, str],
-                   series_dataclass_key: Optional[str] = None) \
+                   data_dict: Mapping[str, str],
+                   series_dataclass_key: Optional[str] = None,
+                   context: Optional[_GenerationContext] = None) \
             -> Optional[Union[FeatureDataclass, UniqueCommonFeatureDataclass]]:
         """
         todo: update return types
@@ -107,17 +586,206 @@ class FeatureDataclassFactory:
         :param feature_dataclass:
         :param data_dict:
         :param series_dataclass_key:
+        :param context: the state of the generation call, a fresh one if None
         :return: initialized feature_dataclass and None for an empty class or in case of transform errors
         """
+        if context is None:
+            context = _GenerationContext()
+
+        if (self._unique_common_memo_limit is None
+                or not issubclass(feature_dataclass, UniqueCommonFeatureDataclass)
+                or is_series_dataclass_ident(feature_dataclass)):
+            return self._build(feature_dataclass, data_dict, series_dataclass_key, context)
+
+        memo = self._memo(feature_dataclass, series_dataclass_key)
+        projection = memo.getter(data_dict)
+        entry = memo.entries.get(projection)
+        if entry is None:
+            instance = self._build(feature_dataclass, data_dict, series_dataclass_key, context)
+            node = context.errors.get(self._error_key(feature_dataclass, series_dataclass_key))
+            if len(memo.entries) < memo.limit:
+                memo.entries.setdefault(projection, (instance, node))
+            return instance
+        instance, node = entry
+        if node is not None:
+            # the node is complete once generated, such that it can be shared by all parents
+            self._set_generator_error(context=context,
+                                      node=node,
+                                      feature_dataclass=feature_dataclass,
+                                      series_dataclass_key=series_dataclass_key)
+        return instance
+
+    def _field_value(self,
+                     field: Feature,
+                     decoder: Optional[FieldDecoder],
+                     data_dict: Mapping[str, str],
+                     series_dataclass_key: Optional[str],
+                     is_series_dataclass: bool,
+                     context: _GenerationContext,
+                     kwargs: Dict[str, Any],
+                     failed: AbstractSet[str] = frozenset()) \
+            -> Tuple[Any, Optional[Union[GenerationError, GenerationErrorNode, Tuple[GenerationErrorNode, ...]]], bool]:
+        """
+        The value of a single field, see _build. kwargs holds the values of the fields generated before and failed the
+        names of those which recorded an error. A derived field depending on a failed field is not transformed, it
+        takes the fall back value without recording an error of its own, since the dependency already reported it.
+        :return: the value or its fall back, the error and True if the value should cascade to the parent dataclass
+        """
+        error_series_key = series_dataclass_key if is_series_dataclass else None
+        value = _EMPTY
+        error: Optional[Union[GenerationError, GenerationErrorNode, Tuple[GenerationErrorNode, ...]]] = None
+        skip_error_fallback: bool = False
+        dependency_failed: bool = False
+
+        # determine value string and the value type
+        type_info = field.type_info
+        value_type: Any = type_info.base_type
+
+        # determine the type associated value
+        if field.temporary:
+            value = None
+        elif field.is_ident_field:
+            value_str = data_dict[field.input_key]
+            value = int(value_str) if value_type is int else value_str
+        elif field.is_series_ident_field:
+            value = int(series_dataclass_key) if value_type is int else series_dataclass_key
+        elif field.depends_on and not failed.isdisjoint(field.depends_on):
+            dependency_failed = True
+        elif field.depends_on:
+            value_tuple = tuple(kwargs[name] for name in field.depends_on)
+            try:
+                value = field.transform(*value_tuple)
+            except:
+                error = GenerationError(ErrorKind.DERIVED, field.name, error_series_key,
+                                        field.depends_on, value_tuple)
+        elif field.transformer is not None:
+            data_keys = dict(field.input_key)[series_dataclass_key] if is_series_dataclass else field.input_key
+            value_tuple = tuple(data_dict[key] for key in data_keys)
+            try:
+                value = field.transform(*value_tuple)
+            except:
+                error = GenerationError(ErrorKind.TRANSFORMER, field.name, error_series_key,
+                                        data_keys, value_tuple)
+        elif field.batch_transformer is not None:
+            data_keys = dict(field.input_key)[series_dataclass_key] if is_series_dataclass else field.input_key
+            if context.batch is None:
+                context.batch = _Batch([data_dict])
+            value, failed = context.batch.value(field, data_keys)
+            if failed:
+                value_tuple = tuple(data_dict[key] for key in data_keys)
+                error = GenerationError(ErrorKind.TRANSFORMER, field.name, error_series_key,
+                                        data_keys, value_tuple)
+        elif (
+                type_info.is_unique_common
+                or (type_info.category is TypeCategory.FEATURE_DATACLASS)
+                or ((type_info.category is TypeCategory.NEST_SERIES) and is_series_dataclass)
+        ):
+            skip_error_fallback = True
+            value = self._generator(feature_dataclass=value_type,
+                                    data_dict=data_dict,
+                                    series_dataclass_key=series_dataclass_key,
+                                    context=context)
+
+            error = self._get_generator_error(context=context,
+                                              feature_dataclass=value_type,
+                                              series_dataclass_key=series_dataclass_key)
+        elif not is_series_dataclass and type_info.is_series:
+            skip_error_fallback = True
+            value = [self._generator(feature_dataclass=value_type,
+                                     data_dict=data_dict, series_dataclass_key=key, context=context)
+                     for key in get_nested_keys(value_type)]
+            value = tuple([t for t in value if t is not None])
+
+            error_nodes = tuple(node for node in [self._get_generator_error(context=context,
+                                                                            feature_dataclass=value_type,
+                                                                            series_dataclass_key=key)
+                                                  for key in get_nested_keys(value_type)]
+                                if node is not None)
+            if len(error_nodes) > 0:
+                error = error_nodes
+        else:
+            # determine value string
+            if is_series_dataclass and (series_dataclass_key not in dict(field.input_key).keys()):
+                value_str = None
+            else:
+                data_key = dict(field.input_key)[series_dataclass_key] if is_series_dataclass else field.input_key
+                value_str = data_dict[data_key]
+
+            # transform value string to value of its type
+            # the null_defaults, boolean cases and code_map of the field are resolved by a single lookup,
+            # which is applied to the whole column in a batched generation
+            if value_str is None:
+                decoded = _MISSING
+            elif context.batch is not None:
+                decoded = context.batch.decoded(decoder, data_key)
+            else:
+                decoded = decoder.table.get(value_str, _MISSING)
+            if value_str is None:
+                value = None
+            elif decoded is not _MISSING:
+                value = decoded
+            elif decoder.error_kind is not None:
+                error = GenerationError(decoder.error_kind, field.name, error_series_key, data_key, value_str)
+            elif value_type is str:
+                value = decoder.learn(value_str)
+            elif value_type is date:
+                try:
+                    value = RegexDateTime.extract_date(value_str)
+                except:
+                    error = GenerationError(ErrorKind.INVALID_DATE, field.name, error_series_key,
+                                            data_key, value_str)
+            elif value_type is datetime:
+                try:
+                    value = RegexDateTime.extract_datetime(value_str)
+                except:
+                    error = GenerationError(ErrorKind.INVALID_DATETIME, field.name, error_series_key,
+                                            data_key, value_str)
+            elif value_type is int or value_type is float:
+                # todo: implement a test case handling '<' or '>'
+                value_str = normalize_numeric(value_str, value_type)
+                try:
+                    value = value_type(value_str)
+                except:
+                    error = GenerationError(ErrorKind.INVALID_NUMERIC, field.name, error_series_key,
+                                            data_key, value_str)
+            else:
+                raise ValueError(f"handle file type: {value_type}")
 
-        class _Empty:
-            """ A helper class to check if a value is assigned"""
-            pass
+        # managing the behavior in case of error with fall back for value
+        cascade = False
+        if error is not None or dependency_failed:
+            if not skip_error_fallback:
+                if type_info.optional:
+                    value = None
+                else:
+                    if type_info.is_dataclass:
+                        value = self._dataclass_fall_back(value_type)
+                    else:
+                        value = self.value_fall_back[value_type]
+                    cascade = True
+
+        # check if value is assigned otherwise raise
+        if value is _EMPTY:
+            raise ValueError(f"no value assigned for field {field}")
+
+        return value, error, cascade
+
+    def _build(self,
+               feature_dataclass: FeatureDataclassMeta,
+               data_dict: Mapping[str, str],
+               series_dataclass_key: Optional[str],
+               context: _GenerationContext,
+               fields: Optional[Dict[str, _FieldResult]] = None) \
+            -> Optional[Union[FeatureDataclass, UniqueCommonFeatureDataclass]]:
+        """
+        Generates feature_dataclass field by field, see _generator. If given, the results of fields already generated,
+        e.g. by a LazyRecord, are taken from fields and the newly generated ones are added.
+        """
 
         kwargs = {}
         """ the kwargs dictionary to initialize the feature_dataclass """
-        error_dict = {}
-        """ a dictionary catching all value transformation errors for feature_dataclass """
+        error_node: Optional[GenerationErrorNode] = None
+        """ the node collecting all value transformation errors for feature_dataclass, rendered on demand """
         none_cascade = False
         """
         if a value transformation for an non-optional field fails this should cascade,
@@ -127,7 +795,7 @@ class FeatureDataclassFactory:
         # todo: it might be clever to implement a drop_in_case_of_error flag for optional features
 
         if is_series_dataclass_ident(feature_dataclass):
-            return feature_dataclass(series_ident=series_dataclass_key)
+            return self._intern(feature_dataclass(series_ident=series_dataclass_key))
 
         is_series_dataclass = issubclass(feature_dataclass, (HeadSeriesFeatureDataclass,
                                                              NestSeriesFeatureDataclass,
@@ -136,147 +804,52 @@ class FeatureDataclassFactory:
         ident_field_name = None
         series_ident_field_name = None
         error_field: Optional[Feature] = None
+        error_series_key = series_dataclass_key if is_series_dataclass else None
+        failed: Set[str] = set()
+        """ the names of the fields which recorded an error """
 
-        for field in feature_dataclass.features:
+        for field, decoder in zip(feature_dataclass.generation_order, self._class_decoders(feature_dataclass)):
             # todo: implement test cases for all conversions
             if field.is_error_field:
                 error_field = field
                 continue
-            value = _Empty
-            error_msg: Optional[str] = None
-            skip_error_fallback: bool = False
-
-            # determine value string and the value type
-            value_type: Any = get_nested_type(field.type) if has_nested_type(field.type) else field.type
-
-            # determine the type associated value
-            if field.temporary:
-                value = None
-            elif field.is_ident_field:
-                value_str = data_dict[field.input_key]
-                value = int(value_str) if value_type is int else value_str
+            if field.is_ident_field:
                 if ident_field_name is None:
                     ident_field_name = field.name
                 else:
                     raise ValueError(f"multiple ident_field definitions for dataclass {feature_dataclass}")
             elif field.is_series_ident_field:
-                value = int(series_dataclass_key) if value_type is int else series_dataclass_key
                 if series_ident_field_name is None:
                     series_ident_field_name = field.name
                 else:
                     raise ValueError(f"multiple series_ident_field definitions for dataclass {feature_dataclass}")
-            elif field.transformer is not None:
-                data_keys = dict(field.input_key)[series_dataclass_key] if is_series_dataclass else field.input_key
-                value_tuple = tuple(data_dict[key] for key in data_keys)
-                try:
-                    value = field.transformer(*value_tuple)
-                except:
-                    error_msg = f"Transformer failed for {field.name} with keys={data_keys} and input={value_tuple}"
-            elif (
-                    is_series_dataclass_ident(value_type)
-                    or ((type(value_type) is FeatureDataclassMeta)
-                        and issubclass(value_type, UniqueCommonFeatureDataclass))
-                    or ((type(value_type) is FeatureDataclassMeta) and issubclass(value_type, FeatureDataclass))
-                    or (is_nest_series_feature_dataclass(field.type) and is_series_dataclass)
-            ):
-                skip_error_fallback = True
-                value = self._generator(feature_dataclass=value_type,
-                                        data_dict=data_dict,
-                                        series_dataclass_key=series_dataclass_key)
-
-                error_msg = self._get_generator_error(feature_dataclass=value_type,
-                                                      series_dataclass_key=series_dataclass_key)
-            elif (not is_series_dataclass and issubclass(value_type, (HeadSeriesFeatureDataclass,
-                                                                      NestSeriesFeatureDataclass,
-                                                                      SeriesUniqueCommonFeatureDataclass))):
-                skip_error_fallback = True
-                value = [self._generator(feature_dataclass=value_type,
-                                         data_dict=data_dict, series_dataclass_key=key)
-                         for key in get_nested_keys(value_type)]
-                value = tuple([t for t in value if t is not None])
-
-                error_msgs = [msg for msg in [self._get_generator_error(feature_dataclass=value_type,
-                                                                        series_dataclass_key=key)
-                                              for key in get_nested_keys(value_type)]
-                              if msg is not None]
-                if len(error_msgs) > 0:
-                    error_msg = '{' + ', '.join([str(msg) for msg in error_msgs]) + '}'
-            else:
-                # determine value string
-                if is_series_dataclass and (series_dataclass_key not in dict(field.input_key).keys()):
-                    value_str = None
-                else:
-                    data_key = dict(field.input_key)[series_dataclass_key] if is_series_dataclass else field.input_key
-                    value_str = data_dict[data_key]
 
-                # transform value string to value of its type
-                if value_str is None:
-                    value = None
-                elif (field.null_defaults is not None) and (value_str in field.null_defaults):
-                    # handle optional cases for all value types via field.null_defaults
-                    value = None
-                elif value_type is str:
-                    value = value_str
-                elif value_type is bool:
-                    # note that the optional case is already handled above
-                    if value_str in self._boolean_cases.true:
-                        value = True
-                    elif value_str in self._boolean_cases.false:
-                        value = False
-                    else:
-                        error_msg = f"Unknown boolean: {{{data_key}:{value_str}}}"
-                elif value_type is date:
-                    try:
-                        value = RegexDateTime.extract_date(value_str)
-                    except:
-                        error_msg = f"Invalid date: {{{data_key}:{value_str}}}"
-                elif value_type is datetime:
-                    try:
-                        value = RegexDateTime.extract_datetime(value_str)
-                    except:
-                        error_msg = f"Invalid datetime: {{{data_key}:{value_str}}}"
-                elif value_type is int or value_type is float:
-                    # todo: implement a test case handling '<' or '>'
-                    if value_str.count('>') == 1:
-                        value_str = value_str.replace('>', '')
-                    elif value_str.count('<') == 1:
-                        value_str = value_str.replace('<', '')
-
-                    if value_type is float:
-                        if value_str.count(',') == 1 and value_str.count('.') == 0:
-                            value_str = value_str.replace(',', '.')
-                    try:
-                        value = value_type(value_str)
-                    except:
-                        error_msg = f"Invalid numeric: {{{data_key}:{value_str}}}"
-                else:
-                    raise ValueError(f"handle file type: {value_type}")
-
-            # managing the behavior in case of error with fall back for value
-            if error_msg is not None:
-                error_dict.update({field.name + (f"_{series_dataclass_key}" if is_series_dataclass else ""): error_msg})
-                if not skip_error_fallback:
-                    if is_optional(field.type):
-                        value = None
-                    else:
-                        if isinstance(value_type, FeatureDataclassMeta):
-                            value = self._dataclass_fall_back(value_type)
-                        else:
-                            value = self.value_fall_back[value_type]
-                        none_cascade = True
+            if fields is None:
+                value, error, cascade = self._field_value(field, decoder, data_dict, series_dataclass_key,
+                                                          is_series_dataclass, context, kwargs, failed)
+            elif field.name in fields:
+                value, error, cascade = fields[field.name]
+            else:
+                value, error, cascade = fields[field.name] = self._field_value(
+                    field, decoder, data_dict, series_dataclass_key, is_series_dataclass, context, kwargs, failed)
 
-            # check if value is assigned otherwise raise
-            if value is _Empty:
-                raise ValueError(f"no value assigned for field {field}")
+            # collect the error, the fall back value is already assigned
+            if error is not None:
+                if error_node is None:
+                    error_node = GenerationErrorNode(feature_dataclass.__name__, error_series_key)
+                error_node.append(field.name, error)
+                failed.add(field.name)
+            none_cascade = none_cascade or cascade
 
             # update the kwargs dict
             kwargs.update({field.name: value})
 
         # update the global error handling fields
         if error_field is not None:
-            kwargs.update({error_field.name: str(error_dict) if len(error_dict) > 0 else None})
-        if len(error_dict) > 0:
-            self._set_generator_error(msg=str(error_dict),
+            kwargs.update({error_field.name: None if error_node is None else error_node.render()})
+        if error_node is not None:
+            self._set_generator_error(context=context,
+                                      node=error_node,
                                       feature_dataclass=feature_dataclass,
                                       series_dataclass_key=series_dataclass_key)
 
@@ -288,14 +861,15 @@ class FeatureDataclassFactory:
             return None
 
         # return None for empty result set
+        # note: this check avoids hashing the values, which would recursively hash all nested dataclasses
         kw_values = []
         for key, val in kwargs.items():
             if not (isinstance(val, SeriesDataclassIdent)
                     or (key == ident_field_name)
                     or (key == series_ident_field_name)):
                 kw_values.append(val)
-        if set(kw_values) == {None}:
+        if len(kw_values) > 0 and all(val is None for val in kw_values):
             return None
 
         # return initialized dataclass
-        return feature_dataclass(**kwargs)
+        return self._intern(feature_dataclass(**kwargs))
@@ -1,5 +1,51 @@
 import dataclasses
-from typing import Optional, Union, FrozenSet, Tuple, Any, Callable
+import functools
+from enum import Enum
+from typing import Optional, Union, FrozenSet, Tuple, Any, Callable, Type, Sequence, Mapping, Dict
+
+
+class TypeCategory(Enum):
+    """ The categories of feature types, which determine how a field is generated and stored """
+    BASE = 'base'
+    JSON = 'json'
+    FEATURE_DATACLASS = 'feature_dataclass'
+    UNIQUE_COMMON = 'unique_common'
+    SERIES_UNIQUE_COMMON = 'series_unique_common'
+    SERIES_IDENT = 'series_ident'
+    HEAD_SERIES = 'head_series'
+    NEST_SERIES = 'nest_series'
+    DATACLASS = 'dataclass'
+    """ any other FeatureDataclassMeta instance """
+    OTHER = 'other'
+
+
+@dataclasses.dataclass(frozen=True)
+class TypeInfo:
+    """
+    The resolved annotation of a feature. It is computed once on class creation by the FeatureDataclassMeta,
+    such that consumers do not need to reflect on the annotation again.
+    """
+    base_type: Type
+    """ The annotation without Optional or container, e.g. int for Optional[int] or Foo for FrozenSet[Foo] """
+    optional: bool
+    container: Optional[Type]
+    """ frozenset or tuple for container annotations, else None """
+    category: TypeCategory
+
+    @property
+    def is_dataclass(self) -> bool:
+        return self.category not in {TypeCategory.BASE, TypeCategory.JSON, TypeCategory.OTHER}
+
+    @property
+    def is_unique_common(self) -> bool:
+        return self.category in {TypeCategory.UNIQUE_COMMON,
+                                 TypeCategory.SERIES_UNIQUE_COMMON,
+                                 TypeCategory.SERIES_IDENT}
+
+    @property
+    def is_series(self) -> bool:
+        """ True for HeadSeriesFeatureDataclass and NestSeriesFeatureDataclass types """
+        return self.category in {TypeCategory.HEAD_SERIES, TypeCategory.NEST_SERIES}
 
 
 class Feature(dataclasses.Field):
@@ -12,6 +58,33 @@ class Feature(dataclasses.Field):
         A Callable function returning a result of field type.
         The function is called by a tuple of input strings which are specified by a tuple of input_keys
     __________________________________________________________________________
+    :param transformer_key:
+        An optional version or name of the transformer and batch_transformer, e.g. 'bmi-v2', which is part of the
+        schema fingerprint of the dataclass. The fingerprint holds the qualified name of a transformer, but not its
+        body, hence lambdas and local functions of one scope are only told apart by their transformer_key. It should
+        be changed whenever the transformer changes its results.
+    __________________________________________________________________________
+    :param pure_transformer:
+        Marks the transformer as a pure function of its inputs, e.g. a lookup of codes to labels or a score table.
+        The transformer results are then memoized on the input tuple by a bounded LRU cache of size
+        transformer_cache_size. The cache is thread safe and local to the process. Exceptions are not cached.
+        Hit and miss statistics are available via transformer_cache_info().
+    __________________________________________________________________________
+    :param batch_transformer:
+        A vectorized alternative to the transformer, which is called once per batch by the batched generation path
+        FeatureDataclassFactory.batch_generator. It receives one input column (a sequence of input strings over all
+        rows of the batch) per input_key and returns a tuple (values, error_mask) of equal length, where values may be
+        a sequence or a NumPy array and error_mask flags the rows which failed to transform.
+        If the call for the whole batch raises, the rows are evaluated one by one.
+            e.g. >>> def to_float(column): values = numpy.asarray(column, float); return values, numpy.isnan(values)
+        The transformer and batch_transformer are mutually exclusive.
+    __________________________________________________________________________
+    :param depends_on:
+        The names of other fields of the same dataclass, whose already typed values are passed to the transformer
+        instead of input strings, e.g. an age computed from two date fields which are parsed only once.
+        The fields are generated in dependency order, which is validated to be acyclic on class creation.
+            e.g. >>> age: int = Feature(depends_on=('birth_date', 'visit_date'), transformer=years_between)
+    __________________________________________________________________________
     :param input_key:
         The keys for the input from a data dictionary in case the field becomes a sql column,
          or the series identifier if the field type is a SeriesFeatureDataclass.
@@ -33,6 +106,21 @@ class Feature(dataclasses.Field):
     :param null_defaults:
         A set of values which will be replaced by none or null
     __________________________________________________________________________
+    :param code_map:
+        An optional categorical code map from input strings to values of the field type,
+            e.g. >>> sex: str = Feature(input_key='sex', code_map={'1': 'male', '2': 'female'})
+        Input strings which are neither in the code_map nor in the null_defaults are reported as unknown codes.
+    __________________________________________________________________________
+    :param intern_strings:
+        For str fields with a small vocabulary, e.g. answers, units or center codes. If True, the generated strings are
+        dictionary encoded by the FeatureDataclassFactory, such that equal values share a single string object.
+        If None, the factory decides by the observed cardinality (see FeatureDataclassFactory), False disables it.
+    __________________________________________________________________________
+    :param lookup_table:
+        Stores a categorical str field normalized: the data table holds an integer foreign key into a small dictionary
+        table of the distinct values, which is resolved transparently by the DTOs. Not supported for
+        UniqueCommonFeatureDataclass fields, ident fields and together with a unique_index.
+    __________________________________________________________________________
     :param unique_index:
         When all columns with a true flag fullfill an unique constraint which is indexed
     
@@ -73,6 +161,14 @@ class Feature(dataclasses.Field):
                  input_key: Optional[
                      Union[str, Tuple[str, ...], Tuple[Tuple[str, Union[str, Tuple[str, ...]]], ...]]] = None,
                  null_defaults: FrozenSet[str] = frozenset(),
+                 pure_transformer: bool = False,
+                 transformer_cache_size: int = 1024,
+                 batch_transformer: Optional[Callable[..., Tuple[Sequence[Any], Sequence[bool]]]] = None,
+                 depends_on: Tuple[str, ...] = (),
+                 code_map: Optional[Mapping[str, Any]] = None,
+                 intern_strings: Optional[bool] = None,
+                 lookup_table: bool = False,
+                 transformer_key: Optional[str] = None,
                  default=dataclasses.MISSING):
         super().__init__(default=default,
                          default_factory=dataclasses.MISSING,
@@ -105,13 +201,32 @@ class Feature(dataclasses.Field):
         else:
             raise ValueError(f'Error: input_key is of unsupported type: {type(input_key)}')
 
+        if (transformer is not None) and (batch_transformer is not None):
+            raise ValueError('Error: transformer and batch_transformer are mutually exclusive.')
+
+        if depends_on:
+            if (type(depends_on) is not tuple) or not all([type(name) is str for name in depends_on]):
+                raise ValueError(f'Error: depends_on should be a tuple of field names: {depends_on}')
+            elif (transformer is None) or (input_key is not None):
+                raise ValueError('Error: depends_on requires a transformer and excludes an input_key.')
+
+        if lookup_table and (is_ident_field or is_series_ident_field):
+            raise ValueError('Error: lookup_table can not be set for an ident field.')
+
+        if (code_map is not None) and ((transformer is not None) or (batch_transformer is not None) or depends_on):
+            raise ValueError('Error: code_map can not be combined with a transformer.')
+
         # when transformer is set validate that input_keys are tuples
-        if transformer is not None:
+        if depends_on:
+            pass
+        elif (transformer is not None) or (batch_transformer is not None):
             if (input_key_type is tuple) or (nested_key_type is tuple):
                 pass
             else:
                 raise ValueError(f'Error: transformer is set but input keys are not of tuple type. '
                                  + f'Types are {input_key_type} and {nested_key_type}')
+        elif pure_transformer:
+            raise ValueError('Error: pure_transformer is set but no transformer is provided.')
 
         self.unique_index = unique_index
         self.comment = comment
@@ -122,6 +237,17 @@ class Feature(dataclasses.Field):
         self.temporary = temporary
         self.input_key = input_key
         self.null_defaults = null_defaults
+        self.pure_transformer = pure_transformer
+        self.batch_transformer = batch_transformer
+        self.depends_on = depends_on
+        self.code_map: Optional[Dict[str, Any]] = None if code_map is None else dict(code_map)
+        self.intern_strings = intern_strings
+        self.lookup_table = lookup_table
+        self.transformer_key = transformer_key
+        self._transformer_cache = functools.lru_cache(maxsize=transformer_cache_size)(transformer) \
+            if pure_transformer else None
+        self.type_info: Optional[TypeInfo] = None
+        """ The resolved field type, set by the FeatureDataclassMeta """
 
     def __eq__(self, other):
         return self.name == other.name and \
@@ -129,6 +255,13 @@ class Feature(dataclasses.Field):
                self.unique_index == other.unique_index and \
                self.comment == other.comment and \
                self.transformer == other.transformer and \
+               self.transformer_key == other.transformer_key and \
+               self.pure_transformer == other.pure_transformer and \
+               self.batch_transformer == other.batch_transformer and \
+               self.depends_on == other.depends_on and \
+               self.code_map == other.code_map and \
+               self.intern_strings == other.intern_strings and \
+               self.lookup_table == other.lookup_table and \
                self.is_ident_field == other.is_ident_field and \
                self.is_series_ident_field == other.is_series_ident_field and \
                self.is_error_field == other.is_error_field and \
@@ -146,7 +279,10 @@ class Feature(dataclasses.Field):
     def __hash__(self):
         return hash((self.name, self.type,
                      self.unique_index, self.comment,
-                     self.transformer,
+                     self.transformer, self.transformer_key, self.pure_transformer, self.batch_transformer,
+                     self.depends_on,
+                     None if self.code_map is None else frozenset(self.code_map.items()), self.intern_strings,
+                     self.lookup_table,
                      self.is_ident_field, self.is_series_ident_field,
                      self.is_error_field,
                      self.temporary, self.input_key,
@@ -159,14 +295,37 @@ class Feature(dataclasses.Field):
                 f'index={self.unique_index!r},'
                 f'comment={self.comment!r},'
                 f'transformer={(None if self.transformer is None else self.transformer.__name__)!r},'
+                f'batch_transformer={(None if self.batch_transformer is None else self.batch_transformer.__name__)!r},'
+                f'transformer_key={self.transformer_key!r},'
                 f'is_ident_field={self.is_ident_field!r},'
                 f'is_series_ident_field={self.is_series_ident_field!r},'
-                f'is_error_field={self.is_error_field!r}',
+                f'is_error_field={self.is_error_field!r},'
                 f'temporary={self.temporary!r},'
                 f'input_key={self.input_key!r},'
+                f'depends_on={self.depends_on!r},'
                 f'null_defaults={self.null_defaults!r},'
+                f'code_map={self.code_map!r},'
+                f'lookup_table={self.lookup_table!r},'
                 f'default={self.default!r}'
                 ')')
 
     def has_default(self) -> bool:
         return self.default is not dataclasses.MISSING
+
+    def transform(self, *args) -> Any:
+        """ Calls the transformer, memoized in case of a pure_transformer """
+        if self._transformer_cache is not None:
+            return self._transformer_cache(*args)
+        return self.transformer(*args)
+
+    def transformer_cache_info(self) -> Optional[Tuple[int, int, int, int]]:
+        """ The (hits, misses, maxsize, currsize) statistics of a pure_transformer, else None """
+        return None if self._transformer_cache is None else self._transformer_cache.cache_info()
+
+    @property
+    def has_transformer(self) -> bool:
+        return (self.transformer is not None) or (self.batch_transformer is not None)
+
+    def transformer_cache_clear(self):
+        if self._transformer_cache is not None:
+            self._transformer_cache.cache_clear()
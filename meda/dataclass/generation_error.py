@@ -0,0 +1,97 @@
+from enum import Enum
+from typing import Optional, Tuple, Any, List, Union, NamedTuple
+
+
+class ErrorKind(Enum):
+    UNKNOWN_BOOLEAN = 'Unknown boolean'
+    INVALID_DATE = 'Invalid date'
+    INVALID_DATETIME = 'Invalid datetime'
+    INVALID_NUMERIC = 'Invalid numeric'
+    UNKNOWN_CODE = 'Unknown code'
+    TRANSFORMER = 'Transformer failed'
+    DERIVED = 'Derived transformer failed'
+
+
+class GenerationError(NamedTuple):
+    """
+    A single failed value transformation of the FeatureDataclassFactory.
+    Note: a NamedTuple is used instead of a frozen dataclass, since records are created in the generation hot loop.
+    """
+    kind: ErrorKind
+    field: str
+    series_dataclass_key: Optional[str]
+    input_key: Any
+    """ The data key, a tuple of data keys for transformers or the depends_on field names for derived features """
+    raw_value: Any
+    """ The value string, or the tuple of inputs passed to a transformer """
+    path: Tuple[str, ...] = ()
+    """ The field names from the root dataclass to the field, set by GenerationErrorNode.records """
+
+    @property
+    def message(self) -> str:
+        if self.kind is ErrorKind.TRANSFORMER:
+            return f"Transformer failed for {self.field} with keys={self.input_key} and input={self.raw_value}"
+        elif self.kind is ErrorKind.DERIVED:
+            return f"Transformer failed for {self.field} with depends_on={self.input_key} " \
+                   + f"and input={self.raw_value}"
+        return f"{self.kind.value}: {{{self.input_key}:{self.raw_value}}}"
+
+
+_Child = Union[GenerationError, 'GenerationErrorNode', Tuple['GenerationErrorNode', ...]]
+
+
+class GenerationErrorNode:
+    """
+    The errors of a single generated dataclass. Each entry holds the failed field and either a GenerationError, the
+    node of a nested dataclass or the nodes of a series. The node is rendered to the error string of the
+    FeatureDataclassFactory only on demand, i.e. when an error field is written or str() is called.
+    """
+    __slots__ = ('feature_dataclass_name', 'series_dataclass_key', 'entries', '_rendered')
+
+    def __init__(self, feature_dataclass_name: str, series_dataclass_key: Optional[str] = None):
+        self.feature_dataclass_name = feature_dataclass_name
+        self.series_dataclass_key = series_dataclass_key
+        self.entries: List[Tuple[str, _Child]] = []
+        self._rendered: Optional[str] = None
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def append(self, field: str, child: _Child):
+        self.entries.append((field, child))
+        self._rendered = None
+
+    def _entry_key(self, field: str) -> str:
+        return field if self.series_dataclass_key is None else f"{field}_{self.series_dataclass_key}"
+
+    @staticmethod
+    def _render_child(child: _Child) -> str:
+        if isinstance(child, GenerationError):
+            return child.message
+        elif isinstance(child, GenerationErrorNode):
+            return child.render()
+        return '{' + ', '.join([node.render() for node in child]) + '}'
+
+    def render(self) -> str:
+        if self._rendered is None:
+            self._rendered = str({self._entry_key(field): self._render_child(child) for field, child in self.entries})
+        return self._rendered
+
+    def __str__(self) -> str:
+        return self.render()
+
+    def __repr__(self) -> str:
+        return f"GenerationErrorNode({self.feature_dataclass_name!r}, {self.render()})"
+
+    def records(self, path: Tuple[str, ...] = ()) -> List[GenerationError]:
+        """ All errors of the tree, flattened in generation order with their field path """
+        records = []
+        for field, child in self.entries:
+            if isinstance(child, GenerationError):
+                records.append(child._replace(path=path + (field,)))
+            elif isinstance(child, GenerationErrorNode):
+                records.extend(child.records(path + (field,)))
+            else:
+                for node in child:
+                    records.extend(node.records(path + (field,)))
+        return records
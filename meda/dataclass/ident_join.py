@@ -0,0 +1,152 @@
+import heapq
+import os
+import pickle
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, Mapping, List, Optional, Tuple, BinaryIO
+
+from meda.dataclass.dataclass import FeatureDataclassMeta, ident_input_key, required_input_keys
+
+_Rows = List[Optional[Mapping[str, str]]]
+""" The row of each source for a single ident, None if a source has no row """
+
+
+class IdentJoin:
+    """
+    Joins several sources, e.g. the demographics, lab and medication exports of a study, on the input key of the
+    is_ident_field of feature_dataclass into the combined data_dicts of the FeatureDataclassFactory:
+    >>> join = IdentJoin(SomeDataclass)
+    >>> for data_dict in join(CsvReader(demographics_path), CsvReader(labs_path)):
+    >>>     instance, errors = factory.generator(SomeDataclass, data_dict)
+
+    Each source holds at most one row per ident. If presorted is set, the sources are merged in a single pass with
+    constant memory (sort-merge join), else the rows are joined in a hash table (hash join). Beyond max_rows rows,
+    the hash join spills all rows to partition files by the hash of the ident and joins one partition at a time.
+    The data_dicts are ordered by ident for the sort-merge join, otherwise the order is arbitrary.
+
+    Of a column in several sources, the value of the later source is kept. With how='outer', idents missing in some
+    sources are kept and the input keys of feature_dataclass without a value are set to missing.
+    After a join, peak_rows and spilled_rows report the rows held in memory and the rows written to disk.
+    """
+
+    def __init__(self,
+                 feature_dataclass: FeatureDataclassMeta,
+                 presorted: bool = False,
+                 how: str = 'inner',
+                 max_rows: int = 1_000_000,
+                 partitions: int = 64,
+                 missing: str = '',
+                 directory: Optional[str] = None):
+        """
+        :param feature_dataclass: The dataclass generated from the joined data_dicts
+        :param presorted: If set, all sources are sorted by ident and a sort-merge join is used
+        :param how: 'inner' to keep idents of all sources, 'outer' to keep idents of any source
+        :param max_rows: The number of rows held in memory by the hash join before it spills to disk
+        :param partitions: The number of partition files of a spilled hash join
+        :param missing: The value of input keys without a value for how='outer'
+        :param directory: The directory of the partition files, the default temporary directory if None
+        """
+        if how not in ('inner', 'outer'):
+            raise ValueError(f"Error: how should be 'inner' or 'outer', but is {how}")
+        if max_rows < 1 or partitions < 1:
+            raise ValueError(f"Error: max_rows={max_rows} and partitions={partitions} should be positive")
+        self.ident_key = ident_input_key(feature_dataclass)
+        self.presorted = presorted
+        self.how = how
+        self.max_rows = max_rows
+        self.partitions = partitions
+        self.directory = directory
+        self._empty = dict.fromkeys(required_input_keys(feature_dataclass), missing) if how == 'outer' else {}
+        self.peak_rows = 0
+        self.spilled_rows = 0
+
+    def __call__(self, *sources: Iterable[Mapping[str, str]]) -> Iterator[Dict[str, str]]:
+        self.peak_rows = 0
+        self.spilled_rows = 0
+        joined = self._merge_join(sources) if self.presorted else self._hash_join(sources)
+        for ident, rows in joined:
+            if self.how == 'inner' and any(row is None for row in rows):
+                continue
+            data_dict = self._empty.copy()
+            for row in rows:
+                if row is not None:
+                    data_dict.update(row)
+            data_dict[self.ident_key] = ident
+            yield data_dict
+
+    def _sorted(self, index: int, source: Iterable[Mapping[str, str]]) -> Iterator[Tuple[str, int, Mapping[str, str]]]:
+        previous = None
+        for row in source:
+            ident = row[self.ident_key]
+            if previous is not None and ident <= previous:
+                raise ValueError(f"Error: source {index} is not sorted by unique {self.ident_key}, "
+                                 + f"{ident} follows {previous}")
+            previous = ident
+            yield ident, index, row
+
+    def _merge_join(self, sources: Tuple[Iterable[Mapping[str, str]], ...]) -> Iterator[Tuple[str, _Rows]]:
+        self.peak_rows = len(sources)
+        merged = heapq.merge(*[self._sorted(index, source) for index, source in enumerate(sources)],
+                             key=itemgetter(0))
+        for ident, group in groupby(merged, key=itemgetter(0)):
+            rows: _Rows = [None] * len(sources)
+            for _, index, row in group:
+                rows[index] = row
+            yield ident, rows
+
+    def _add(self, table: Dict[str, _Rows], size: int, index: int, row: Mapping[str, str]):
+        ident = row[self.ident_key]
+        rows = table.get(ident)
+        if rows is None:
+            rows = table[ident] = [None] * size
+        elif rows[index] is not None:
+            raise ValueError(f"Error: source {index} has several rows of {self.ident_key}={ident}")
+        rows[index] = row
+
+    def _hash_join(self, sources: Tuple[Iterable[Mapping[str, str]], ...]) -> Iterator[Tuple[str, _Rows]]:
+        table: Dict[str, _Rows] = {}
+        files: Optional[List[BinaryIO]] = None
+        buffered = 0
+        with tempfile.TemporaryDirectory(prefix='meda_join_', dir=self.directory) as directory:
+            try:
+                for index, source in enumerate(sources):
+                    for row in source:
+                        if files is not None:
+                            self._spill(files, index, row)
+                            continue
+                        self._add(table, len(sources), index, row)
+                        buffered += 1
+                        self.peak_rows = max(self.peak_rows, buffered)
+                        if buffered >= self.max_rows:
+                            files = [open(os.path.join(directory, f'{partition}.pickle'), 'wb')
+                                     for partition in range(self.partitions)]
+                            for rows in table.values():
+                                for spilled_index, spilled_row in enumerate(rows):
+                                    if spilled_row is not None:
+                                        self._spill(files, spilled_index, spilled_row)
+                            table.clear()
+            finally:
+                for file in files or []:
+                    file.close()
+
+            if files is None:
+                yield from table.items()
+                return
+            for file in files:
+                table = {}
+                with open(file.name, 'rb') as partition:
+                    while True:
+                        try:
+                            index, row = pickle.load(partition)
+                        except EOFError:
+                            break
+                        self._add(table, len(sources), index, row)
+                self.peak_rows = max(self.peak_rows, sum(len(rows) - rows.count(None) for rows in table.values()))
+                os.remove(file.name)
+                yield from table.items()
+
+    def _spill(self, files: List[BinaryIO], index: int, row: Mapping[str, str]):
+        self.spilled_rows += 1
+        file = files[hash(row[self.ident_key]) % self.partitions]
+        pickle.dump((index, dict(row)), file, protocol=pickle.HIGHEST_PROTOCOL)
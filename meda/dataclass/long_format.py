@@ -0,0 +1,142 @@
+import csv
+import heapq
+import os
+import tempfile
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Tuple, Iterable, Iterator, Mapping, List, Optional
+
+from meda.dataclass.dataclass import FeatureDataclassMeta, HeadSeriesFeatureDataclass, NestSeriesFeatureDataclass, \
+    SeriesUniqueCommonFeatureDataclass, is_series_dataclass_ident, required_input_keys, ident_input_key
+
+_Entry = Tuple[str, str, str]
+""" The ident, the wide data key and the value of a long row """
+
+
+def series_data_keys(feature_dataclass: FeatureDataclassMeta) -> Dict[Tuple[str, str], str]:
+    """
+    The wide data keys of all series fields in the tree of feature_dataclass by series key and field name, e.g.
+    {('1', 'amount'): 'dose_1', ('2', 'amount'): 'dose_2'}. Transformer fields with several data keys are skipped.
+    A long row names a measurement by its series key and field name only, hence fields of distinct series classes
+    sharing both with different data keys are ambiguous and raise a ValueError.
+    """
+    data_keys: Dict[Tuple[str, str], str] = {}
+
+    def visit(cls: FeatureDataclassMeta):
+        is_series = issubclass(cls, (HeadSeriesFeatureDataclass, NestSeriesFeatureDataclass,
+                                     SeriesUniqueCommonFeatureDataclass))
+        for field in cls.features:
+            if field.type_info.is_dataclass:
+                if not is_series_dataclass_ident(field.type_info.base_type):
+                    visit(field.type_info.base_type)
+            elif (not is_series or field.input_key is None or field.temporary or field.is_error_field
+                  or field.is_ident_field or field.is_series_ident_field or field.depends_on):
+                continue
+            else:
+                for series_key, data_key in field.input_key:
+                    if field.has_transformer:
+                        if len(data_key) != 1:
+                            continue
+                        data_key = data_key[0]
+                    known = data_keys.setdefault((series_key, field.name), data_key)
+                    if known != data_key:
+                        raise ValueError(f"Error: the series field {field.name} of {cls.__name__} with series key "
+                                         + f"{series_key} is ambiguous, it maps to the data keys {known} and "
+                                         + f"{data_key} in the tree of {feature_dataclass.__name__}")
+
+    visit(feature_dataclass)
+    return data_keys
+
+
+class LongFormatPivot:
+    """
+    Pivots a long format source, one row per ident, series key and measurement, to the wide data_dicts expected by the
+    FeatureDataclassFactory:
+    >>> pivot = LongFormatPivot(SomeDataclass, slot_key='visit', measurement_key='parameter', value_key='value')
+    >>> for data_dict in pivot(CsvReader(path)):
+    >>>     instance, errors = factory.generator(SomeDataclass, data_dict)
+
+    The rows are grouped by the input key of the is_ident_field of feature_dataclass. The wide data key of a row is
+    looked up by its series key and measurement, see series_data_keys, or else the measurement has to be a data key
+    itself, e.g. for features which are not part of a series. Rows are kept in memory up to max_rows, beyond that they
+    are written to sorted run files, which are merged at the end. Data keys without a row are set to missing, of two
+    rows with the same ident and data key the later one is kept.
+    """
+
+    def __init__(self,
+                 feature_dataclass: FeatureDataclassMeta,
+                 slot_key: str,
+                 measurement_key: str,
+                 value_key: str,
+                 max_rows: int = 1_000_000,
+                 missing: str = '',
+                 directory: Optional[str] = None):
+        """
+        :param feature_dataclass: The dataclass generated from the wide data_dicts
+        :param slot_key: The column of the series key
+        :param measurement_key: The column of the series field name or the data key
+        :param value_key: The column of the value string
+        :param max_rows: The number of rows held in memory before a sorted run is written
+        :param missing: The value of data keys without a row
+        :param directory: The directory of the run files, the default temporary directory if None
+        """
+        if max_rows < 1:
+            raise ValueError(f"Error: max_rows should be positive, but is {max_rows}")
+        self.feature_dataclass = feature_dataclass
+        self.ident_key = ident_input_key(feature_dataclass)
+        self.slot_key = slot_key
+        self.measurement_key = measurement_key
+        self.value_key = value_key
+        self.max_rows = max_rows
+        self.missing = missing
+        self.directory = directory
+        self._data_keys = series_data_keys(feature_dataclass)
+        self._input_keys = required_input_keys(feature_dataclass) - {self.ident_key}
+
+    def _data_key(self, slot: str, measurement: str) -> str:
+        data_key = self._data_keys.get((slot, measurement))
+        if data_key is not None:
+            return data_key
+        elif measurement in self._input_keys:
+            return measurement
+        raise KeyError(f"Error: no data key of {self.feature_dataclass.__name__} for "
+                       + f"{self.slot_key}={slot} and {self.measurement_key}={measurement}")
+
+    def _write_run(self, entries: List[_Entry], runs: List[str]):
+        entries.sort(key=itemgetter(0))
+        file_descriptor, path = tempfile.mkstemp(suffix='.csv', prefix='meda_pivot_', dir=self.directory)
+        runs.append(path)
+        with open(file_descriptor, 'w', newline='', encoding='utf-8') as file:
+            csv.writer(file).writerows(entries)
+        entries.clear()
+
+    @staticmethod
+    def _read_run(path: str) -> Iterator[_Entry]:
+        with open(path, newline='', encoding='utf-8') as file:
+            for ident, data_key, value in csv.reader(file):
+                yield ident, data_key, value
+
+    def __call__(self, rows: Iterable[Mapping[str, str]]) -> Iterator[Dict[str, str]]:
+        """ The wide data_dicts sorted by ident """
+        entries: List[_Entry] = []
+        runs: List[str] = []
+        try:
+            for row in rows:
+                entries.append((row[self.ident_key],
+                                self._data_key(row[self.slot_key], row[self.measurement_key]),
+                                row[self.value_key]))
+                if len(entries) >= self.max_rows:
+                    self._write_run(entries, runs)
+            entries.sort(key=itemgetter(0))
+            # merge is stable, such that the runs and the buffer are merged in row order
+            merged = heapq.merge(*[self._read_run(path) for path in runs], entries, key=itemgetter(0))
+            empty = dict.fromkeys(self._input_keys, self.missing)
+            for ident, group in groupby(merged, key=itemgetter(0)):
+                data_dict = empty.copy()
+                data_dict[self.ident_key] = ident
+                for _, data_key, value in group:
+                    data_dict[data_key] = value
+                yield data_dict
+        finally:
+            for path in runs:
+                os.remove(path)
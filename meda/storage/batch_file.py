@@ -0,0 +1,316 @@
+import json
+import mmap
+import pickle
+import struct
+from array import array
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Tuple, Any, Iterable, Iterator, Callable, Optional, Union
+
+from meda.dataclass.dataclass import FeatureDataclassMeta, FeatureDataclass, UniqueCommonFeatureDataclass
+
+_MAGIC = b'MEDABAT1'
+_ALIGNMENT = 8
+_DATETIME_ORIGIN = datetime(1, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+_Section = Union[bytes, array]
+_Column = Tuple[str, Dict[str, Any], List[_Section]]
+""" The kind, the meta data and the sections of an encoded column """
+
+_numeric_kinds = {float: ('float', 'd'), int: ('int', 'q')}
+
+
+def _mask(values: List[Any]) -> array:
+    return array('B', [value is None for value in values])
+
+
+def _dictionary(values: List[Any], kind: str) -> _Column:
+    """ Strings and bytes are dictionary encoded, such that repeated values are stored once """
+    codes = array('i')
+    dictionary: Dict[Any, int] = {}
+    for value in values:
+        codes.append(-1 if value is None else dictionary.setdefault(value, len(dictionary)))
+    blobs = [value.encode('utf-8') if kind == 'str' else value for value in dictionary]
+    offsets = array('q', [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+    return kind, {}, [codes, offsets, b''.join(blobs)]
+
+
+def _encode(values: List[Any], rows: Dict[int, int]) -> _Column:
+    """ Encodes a column by the python type of its values, columns of mixed or other types are pickled """
+    present = [value for value in values if value is not None]
+    types = {type(value) for value in present}
+    value_type = types.pop() if len(types) == 1 else None
+    if value_type in _numeric_kinds:
+        kind, typecode = _numeric_kinds[value_type]
+        return kind, {}, [array(typecode, [0 if value is None else value for value in values]), _mask(values)]
+    elif value_type is bool:
+        return 'bool', {}, [array('b', [-1 if value is None else value for value in values])]
+    elif value_type is date:
+        return 'date', {}, [array('i', [0 if value is None else value.toordinal() for value in values])]
+    elif value_type is datetime and all(value.tzinfo is None for value in present):
+        return 'datetime', {}, [array('q', [0 if value is None else (value - _DATETIME_ORIGIN) // _MICROSECOND
+                                            for value in values]), _mask(values)]
+    elif value_type is timedelta:
+        return 'timedelta', {}, [array('q', [0 if value is None else value // _MICROSECOND for value in values]),
+                                 _mask(values)]
+    elif value_type is str or value_type is bytes:
+        return _dictionary(values, value_type.__name__)
+    elif isinstance(value_type, FeatureDataclassMeta):
+        return 'child', {'class': value_type.__name__}, [array('i', [-1 if value is None else rows[id(value)]
+                                                                     for value in values])]
+    elif value_type is tuple or value_type is frozenset:
+        children = [child for value in present for child in value]
+        child_types = {type(child) for child in children}
+        if len(child_types) == 1 and isinstance(next(iter(child_types)), FeatureDataclassMeta):
+            offsets = array('q', [0])
+            for value in values:
+                offsets.append(offsets[-1] + (0 if value is None else len(value)))
+            indices = array('i', [rows[id(child)] for child in children])
+            return 'children', {'class': next(iter(child_types)).__name__, 'container': value_type.__name__}, \
+                [offsets, indices, _mask(values)]
+        elif len(children) == 0:
+            return 'children', {'class': None, 'container': value_type.__name__}, \
+                [array('q', [0] * (len(values) + 1)), array('i'), _mask(values)]
+    elif len(present) == 0:
+        return 'none', {}, []
+    return 'pickle', {}, [pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL)]
+
+
+def write_batch(path: str,
+                feature_dataclass: FeatureDataclassMeta,
+                instances: Iterable[Union[FeatureDataclass, UniqueCommonFeatureDataclass]]) -> int:
+    """
+    Writes instances of feature_dataclass to path in the columnar batch format read by BatchReader. The instances
+    of each dataclass in the trees are stored as a table with one column per field, where an instance shared by
+    several parents, e.g. an interned configuration, is stored once. The header holds the schema_fingerprint of each
+    class, such that a batch is only read by an unchanged schema.
+    :return: The number of bytes written
+    """
+    roots = list(instances)
+    tables: Dict[FeatureDataclassMeta, List[Any]] = {}
+    rows: Dict[int, int] = {}
+    """ The row of each instance by id, the instances are kept alive by the roots """
+    unique_rows: Dict[UniqueCommonFeatureDataclass, int] = {}
+    """ The row of each unique common instance, equal instances are immutable and share a row """
+    child_names: Dict[FeatureDataclassMeta, Tuple[str, ...]] = {}
+
+    def collect(instance: Any):
+        if id(instance) in rows:
+            return
+        cls = type(instance)
+        table = tables.setdefault(cls, [])
+        if isinstance(instance, UniqueCommonFeatureDataclass):
+            try:
+                row = unique_rows.setdefault(instance, len(table))
+            except TypeError:
+                # unhashable fields, e.g. json mappings
+                row = len(table)
+            rows[id(instance)] = row
+            if row < len(table):
+                return
+        else:
+            rows[id(instance)] = len(table)
+        table.append(instance)
+        names = child_names.get(cls)
+        if names is None:
+            names = child_names[cls] = tuple(field.name for field in cls.features if field.type_info.is_dataclass)
+        for name in names:
+            value = getattr(instance, name)
+            for child in value if isinstance(value, (tuple, frozenset)) else (value,):
+                if isinstance(type(child), FeatureDataclassMeta):
+                    collect(child)
+
+    for root in roots:
+        if type(root) is not feature_dataclass:
+            raise TypeError(f"Error: the batch of {feature_dataclass.__name__} contains a {type(root).__name__}")
+        collect(root)
+    if len({cls.__name__ for cls in tables}) != len(tables):
+        raise ValueError(f"Error: the classes of a batch should have unique names, but are {list(tables)}")
+
+    sections: List[_Section] = []
+    position = 0
+
+    def locate(section: _Section) -> List[int]:
+        nonlocal position
+        data = section.tobytes() if isinstance(section, array) else section
+        sections.append(data + b'\0' * (-len(data) % _ALIGNMENT))
+        position += len(sections[-1])
+        return [position - len(sections[-1]), len(data)]
+
+    classes = []
+    for cls, table in tables.items():
+        columns = {}
+        for field in cls.features:
+            values = [getattr(instance, field.name) for instance in table]
+            try:
+                kind, meta, column_sections = _encode(values, rows)
+            except OverflowError:
+                # integers beyond 64 bit
+                kind, meta, column_sections = 'pickle', {}, [pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL)]
+            columns[field.name] = {'kind': kind, **meta, 'sections': [locate(section) for section in column_sections]}
+        classes.append({'name': cls.__name__, 'fingerprint': cls.schema_fingerprint, 'rows': len(table),
+                        'columns': columns})
+    header = json.dumps({'root': feature_dataclass.__name__,
+                         'roots': locate(array('i', [rows[id(root)] for root in roots])),
+                         'classes': classes}).encode('utf-8')
+    header += b' ' * (-(len(_MAGIC) + 8 + len(header)) % _ALIGNMENT)
+
+    with open(path, 'wb') as file:
+        file.write(_MAGIC)
+        file.write(struct.pack('<Q', len(header)))
+        file.write(header)
+        for section in sections:
+            file.write(section)
+        return file.tell()
+
+
+def _dataclass_tree(feature_dataclass: FeatureDataclassMeta) -> Dict[str, FeatureDataclassMeta]:
+    """ All dataclasses of the tree of feature_dataclass by name """
+    classes = {}
+    pending = [feature_dataclass]
+    while len(pending) > 0:
+        cls = pending.pop()
+        if cls.__name__ not in classes:
+            classes[cls.__name__] = cls
+            pending.extend(field.type_info.base_type for field in cls.features if field.type_info.is_dataclass)
+    return classes
+
+
+class BatchReader:
+    """
+    Reads a batch written by write_batch. The file is memory mapped and instances are rebuilt on access, i.e. only
+    the columns of the accessed classes are decoded, and numeric columns are read from the mapped file without a copy:
+    >>> with BatchReader(path, SomeDataclass) as reader:
+    >>>     registry.write(session, reader)
+
+    Rebuilt unique common instances are cached by their row, such that e.g. an interned configuration is shared again
+    by all parents. The table of a unique common class holds each distinct instance once, which bounds the cache by
+    the distinct values of the batch. Instances of other classes, including the roots, are rebuilt on every access.
+    """
+
+    def __init__(self, path: str, feature_dataclass: FeatureDataclassMeta):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views: List[memoryview] = []
+        try:
+            if self._mmap[:len(_MAGIC)] != _MAGIC:
+                raise ValueError(f"Error: {path} is not a batch file")
+            header_length, = struct.unpack_from('<Q', self._mmap, len(_MAGIC))
+            header_end = len(_MAGIC) + 8 + header_length
+            header = json.loads(self._mmap[len(_MAGIC) + 8:header_end].decode('utf-8'))
+            self._data = self._view(memoryview(self._mmap)[header_end:])
+
+            classes = _dataclass_tree(feature_dataclass)
+            if header['root'] != feature_dataclass.__name__:
+                raise ValueError(f"Error: {path} is a batch of {header['root']}, not of {feature_dataclass.__name__}")
+            self._classes: Dict[str, Tuple[FeatureDataclassMeta, Dict[str, Any]]] = {}
+            for entry in header['classes']:
+                cls = classes.get(entry['name'])
+                if cls is None or cls.schema_fingerprint != entry['fingerprint']:
+                    raise ValueError(f"Error: the schema of {entry['name']} is unknown or changed since {path} was written")
+                self._classes[entry['name']] = (cls, entry['columns'])
+            self._root = feature_dataclass.__name__
+            self._roots = self._section(header['roots'], 'i')
+        except Exception:
+            self.close()
+            raise
+        self._getters: Dict[str, List[Tuple[str, Callable[[int], Any]]]] = {}
+        self._instances: Dict[Tuple[str, int], UniqueCommonFeatureDataclass] = {}
+        self._cached = {name for name, (cls, _) in self._classes.items()
+                        if issubclass(cls, UniqueCommonFeatureDataclass) and name != self._root}
+        """ The names of the classes whose instances are cached """
+
+    def _view(self, view: memoryview) -> memoryview:
+        self._views.append(view)
+        return view
+
+    def _section(self, section: List[int], typecode: Optional[str] = None) -> memoryview:
+        offset, length = section
+        view = self._view(self._data[offset:offset + length])
+        return view if typecode is None else self._view(view.cast(typecode))
+
+    def _getter(self, column: Dict[str, Any]) -> Callable[[int], Any]:
+        kind, sections = column['kind'], column['sections']
+        if kind == 'float' or kind == 'int':
+            values, mask = self._section(sections[0], 'd' if kind == 'float' else 'q'), self._section(sections[1], 'B')
+            return lambda row: None if mask[row] else values[row]
+        elif kind == 'bool':
+            flags = self._section(sections[0], 'b')
+            return lambda row: None if flags[row] < 0 else flags[row] == 1
+        elif kind == 'date':
+            ordinals = self._section(sections[0], 'i')
+            return lambda row: date.fromordinal(ordinals[row]) if ordinals[row] else None
+        elif kind == 'datetime' or kind == 'timedelta':
+            microseconds, mask = self._section(sections[0], 'q'), self._section(sections[1], 'B')
+            origin = _DATETIME_ORIGIN if kind == 'datetime' else timedelta(0)
+            return lambda row: None if mask[row] else origin + microseconds[row] * _MICROSECOND
+        elif kind == 'str' or kind == 'bytes':
+            codes, offsets, blob = [self._section(section, typecode)
+                                    for section, typecode in zip(sections, ['i', 'q', None])]
+            dictionary: List[Any] = [None] * (len(offsets) - 1)
+            """ the values are decoded on first access and shared by all rows of the code """
+
+            def value(row: int) -> Any:
+                code = codes[row]
+                if code < 0:
+                    return None
+                decoded = dictionary[code]
+                if decoded is None:
+                    decoded = bytes(blob[offsets[code]:offsets[code + 1]])
+                    decoded = dictionary[code] = decoded.decode('utf-8') if kind == 'str' else decoded
+                return decoded
+            return value
+        elif kind == 'child':
+            indices, name = self._section(sections[0], 'i'), column['class']
+            return lambda row: None if indices[row] < 0 else self._instance(name, indices[row])
+        elif kind == 'children':
+            offsets, indices, mask = [self._section(section, typecode)
+                                      for section, typecode in zip(sections, ['q', 'i', 'B'])]
+            name, container = column['class'], tuple if column['container'] == 'tuple' else frozenset
+            return lambda row: None if mask[row] else \
+                container([self._instance(name, indices[index]) for index in range(offsets[row], offsets[row + 1])])
+        elif kind == 'none':
+            return lambda row: None
+        values = pickle.loads(self._section(sections[0]))
+        return values.__getitem__
+
+    def _instance(self, name: str, row: int) -> Any:
+        cached = name in self._cached
+        instance = self._instances.get((name, row)) if cached else None
+        if instance is None:
+            cls, columns = self._classes[name]
+            getters = self._getters.get(name)
+            if getters is None:
+                getters = self._getters[name] = [(field, self._getter(column)) for field, column in columns.items()]
+            instance = cls(**{field: getter(row) for field, getter in getters})
+            if cached:
+                self._instances[(name, row)] = instance
+        return instance
+
+    def __len__(self) -> int:
+        return len(self._roots)
+
+    def __getitem__(self, index: int) -> Union[FeatureDataclass, UniqueCommonFeatureDataclass]:
+        return self._instance(self._root, self._roots[index])
+
+    def __iter__(self) -> Iterator[Union[FeatureDataclass, UniqueCommonFeatureDataclass]]:
+        for index in range(len(self)):
+            yield self[index]
+
+    def close(self):
+        """ Releases the mapped file, instances which were already rebuilt stay valid """
+        for view in reversed(getattr(self, '_views', [])):
+            view.release()
+        self._views = []
+        self._getters = {}
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> 'BatchReader':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,60 @@
+from typing import Optional, NamedTuple
+
+from sqlalchemy import Table, MetaData, Column, String, Integer, BigInteger
+from sqlalchemy.orm import Session
+
+
+class CheckpointState(NamedTuple):
+    batch: int
+    """ The number of committed chunks """
+    offset: Optional[int]
+    """ The input offset after the last committed record, None if nothing is committed """
+    rows: int
+    """ The number of written root objects """
+
+
+class Checkpoint:
+    """
+    The progress of a resumable ingestion, stored as a row of a checkpoint table in the target database. The row is
+    updated in the transaction of each written chunk, see DTORegistry.write_resumable, such that the stored offset
+    always matches the committed data. On restart the source is read from the stored offset:
+    >>> checkpoint = Checkpoint('labs_2026', metadata)
+    >>> bound = factory.bind(SomeDataclass, reader.header)
+    >>> records = ((offset, bound.generator(row)[0]) for offset, row in reader.records(checkpoint.load(session).offset))
+    >>> registry.write_resumable(session, checkpoint, records)
+    """
+    def __init__(self, name: str, metadata: Optional[MetaData] = None, table_name: str = 'meda_checkpoint'):
+        """
+        :param name: The name of the ingestion job, i.e. the key of the checkpoint row
+        :param metadata: The metadata of the checkpoint table, e.g. the metadata of the registered dataclass
+        :param table_name: The name of the checkpoint table shared by all jobs of the metadata
+        """
+        metadata = metadata if metadata is not None else MetaData()
+        # the table is shared by all checkpoints of the metadata
+        table = metadata.tables.get(table_name if metadata.schema is None else f"{metadata.schema}.{table_name}")
+        if table is None:
+            table = Table(table_name, metadata,
+                          Column('name', String, primary_key=True),
+                          Column('batch', Integer, nullable=False),
+                          Column('offset', BigInteger, nullable=True),
+                          Column('rows', BigInteger, nullable=False))
+        self.name = name
+        self.table = table
+
+    def load(self, session: Session) -> CheckpointState:
+        """ The committed state of the job, an empty state for a new job """
+        row = session.execute(self.table.select().where(self.table.c.name == self.name)).first()
+        if row is None:
+            return CheckpointState(batch=0, offset=None, rows=0)
+        return CheckpointState(batch=row.batch, offset=row.offset, rows=row.rows)
+
+    def save(self, session: Session, state: CheckpointState):
+        """ Stores state in the current transaction of session, the caller commits """
+        values = {'batch': state.batch, 'offset': state.offset, 'rows': state.rows}
+        result = session.execute(self.table.update().where(self.table.c.name == self.name).values(**values))
+        if result.rowcount == 0:
+            session.execute(self.table.insert().values(name=self.name, **values))
+
+    def reset(self, session: Session):
+        """ Deletes the state of the job in the current transaction of session, e.g. to restart from the beginning """
+        session.execute(self.table.delete().where(self.table.c.name == self.name))
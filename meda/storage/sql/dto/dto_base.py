@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional, Union
+from typing import List, Dict, Optional, Union, Type, Tuple
 
 import sqlalchemy
 from sqlalchemy import Table
@@ -8,6 +8,38 @@ from meda.dataclass.dataclass import FeatureDataclass, FeatureDataclassMeta, Uni
 from meda.storage.sql.unique import UniqueMixin
 
 
+class LookupDTOBase(UniqueMixin):
+    """
+    The autogenerated DTO of a dictionary table holding the distinct values of a Feature with lookup_table=True.
+    Data tables reference the values by an integer foreign key. Within a session, the values are deduplicated by the
+    UniqueMixin cache on write and resolved from the identity map on read, such that each value is loaded once.
+    The session unique cache serves as the in-memory dictionary from value to ident: DTORegistry.write keeps the most
+    recently used lookup DTOs, including their ident, in the session between chunks. The cache is not shared across
+    sessions, since their databases and transactions differ, e.g. an ident of a rolled back insert is not valid.
+    """
+
+    value: str
+
+    def __init__(self, value: str):
+        self.value = value
+
+    @classmethod
+    def table(cls) -> Table:
+        return sqlalchemy.inspection.inspect(cls).local_table
+
+    @classmethod
+    def unique_filter(cls, query: Query, domain: str):
+        return query.filter(cls.value == domain)
+
+    @classmethod
+    def unique_hash(cls, domain: str):
+        return domain
+
+    @classmethod
+    def from_domain(cls, domain: str) -> 'LookupDTOBase':
+        return cls(value=domain)
+
+
 class DTOBase(UniqueMixin):
     """
     The autogenerated DTO corresponding to an Assessment or AssessorConfig dataclass.
@@ -26,6 +58,8 @@ class DTOBase(UniqueMixin):
     """The mapping of sub-assessment DTOs in 1-to-many relationship"""
     _common_unique_dtos: Dict[str, 'DTOBase']
     """The mapping of DTOs with pointing to foreign key constraint in many-to-1 relationship, e.g. config_dto"""
+    _lookup_dtos: Dict[str, Type[LookupDTOBase]]
+    """The mapping of str fields to the DTOs of their dictionary tables in many-to-1 relationship"""
 
     _required_params: frozenset
     _optional_params: frozenset
@@ -44,7 +78,8 @@ class DTOBase(UniqueMixin):
                   temporary_fields: List[str],
                   optional_dtos: Dict[str, 'DTOBase'],
                   list_dtos: Dict[str, 'DTOBase'],
-                  common_unique_dtos: Dict[str, 'DTOBase']):
+                  common_unique_dtos: Dict[str, 'DTOBase'],
+                  lookup_dtos: Optional[Dict[str, Type[LookupDTOBase]]] = None):
 
         cls._source_class = source_class
 
@@ -53,11 +88,13 @@ class DTOBase(UniqueMixin):
         cls._optional_dtos = optional_dtos
         cls._list_dtos = list_dtos
         cls._common_unique_dtos = common_unique_dtos
+        cls._lookup_dtos = {} if lookup_dtos is None else lookup_dtos
 
         cls._required_params = frozenset(
             set.union({f for f in fields},
                       {f"{f}_dto" for f in list_dtos.keys()},
-                      {f"{f}_dto" for f in common_unique_dtos.keys()}))
+                      {f"{f}_dto" for f in common_unique_dtos.keys()},
+                      {f"{f}_dto" for f in cls._lookup_dtos.keys()}))
         cls._optional_params = frozenset({f"{f}_dto" for f in optional_dtos.keys()})
 
         cls._temporary_fields = {f: None for f in temporary_fields}
@@ -132,13 +169,35 @@ class DTOBase(UniqueMixin):
 
     @classmethod
     def from_domain(cls, domain: Union[UniqueCommonFeatureDataclass, FeatureDataclass],
-                    session: Optional[Session] = None) -> Optional['DTOBase']:
+                    session: Optional[Session] = None,
+                    lookups: Optional[Dict[Tuple[Type[LookupDTOBase], str], LookupDTOBase]] = None) \
+            -> Optional['DTOBase']:
+        """
+        :param session: The session resolving the unique common and lookup DTOs, if None only the column fields and
+                        lookup values are converted.
+        :param lookups: Without a session, the lookup DTOs by class and value shared by all calls given the same dict,
+                        such that DTOs added to a session later do not insert a value twice into its dictionary table.
+        """
         if domain is None:
             return None
+        lookups = {} if lookups is None else lookups
 
         # column fields
         kwargs = {f: getattr(domain, f) for f in cls._fields}
 
+        # Optional[str] lookup values: 0/1 -> N
+        for field_name, field_dto in cls._lookup_dtos.items():
+            value = getattr(domain, field_name)
+            if value is None:
+                dto = None
+            elif session is not None:
+                dto = field_dto.as_unique(domain=value, session=session)
+            else:
+                dto = lookups.get((field_dto, value))
+                if dto is None:
+                    dto = lookups[(field_dto, value)] = field_dto.from_domain(domain=value)
+            kwargs.update({f"{field_name}_dto": dto})
+
         # dto fields
         if session is not None:
             # Optional[Dataclass]: 0/1 -> 1
@@ -174,6 +233,11 @@ class DTOBase(UniqueMixin):
         for f in list(self._optional_dtos.keys()) + list(self._common_unique_dtos.keys()):
             kwargs.update({f: getattr(self, f + "_dto").to_domain() if getattr(self, f + "_dto") is not None else None})
 
+        # Optional[str] lookup values: 0/1 -> N
+        # note: the lookup dtos are resolved from the session identity map once they are loaded
+        for f in self._lookup_dtos.keys():
+            kwargs.update({f: getattr(self, f + "_dto").value if getattr(self, f + "_dto") is not None else None})
+
         # add none initialized temporary fields
         kwargs.update(self._temporary_fields)
 
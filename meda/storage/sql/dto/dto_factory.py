@@ -7,13 +7,12 @@ from sqlalchemy import Date, DateTime, Integer, LargeBinary, String, Float, Bool
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql.sqltypes import JSON
 from sqlalchemy.orm import relationship, mapper
+from sqlalchemy.ext.associationproxy import association_proxy
 
-from meda.dataclass.feature import Feature
+from meda.dataclass.feature import Feature, TypeCategory
 from meda.dataclass.dataclass import FeatureDataclassMeta, UniqueCommonFeatureDataclass, \
-    is_unique_common_feature_dataclass, HeadSeriesFeatureDataclass, is_feature_dataclass, NestSeriesFeatureDataclass, \
-    is_nest_series_feature_dataclass, is_series_dataclass
-from meda.dataclass.reflection import is_optional, get_nested_type, get_nested_optionals, get_type
-from meda.storage.sql.dto.dto_base import DTOBase
+    HeadSeriesFeatureDataclass, NestSeriesFeatureDataclass, NestSeriesFeatureDataclassMeta
+from meda.storage.sql.dto.dto_base import DTOBase, LookupDTOBase
 
 
 class DTOFactory:
@@ -50,15 +49,39 @@ class DTOFactory:
         """ The data table foreign key column pointing to a unique constraint table holding common values """
         return Column(field.name, BigInteger().with_variant(Integer, 'sqlite'),
                       ForeignKey(column=unique_common_dto_cls.table().columns['ident']),
-                      nullable=is_optional(field.type))
+                      nullable=field.type_info.optional,
+                      comment=field.comment)
+
+    @staticmethod
+    def _generate_lookup_dto_class(field: Feature, metadata: MetaData, table_name: str) -> Type[LookupDTOBase]:
+        """
+        Generates the DTO class of the dictionary table of a lookup_table field. The comment of the field is set for
+        the value column as well as for the foreign key column of the data table.
+        """
+        if field.unique_index:
+            raise TypeError(f"Lookup tables are not supported for unique_index fields: {field}")
+        lookup_table = Table(f"{table_name}_{field.name}_lookup", metadata,
+                             Column("ident", BigInteger().with_variant(Integer, "sqlite"),
+                                    primary_key=True, autoincrement=True),
+                             Column("value", String, nullable=False, unique=True, comment=field.comment),
+                             extend_existing=True)
+
+        # Create a fresh LookupDTOBase class, see DTO classes below
+        class LookupDTO(LookupDTOBase):
+            pass
+
+        mapper(LookupDTO, lookup_table)
+        return LookupDTO
 
     @classmethod
     def _build_base_type_column(cls, field: Feature) -> Column:
         """ Helper function creating sqlalchemy table column for fields"""
-        nullable = is_optional(field.type)
-        data_type = cls.base_types[get_nested_type(field.type) if nullable else field.type]
+        nullable = field.type_info.optional
+        data_type = cls.base_types[field.type_info.base_type]
+        # the ident field is indexed for the point lookup of DTORegistry.get, it is not unique since rows may be
+        # ingested again
         column_options = {'nullable': nullable,
-                          'index': field.unique_index,
+                          'index': field.unique_index or field.is_ident_field,
                           'unique': field.unique_index,
                           'comment': field.comment}
 
@@ -113,6 +136,7 @@ class DTOFactory:
             unique_dtos: Dict[str, DTOBase] = {}
             optional_dtos: Dict[str, DTOBase] = {}
             set_dtos: Dict[str, DTOBase] = {}
+            lookup_dtos: Dict[str, Type[LookupDTOBase]] = {}
             foreign_key_columns: Dict[str, Column] = {}
 
             # Extract all class related fields
@@ -138,7 +162,7 @@ class DTOFactory:
             #   - Generate the the unique-constraint-dataclass dto class and load from recursive cache
             #   - Generate a foreign key column to the related common unique table
             for field in dto_field_dict['UniqueCommon']:
-                sub_feature_dataclass_cls = get_nested_optionals(field.type)
+                sub_feature_dataclass_cls = field.type_info.base_type
                 yield from cls._recursive_dto_class_generator(metadata=metadata,
                                                               source_class=sub_feature_dataclass_cls,
                                                               parent_table=None)
@@ -146,6 +170,15 @@ class DTOFactory:
                 foreign_key_columns[field.name] = cls._unique_common_table_foreign_key_column(
                     field=field, unique_common_dto_cls=unique_dtos[field.name])
 
+            # If applicable:
+            #   - Generate the dictionary table dto class of lookup_table fields
+            #   - Generate a foreign key column to the dictionary table
+            for field in dto_field_dict['Lookup']:
+                lookup_dtos[field.name] = cls._generate_lookup_dto_class(field=field, metadata=metadata,
+                                                                         table_name=table_name)
+                foreign_key_columns[field.name] = cls._unique_common_table_foreign_key_column(
+                    field=field, unique_common_dto_cls=lookup_dtos[field.name])
+
             # Determine unique constraint
             unique_constraint = UniqueConstraint(*columns) \
                 if issubclass(source_class, UniqueCommonFeatureDataclass) else None
@@ -161,19 +194,19 @@ class DTOFactory:
             # Generate all related dtos and load from recursive cache
             # todo: simplify all for loops below to one general and fix annotations
             for field in dto_field_dict['FeatureDataclass']:
-                sub_feature_dataclass_cls = get_nested_optionals(field.type)
+                sub_feature_dataclass_cls = field.type_info.base_type
                 yield from cls._recursive_dto_class_generator(metadata=metadata,
                                                               source_class=sub_feature_dataclass_cls,
                                                               parent_table=database_table)
                 optional_dtos[field.name] = cls._dto_producer_cache[cls.get_table_name(sub_feature_dataclass_cls)]
             for field in dto_field_dict['HeadSeries']:
-                sub_feature_dataclass_cls = get_type(field.type)
+                sub_feature_dataclass_cls = field.type_info.base_type
                 yield from cls._recursive_dto_class_generator(metadata=metadata,
                                                               source_class=sub_feature_dataclass_cls,
                                                               parent_table=database_table)
                 set_dtos[field.name] = cls._dto_producer_cache[cls.get_table_name(sub_feature_dataclass_cls)]
             for field in dto_field_dict['NestSeries']:
-                sub_feature_dataclass_cls = get_type(field.type)
+                sub_feature_dataclass_cls = field.type_info.base_type
                 yield from cls._recursive_dto_class_generator(metadata=metadata,
                                                               source_class=sub_feature_dataclass_cls,
                                                               parent_table=database_table)
@@ -189,7 +222,8 @@ class DTOFactory:
                           temporary_fields=temporary_fields,
                           optional_dtos=optional_dtos,
                           list_dtos=set_dtos,
-                          common_unique_dtos=unique_dtos)
+                          common_unique_dtos=unique_dtos,
+                          lookup_dtos=lookup_dtos)
 
             # Instrument the DTO class using the sqlalchemy mapper
             # Docu can be found at: https://docs.sqlalchemy.org/en/13/orm/mapping_api.html
@@ -206,8 +240,15 @@ class DTOFactory:
             for field_name, dto in unique_dtos.items():
                 properties[f"{field_name}_dto"] = relationship(dto, uselist=False, lazy="select",
                                                                foreign_keys=foreign_key_columns[field_name])
+            for field_name, dto in lookup_dtos.items():
+                properties[f"{field_name}_dto"] = relationship(dto, uselist=False, lazy="select",
+                                                               foreign_keys=foreign_key_columns[field_name])
             mapper(DTO, database_table, properties=properties)
 
+            # Expose the values of lookup_table fields for queries, e.g. DTO.unit_value == 'mg'
+            for field_name in lookup_dtos.keys():
+                setattr(DTO, f"{field_name}_value", association_proxy(f"{field_name}_dto", "value"))
+
             # Add generated DTO class to cache and yield
             cls._dto_producer_cache.update({table_name: DTO})
             yield DTO
@@ -226,33 +267,40 @@ class DTOFactory:
         dto_field_dict: Dict[FeatureDataclassMeta: Set[Feature]] = {'FeatureDataclass': set(),
                                                                     'UniqueCommon': set(),
                                                                     'HeadSeries': set(),
-                                                                    'NestSeries': set()}
+                                                                    'NestSeries': set(),
+                                                                    'Lookup': set()}
 
         generic_columns.append(
             Column(
                 "ident",
                 BigInteger().with_variant(Integer, "sqlite"),
                 primary_key=True,
-                autoincrement=not ('ident' in set([field.name for field in source_cls.features]))
+                autoincrement=not ('ident' in source_cls.features_by_name)
             )
         )
 
+        source_is_series = isinstance(source_cls, NestSeriesFeatureDataclassMeta)
         for field in source_cls.features:
             # todo: check if we should handle series unique dataclasses separately
+            type_info = field.type_info
             if field.name == 'ident':
                 base_fields.append(field.name)
             elif field.temporary:
                 temporary_fields.append(field.name)
-            elif get_nested_optionals(field.type) in cls.base_types.keys():
+            elif field.lookup_table:
+                if issubclass(source_cls, UniqueCommonFeatureDataclass):
+                    raise TypeError(f"Lookup tables are not supported for unique common dataclass fields: {field}")
+                dto_field_dict['Lookup'].add(field)
+            elif type_info.container is None and type_info.category in {TypeCategory.BASE, TypeCategory.JSON}:
                 columns.append(cls._build_base_type_column(field=field))
                 base_fields.append(field.name)
-            elif is_unique_common_feature_dataclass(field.type):
+            elif type_info.is_unique_common:
                 dto_field_dict['UniqueCommon'].add(field)
-            elif is_feature_dataclass(field.type):
+            elif type_info.category is TypeCategory.FEATURE_DATACLASS:
                 dto_field_dict['FeatureDataclass'].add(field)
-            elif is_series_dataclass(field.type) and not is_series_dataclass(source_cls):
+            elif type_info.is_series and not source_is_series:
                 dto_field_dict['HeadSeries'].add(field)
-            elif is_nest_series_feature_dataclass(field.type):
+            elif type_info.category is TypeCategory.NEST_SERIES:
                 dto_field_dict['NestSeries'].add(field)
             else:
                 raise TypeError(f"The storage engine detected an unsupported type in the assessment class: {field}")
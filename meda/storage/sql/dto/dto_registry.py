@@ -1,9 +1,13 @@
-from typing import Optional, Dict, Union, Tuple
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Union, Tuple, Iterable, List, Set, Hashable, Any
 
 from sqlalchemy import Table, MetaData
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 from meda.dataclass.dataclass import FeatureDataclass, UniqueCommonFeatureDataclass, FeatureDataclassMeta
+from meda.storage.sql.checkpoint import Checkpoint, CheckpointState
 from meda.storage.sql.dto.dto_base import DTOBase
 from meda.storage.sql.dto.dto_factory import DTOFactory
 
@@ -44,7 +48,13 @@ class DTORegistry:
             unique constraint on all remaining plain data columns
     """
 
-    def __init__(self):
+    def __init__(self, cache_size: int = 1024):
+        """
+        :param cache_size: The number of root feature_dataclasses held by the LRU cache of get, 0 disables the cache.
+        """
+        if cache_size < 0:
+            raise ValueError(f"Error: cache_size should not be negative, but is {cache_size}")
+
         self._by_feature_dataclass_class: Dict[FeatureDataclassMeta, DTOBase] = dict()
         """
         This is a registry for a reduced view of the toplevel DTOs to which the parent foreign keys of the registered
@@ -52,6 +62,9 @@ class DTORegistry:
         (big) integer column 'ident' used as the foreign key target.
         """
 
+        self._by_table_name: Dict[str, DTOBase] = dict()
+        """ The toplevel DTOs organized by the table name of the registered feature_dataclass """
+
         self._metadatas: Dict[FeatureDataclassMeta, MetaData] = dict()
         """
         This is a registry for the SQLAlchemy metadata objects that will be used for all created ORM mappings
@@ -74,6 +87,16 @@ class DTORegistry:
         table will have a foreign_key relation to the parent table.
         """
 
+        self._ident_fields: Dict[FeatureDataclassMeta, str] = dict()
+        """ The name of the is_ident_field, or else of the primary key field ident, of the registered classes """
+
+        self._cache: 'OrderedDict[Tuple[FeatureDataclassMeta, Hashable], FeatureDataclass]' = OrderedDict()
+        """ The LRU cache of get, the immutable root feature_dataclasses by class and ident """
+        self._cache_size = cache_size
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0
+        """ The number of invalidations, a lookup only caches its result if no invalidation happened meanwhile """
+
     def __len__(self):
         return len(self._by_feature_dataclass_class)
 
@@ -113,11 +136,212 @@ class DTORegistry:
     def from_domain(self, session: Session,
                     feature_dataclass: Union[FeatureDataclass, UniqueCommonFeatureDataclass],
                     name: Optional[str] = None):
+        """
+        Creates the DTO for given feature_dataclass. The DTO class is looked up by the feature_dataclass class,
+        or by the table name if name is given.
+        """
         if name is not None:
             return self._by_table_name[name].from_domain(domain=feature_dataclass, session=session)
         return self._by_feature_dataclass_class[type(feature_dataclass)].from_domain(domain=feature_dataclass,
                                                                                      session=session)
 
+    def get(self, session: Session,
+            feature_dataclass_cls: FeatureDataclassMeta,
+            ident: Hashable) -> Optional[FeatureDataclass]:
+        """
+        Looks up the root feature_dataclass of a registered class by the value of its is_ident_field, or by the primary
+        key ident if the class has no is_ident_field. The ident field column is indexed on registration. The subtree
+        is loaded eagerly by a single joined query instead of a query per lazy relationship, sibling series multiply
+        the joined rows of the single root. If an ident was written
+        several times, e.g. by a repeated ingestion, the latest written row, i.e. the one of the largest primary key,
+        is returned.
+        The frozen result is kept in an LRU cache of cache_size entries, which is invalidated by write and
+        write_resumable. Writes bypassing the registry have to call invalidate. Returns None if no row matches.
+        """
+        key = (feature_dataclass_cls, ident)
+        with self._cache_lock:
+            domain = self._cache.get(key)
+            if domain is not None:
+                self._cache.move_to_end(key)
+                return domain
+            generation = self._cache_generation
+
+        dto_cls = self[feature_dataclass_cls]
+        dto = session.query(dto_cls) \
+            .filter(getattr(dto_cls, self._ident_fields[feature_dataclass_cls]) == ident) \
+            .options(*self._eager_options(dto_cls)) \
+            .order_by(dto_cls.ident.desc()) \
+            .first()
+        if dto is None:
+            return None
+        domain = dto.to_domain()
+
+        with self._cache_lock:
+            # an invalidation during the query might refer to the loaded rows, the result is not cached then
+            if self._cache_size > 0 and generation == self._cache_generation:
+                self._cache[key] = domain
+                self._cache.move_to_end(key)
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        return domain
+
+    @classmethod
+    def _eager_options(cls, dto_cls: DTOBase, parent: Optional[Any] = None) -> List[Any]:
+        """ The joined loader options of all relationships in the DTO tree of dto_cls """
+        options = []
+        related = {**dto_cls._optional_dtos, **dto_cls._list_dtos, **dto_cls._common_unique_dtos,
+                   **dto_cls._lookup_dtos}
+        for field_name, related_dto_cls in related.items():
+            attribute = getattr(dto_cls, f"{field_name}_dto")
+            loader = joinedload(attribute) if parent is None else parent.joinedload(attribute)
+            options.append(loader)
+            if issubclass(related_dto_cls, DTOBase):
+                options.extend(cls._eager_options(related_dto_cls, loader))
+        return options
+
+    def invalidate(self, feature_dataclass_cls: Optional[FeatureDataclassMeta] = None,
+                   ident: Optional[Hashable] = None):
+        """
+        Removes entries from the cache of get: the entry of ident if given, else all entries of feature_dataclass_cls,
+        else all entries. Lookups running concurrently do not cache their result.
+        """
+        with self._cache_lock:
+            self._cache_generation += 1
+            if feature_dataclass_cls is None:
+                self._cache.clear()
+            elif ident is not None:
+                self._cache.pop((feature_dataclass_cls, ident), None)
+            else:
+                for key in [key for key in self._cache.keys() if key[0] is feature_dataclass_cls]:
+                    del self._cache[key]
+
+    def write(self, session: Session,
+              feature_dataclasses: Iterable[Union[FeatureDataclass, UniqueCommonFeatureDataclass]],
+              chunk_size: int = 1000,
+              parent_ident: Optional[int] = None,
+              unique_cache_size: int = 10_000) -> int:
+        """
+        This method writes a stream of feature_dataclasses to the database and commits every chunk_size root objects.
+        After each commit the written DTO graphs are expunged from the session, such that the identity map does not
+        grow with the input size. Only the unique common DTOs held by the session unique cache are kept, which allows
+        later rows to reference them by ident without querying the database again. The cache keeps the
+        unique_cache_size most recently used DTOs, evicted ones are expunged and queried again when they recur.
+        :param session: The session used for writing. Its expire_on_commit flag is disabled while writing.
+        :param feature_dataclasses: The root feature_dataclass instances to write.
+        :param chunk_size: The number of root objects committed together.
+        :param parent_ident: An optional ident of the parent table row, assigned to all root DTOs.
+        :param unique_cache_size: The number of unique common and lookup DTOs kept in the session between chunks.
+        :return: The number of written root objects.
+        """
+        return self._write(session=session,
+                           records=((None, feature_dataclass) for feature_dataclass in feature_dataclasses),
+                           chunk_size=chunk_size,
+                           parent_ident=parent_ident,
+                           unique_cache_size=unique_cache_size)
+
+    def write_resumable(self, session: Session,
+                        checkpoint: Checkpoint,
+                        records: Iterable[Tuple[int, Optional[Union[FeatureDataclass, UniqueCommonFeatureDataclass]]]],
+                        chunk_size: int = 1000,
+                        parent_ident: Optional[int] = None,
+                        unique_cache_size: int = 10_000) -> int:
+        """
+        Like write, but for (offset, feature_dataclass) records of a source, e.g. CsvReader.records. With every chunk
+        the offset of its last record is stored by the checkpoint in the same transaction, such that a restarted
+        ingestion reads the source from checkpoint.load(session).offset without writing a record twice.
+        Records without a feature_dataclass, e.g. dropped rows, are skipped but advance the offset.
+        :param checkpoint: The checkpoint of the ingestion, its table has to exist in the database.
+        :param records: The records following the stored offset of the checkpoint.
+        :param chunk_size: The number of records committed together.
+        :return: The number of written root objects.
+        """
+        return self._write(session=session, records=records, chunk_size=chunk_size, parent_ident=parent_ident,
+                           unique_cache_size=unique_cache_size, checkpoint=checkpoint)
+
+    def _write(self, session: Session,
+               records: Iterable[Tuple[Optional[int], Optional[Union[FeatureDataclass, UniqueCommonFeatureDataclass]]]],
+               chunk_size: int,
+               parent_ident: Optional[int],
+               unique_cache_size: int,
+               checkpoint: Optional[Checkpoint] = None) -> int:
+        if chunk_size < 1:
+            raise ValueError(f"Error: chunk_size has to be positive, but is {chunk_size}")
+        if unique_cache_size < 0:
+            raise ValueError(f"Error: unique_cache_size should not be negative, but is {unique_cache_size}")
+
+        expire_on_commit = session.expire_on_commit
+        session.expire_on_commit = False
+        try:
+            state = checkpoint.load(session) if checkpoint is not None else None
+            counter = 0
+            committed = 0
+            pending = 0
+            offset = None
+            written: Set[Tuple[FeatureDataclassMeta, Optional[Hashable]]] = set()
+
+            def commit(state: Optional[CheckpointState]) -> Optional[CheckpointState]:
+                # the checkpoint is stored in the transaction of the chunk
+                if checkpoint is not None:
+                    state = CheckpointState(batch=state.batch + 1, offset=offset, rows=state.rows + counter - committed)
+                    checkpoint.save(session, state)
+                self._commit_chunk(session=session, unique_cache_size=unique_cache_size)
+                # the cache is invalidated once the chunk is visible to other sessions
+                for feature_dataclass_cls, ident in written:
+                    self.invalidate(feature_dataclass_cls, ident)
+                written.clear()
+                return state
+
+            for offset, feature_dataclass in records:
+                if feature_dataclass is not None:
+                    dto = self.from_domain(session=session, feature_dataclass=feature_dataclass)
+                    if parent_ident is not None:
+                        dto.parent = parent_ident
+                    session.add(dto)
+                    counter += 1
+                    written.add(self._cache_key(feature_dataclass))
+                pending += 1
+                if pending == chunk_size:
+                    state = commit(state)
+                    committed, pending = counter, 0
+            if pending > 0:
+                commit(state)
+        except Exception:
+            # a failure of the source leaves the pending chunk, e.g. for a rollback, the cache might refer to it
+            session._unique_cache = {}
+            raise
+        finally:
+            session.expire_on_commit = expire_on_commit
+        return counter
+
+    def _cache_key(self, feature_dataclass: Union[FeatureDataclass, UniqueCommonFeatureDataclass]) \
+            -> Tuple[FeatureDataclassMeta, Optional[Hashable]]:
+        """ The key of the cache of get, the ident is None, i.e. the whole class, if it is not part of the domain """
+        feature_dataclass_cls = type(feature_dataclass)
+        ident_field = self._ident_fields.get(feature_dataclass_cls)
+        return feature_dataclass_cls, getattr(feature_dataclass, ident_field, None) if ident_field else None
+
+    @staticmethod
+    def _commit_chunk(session: Session, unique_cache_size: int):
+        """
+        Commits the session and expunges all objects except the unique_cache_size most recently used unique common
+        DTOs of the session unique cache
+        """
+        try:
+            session.commit()
+        except Exception:
+            # the cached unique objects might be pending objects of the failed transaction
+            session._unique_cache = {}
+            raise
+
+        cache = getattr(session, '_unique_cache', {})
+        # the cache is ordered by the last use, see UniqueMixin.as_unique
+        for key in list(itertools.islice(cache.keys(), max(len(cache) - unique_cache_size, 0))):
+            del cache[key]
+        keep = {id(obj) for obj in cache.values()}
+        for obj in list(session.identity_map.values()):
+            if id(obj) not in keep:
+                session.expunge(obj)
+
     def register(self,
                  feature_dataclass_cls: FeatureDataclassMeta,
                  metadata: Optional[MetaData] = None,
@@ -151,6 +375,9 @@ class DTORegistry:
                                                                   feature_dataclass_cls=feature_dataclass_cls,
                                                                   parent_table=parent_table)
             self._by_feature_dataclass_class[feature_dataclass_cls] = dto
+            self._by_table_name[table_name] = dto
+            ident_fields = [field.name for field in feature_dataclass_cls.features if field.is_ident_field]
+            self._ident_fields[feature_dataclass_cls] = ident_fields[0] if len(ident_fields) == 1 else 'ident'
             return True
         elif parent_table is not None and parent_table != self._parent_tables[feature_dataclass_cls]:
             raise AttributeError(f"The feature_dataclass class {feature_dataclass_cls} is already registered.\n"
@@ -24,7 +24,9 @@ class UniqueMixin(object):
 
         key = (cls, cls.unique_hash(*arg, **kw))
         if key in cache:
-            return cache[key]
+            # the entry is moved to the end, such that the cache is ordered by the last use
+            obj = cache[key] = cache.pop(key)
+            return obj
         else:
             with session.no_autoflush:
                 q = session.query(cls)
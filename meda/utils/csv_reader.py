@@ -0,0 +1,127 @@
+import csv
+from operator import itemgetter
+from typing import Optional, Iterable, Iterator, Dict, Tuple, List
+
+from meda.dataclass.dataclass import FeatureDataclassMeta
+from meda.utils.predicate import Predicate
+
+
+class CsvReader:
+    """
+    A minimal reader of delimiter separated files with a header line. It yields one data_dict per row as expected by
+    the FeatureDataclassFactory.generator.
+
+    Sources often hold thousands of columns while a dataclass tree reads only a few of them. With columns set,
+    e.g. to required_input_keys(feature_dataclass), the data_dicts only hold the projected columns:
+    >>> for data_dict in CsvReader(path, columns=required_input_keys(SomeDataclass)):
+    >>>     instance, errors = factory.generator(feature_dataclass=SomeDataclass, data_dict=data_dict)
+
+    With where set, rows are filtered on their raw strings before they are yielded, see meda.utils.predicate.
+    """
+
+    def __init__(self,
+                 path: str,
+                 columns: Optional[Iterable[str]] = None,
+                 delimiter: str = ',',
+                 encoding: str = 'utf-8',
+                 where: Optional[Predicate] = None,
+                 feature_dataclass: Optional[FeatureDataclassMeta] = None):
+        """
+        :param path: The path of the file
+        :param columns: The columns to keep, all columns if None
+        :param delimiter: The column delimiter
+        :param encoding: The file encoding
+        :param where: The predicate of the rows to keep, all rows if None. It may refer to columns which are not kept.
+        :param feature_dataclass: The dataclass whose feature types parse the columns of where, see Predicate.compile
+        """
+        self.path = path
+        self.columns = None if columns is None else tuple(sorted(set(columns)))
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self.where = where
+        self.feature_dataclass = feature_dataclass
+
+    @property
+    def header(self) -> Tuple[str, ...]:
+        with open(self.path, newline='', encoding=self.encoding) as file:
+            return tuple(next(csv.reader(file, delimiter=self.delimiter), ()))
+
+    def _projection(self, header: List[str]) -> Tuple[Tuple[str, ...], List[int]]:
+        """ The projected column names and their positions in the header """
+        if self.columns is None:
+            return tuple(header), list(range(len(header)))
+        positions = {column: position for position, column in enumerate(header)}
+        missing = [column for column in self.columns if column not in positions]
+        if len(missing) > 0:
+            raise KeyError(f"Error: columns {missing} are missing in the header of {self.path}")
+        return self.columns, [positions[column] for column in self.columns]
+
+    def rows(self) -> Iterator[List[str]]:
+        """ The plain rows without the header line, e.g. for FeatureDataclassFactory.bind. Columns are not projected """
+        with open(self.path, newline='', encoding=self.encoding) as file:
+            rows = csv.reader(file, delimiter=self.delimiter)
+            header = next(rows, None)
+            if header is None or self.where is None:
+                yield from rows
+            else:
+                yield from filter(self.where.compile(header, self.feature_dataclass), rows)
+
+    def records(self, offset: Optional[int] = None) -> Iterator[Tuple[int, List[str]]]:
+        """
+        The plain rows like rows(), each with the byte offset of the file after the row. Passing such an offset
+        resumes the reading after its row by a seek, e.g. to restart an ingestion at its last checkpoint.
+        The file is split into lines on the newline byte and each line is decoded by itself, hence the encoding has
+        to be ASCII compatible, e.g. utf-8 or latin-1, while a ValueError is raised for e.g. utf-16.
+        :param offset: The byte offset to start at, the end of the header line if None
+        """
+        ascii_bytes = bytes(range(128))
+        try:
+            ascii_compatible = ascii_bytes.decode(self.encoding) == ascii_bytes.decode('ascii')
+        except UnicodeDecodeError:
+            ascii_compatible = False
+        if not ascii_compatible:
+            raise ValueError(f"Error: records requires an ASCII compatible encoding, "
+                             + f"but the encoding is {self.encoding}")
+
+        with open(self.path, 'rb') as file:
+            position = 0
+
+            def lines() -> Iterator[str]:
+                # the csv reader consumes the lines of a single row only, such that position is the end of the row
+                nonlocal position
+                for line in iter(file.readline, b''):
+                    position += len(line)
+                    yield line.decode(self.encoding)
+
+            rows = csv.reader(lines(), delimiter=self.delimiter)
+            header = next(rows, None)
+            if header is None:
+                return
+            test = None if self.where is None else self.where.compile(header, self.feature_dataclass)
+            if offset is not None:
+                file.seek(offset)
+                position = offset
+            for row in rows:
+                if test is None or test(row):
+                    yield position, row
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        with open(self.path, newline='', encoding=self.encoding) as file:
+            rows = csv.reader(file, delimiter=self.delimiter)
+            header = next(rows, None)
+            if header is None:
+                return
+            names, positions = self._projection(header)
+            test = None if self.where is None else self.where.compile(header, self.feature_dataclass)
+            if len(positions) == 0:
+                getter = lambda row: ()
+            elif len(positions) == 1:
+                getter = lambda row, position=positions[0]: (row[position],)
+            else:
+                getter = itemgetter(*positions)
+            for row in rows:
+                if len(row) != len(header):
+                    raise ValueError(f"Error: line {rows.line_num} of {self.path} has {len(row)} columns, "
+                                     + f"but the header has {len(header)}")
+                if test is None or test(row):
+                    yield dict(zip(names, getter(row)))
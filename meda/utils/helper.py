@@ -40,3 +40,19 @@ def string_to_numeric(string: str) -> Union[int, float, str]:
             return float(string.replace(',', '.').replace('>', '').replace('<', ''))
         except (TypeError, ValueError):
             return string
+
+
+def normalize_numeric(string: str, numeric_type: Union[Type[int], Type[float]]) -> str:
+    """
+    Prepares string for the conversion to numeric_type as done by the FeatureDataclassFactory: a single '<' or '>' is
+    dropped and a single decimal comma is replaced for floats.
+    """
+    if string.count('>') == 1:
+        string = string.replace('>', '')
+    elif string.count('<') == 1:
+        string = string.replace('<', '')
+
+    if numeric_type is float:
+        if string.count(',') == 1 and string.count('.') == 0:
+            string = string.replace(',', '.')
+    return string
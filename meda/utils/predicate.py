@@ -0,0 +1,229 @@
+import operator
+from datetime import date, datetime
+from typing import Any, Callable, Optional, Sequence, FrozenSet, Mapping, Union, Dict
+
+from meda.dataclass.dataclass import FeatureDataclassMeta, is_series_dataclass_ident
+from meda.utils.helper import normalize_numeric
+from meda.utils.regex_date_time import RegexDateTime
+
+_Getter = Callable[[Any], str]
+_Test = Callable[[Any], bool]
+_Types = Mapping[str, type]
+
+_operators = {'==': operator.eq,
+              '!=': operator.ne,
+              '<': operator.lt,
+              '<=': operator.le,
+              '>': operator.gt,
+              '>=': operator.ge}
+
+
+def _parser(value_type: type) -> Callable[[str], Any]:
+    """ The conversion of raw strings to value_type, shared with the FeatureDataclassFactory """
+    if value_type is datetime:
+        return RegexDateTime.extract_datetime
+    elif value_type is date:
+        return RegexDateTime.extract_date
+    elif value_type is int or value_type is float:
+        return lambda string: value_type(normalize_numeric(string, value_type))
+    elif value_type is str:
+        return str
+    raise TypeError(f"Error: no raw string parser for type {value_type}")
+
+
+def _is_numeric(value_type: type) -> bool:
+    return value_type is int or value_type is float
+
+
+def input_key_types(feature_dataclass: FeatureDataclassMeta) -> Dict[str, type]:
+    """
+    The value types of the input keys in the tree of feature_dataclass, which are read by a single feature without a
+    transformer and have a raw string parser, e.g. {'dose_1': float, 'visit_date': date}.
+    """
+    types: Dict[str, type] = {}
+
+    def visit(cls: FeatureDataclassMeta):
+        for field in cls.features:
+            type_info = field.type_info
+            if type_info.is_dataclass:
+                if not is_series_dataclass_ident(type_info.base_type):
+                    visit(type_info.base_type)
+            elif (field.input_key is None or field.has_transformer or field.temporary or field.depends_on
+                  or type_info.base_type not in (str, int, float, date, datetime)):
+                continue
+            elif isinstance(field.input_key, str):
+                types.setdefault(field.input_key, type_info.base_type)
+            else:
+                for _, data_key in field.input_key:
+                    types.setdefault(data_key, type_info.base_type)
+
+    visit(feature_dataclass)
+    return types
+
+
+class Predicate:
+    """
+    A filter on raw rows, evaluated on the input strings before any dataclass is generated. Predicates are created by
+    where and composed with &, | and ~:
+    >>> predicate = where('site', '==', 'S01') & (where('visit_date', '>=', date(2020, 1, 1)) | ~where('dose', '<', 5))
+    >>> predicate({'site': 'S01', 'visit_date': '01.02.2021', 'dose': '2'})
+    True
+
+    The strings of a column are only parsed if the column is referenced. A string which can not be parsed fails the
+    comparison, i.e. the row is dropped unless the comparison is negated. Columns are parsed to the type of the
+    compared value, numeric columns to float. Compiled for a feature_dataclass, the columns read by its features are
+    parsed to the type of the feature instead, as done by the FeatureDataclassFactory.
+    """
+
+    @property
+    def input_keys(self) -> FrozenSet[str]:
+        raise NotImplementedError()
+
+    def _compile(self, getter: Callable[[str], _Getter], types: _Types) -> _Test:
+        raise NotImplementedError()
+
+    def compile(self,
+                header: Optional[Sequence[str]] = None,
+                feature_dataclass: Optional[FeatureDataclassMeta] = None) -> _Test:
+        """
+        The test function of the predicate. With a header, it is evaluated on plain rows ordered like the header,
+        otherwise on data_dicts. With a feature_dataclass, the columns are parsed to the types of its features.
+        """
+        types = {} if feature_dataclass is None else input_key_types(feature_dataclass)
+        if header is None:
+            return self._compile(operator.itemgetter, types)
+        positions = {}
+        for position, column in enumerate(header):
+            positions.setdefault(column, position)
+        missing = sorted(self.input_keys - positions.keys())
+        if len(missing) > 0:
+            raise KeyError(f"Error: input keys {missing} of the predicate are missing in the header")
+        return self._compile(lambda key: operator.itemgetter(positions[key]), types)
+
+    def __call__(self, data_dict: Mapping[str, str]) -> bool:
+        return self.compile()(data_dict)
+
+    def __and__(self, other: 'Predicate') -> 'Predicate':
+        return _And(self, other)
+
+    def __or__(self, other: 'Predicate') -> 'Predicate':
+        return _Or(self, other)
+
+    def __invert__(self) -> 'Predicate':
+        return _Not(self)
+
+
+class _Comparison(Predicate):
+
+    def __init__(self, input_key: str, op: str, value: Any):
+        if op == 'in':
+            values = frozenset(value)
+            types = {type(item) for item in values}
+            if len(types) > 1 and not all(_is_numeric(t) for t in types):
+                raise TypeError(f"Error: the values of {input_key} in {values} should have a single type")
+            value_type = types.pop() if len(types) > 0 else str
+        elif op in _operators:
+            value_type = type(value)
+        else:
+            raise ValueError(f"Error: unknown operator {op}, expected one of {['in', *_operators]}")
+        # numeric values are compared to floats, such that the int literal 5 matches the raw string 4.5
+        self.value_type = float if _is_numeric(value_type) else value_type
+        # raises a TypeError for values without a raw string parser, e.g. bool
+        _parser(self.value_type)
+        self.input_key = input_key
+        self.op = op
+        self.value = values if op == 'in' else value
+
+    @property
+    def input_keys(self) -> FrozenSet[str]:
+        return frozenset({self.input_key})
+
+    def _parse_type(self, types: _Types) -> type:
+        """ The type of the feature reading the column if known, else the type of the compared value """
+        column_type = types.get(self.input_key)
+        if column_type is None or column_type is self.value_type:
+            return self.value_type
+        elif _is_numeric(column_type) and _is_numeric(self.value_type):
+            return column_type
+        raise TypeError(f"Error: the column {self.input_key} of type {column_type.__name__} can not be compared "
+                        + f"with {self.value_type.__name__} values")
+
+    def _compile(self, getter: Callable[[str], _Getter], types: _Types) -> _Test:
+        get = getter(self.input_key)
+        parse, value = _parser(self._parse_type(types)), self.value
+        if parse is str:
+            # raw string comparisons need no parsing
+            if self.op == 'in':
+                return lambda row: get(row) in value
+            compare = _operators[self.op]
+            return lambda row: compare(get(row), value)
+
+        compare = (lambda parsed, values: parsed in values) if self.op == 'in' else _operators[self.op]
+
+        def test(row: Any) -> bool:
+            try:
+                parsed = parse(get(row))
+            except Exception:
+                return False
+            return compare(parsed, value)
+        return test
+
+    def __repr__(self) -> str:
+        return f"where({self.input_key!r}, {self.op!r}, {self.value!r})"
+
+
+class _And(Predicate):
+
+    def __init__(self, left: Predicate, right: Predicate):
+        self.left = left
+        self.right = right
+
+    @property
+    def input_keys(self) -> FrozenSet[str]:
+        return self.left.input_keys | self.right.input_keys
+
+    def _compile(self, getter: Callable[[str], _Getter], types: _Types) -> _Test:
+        left, right = self.left._compile(getter, types), self.right._compile(getter, types)
+        return lambda row: left(row) and right(row)
+
+    def __repr__(self) -> str:
+        return f"({self.left!r} & {self.right!r})"
+
+
+class _Or(_And):
+
+    def _compile(self, getter: Callable[[str], _Getter], types: _Types) -> _Test:
+        left, right = self.left._compile(getter, types), self.right._compile(getter, types)
+        return lambda row: left(row) or right(row)
+
+    def __repr__(self) -> str:
+        return f"({self.left!r} | {self.right!r})"
+
+
+class _Not(Predicate):
+
+    def __init__(self, predicate: Predicate):
+        self.predicate = predicate
+
+    @property
+    def input_keys(self) -> FrozenSet[str]:
+        return self.predicate.input_keys
+
+    def _compile(self, getter: Callable[[str], _Getter], types: _Types) -> _Test:
+        test = self.predicate._compile(getter, types)
+        return lambda row: not test(row)
+
+    def __repr__(self) -> str:
+        return f"~{self.predicate!r}"
+
+
+def where(input_key: str, op: str, value: Union[Any, Sequence[Any]]) -> Predicate:
+    """
+    A comparison of the raw string of input_key with value. The raw string is parsed as done by the
+    FeatureDataclassFactory, to the type of value (str, date or datetime, float for int and float values) or to the
+    type of the feature reading the column, see Predicate.compile.
+    :param input_key: The data key of the column
+    :param op: One of '==', '!=', '<', '<=', '>', '>=' or 'in'
+    :param value: The value to compare with, a collection of values for 'in'
+    """
+    return _Comparison(input_key, op, value)
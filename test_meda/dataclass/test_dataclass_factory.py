@@ -0,0 +1,457 @@
+import gc
+import unittest
+import pickle
+import sys
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Optional, FrozenSet
+
+import numpy as np
+
+from meda.dataclass.dataclass import FeatureDataclass, UniqueCommonFeatureDataclass, HeadSeriesFeatureDataclass, \
+    required_input_keys
+from meda.dataclass.dataclass_factory import FeatureDataclassFactory
+from meda.dataclass.defaults import BooleanCases
+from meda.dataclass.feature import Feature
+from meda.dataclass.generation_error import ErrorKind
+
+boolean_cases = BooleanCases(true={'yes', '1'}, false={'no', '0'}, null={''})
+
+
+class Config(UniqueCommonFeatureDataclass):
+    threshold: float = Feature(input_key='threshold')
+    unit: str = Feature(input_key='unit')
+
+
+class Measurement(FeatureDataclass):
+    patient: str = Feature(input_key='patient', is_ident_field=True)
+    config: Config
+    value: float = Feature(input_key='value')
+    flag: Optional[bool] = Feature(input_key='flag', null_defaults=frozenset({''}))
+
+
+score_calls = []
+
+
+def score(answer: str) -> int:
+    score_calls.append(answer)
+    return {'never': 0, 'sometimes': 1, 'often': 2}[answer]
+
+
+class Questionnaire(FeatureDataclass):
+    patient: str = Feature(input_key='patient', is_ident_field=True)
+    score: Optional[int] = Feature(input_key=('answer',), transformer=score, pure_transformer=True,
+                                   transformer_cache_size=2)
+
+
+batch_calls = []
+
+
+def to_weight(values, units):
+    batch_calls.append(len(values))
+    weights = np.array([float(v) for v in values]) * np.array([{'kg': 1., 'g': 1e-3}[u] for u in units])
+    return weights, weights < 0
+
+
+class Weighing(FeatureDataclass):
+    patient: str = Feature(input_key='patient', is_ident_field=True)
+    weight: Optional[float] = Feature(input_key=('weight', 'unit'), batch_transformer=to_weight)
+
+
+def years_between(start: date, end: date) -> int:
+    return end.year - start.year - ((end.month, end.day) < (start.month, start.day))
+
+
+class Visit(FeatureDataclass):
+    patient: str = Feature(input_key='patient', is_ident_field=True)
+    age: Optional[int] = Feature(depends_on=('birth_date', 'visit_date'), transformer=years_between)
+    birth_date: date = Feature(input_key='birth_date')
+    visit_date: date = Feature(input_key='visit_date')
+
+
+class Dose(HeadSeriesFeatureDataclass):
+    amount: float = Feature(input_key=(('1', 'dose_1'), ('2', 'dose_2')))
+    unit: Optional[str] = Feature(input_key=(('1', 'unit_1'),), null_defaults=frozenset({''}))
+
+
+class Treatment(FeatureDataclass):
+    patient: str = Feature(input_key='patient', is_ident_field=True)
+    measurement: Measurement
+    doses: FrozenSet[Dose]
+    weight: Optional[float] = Feature(input_key=('weight', 'unit'), batch_transformer=to_weight)
+
+
+def yielding_int(value: str) -> int:
+    # releases the GIL in the middle of a generation
+    time.sleep(0)
+    return int(value)
+
+
+class YieldingDose(HeadSeriesFeatureDataclass):
+    amount: Optional[int] = Feature(input_key=(('1', ('dose_1',)), ('2', ('dose_2',))), transformer=yielding_int)
+
+
+class Yielding(FeatureDataclass):
+    patient: str = Feature(input_key='patient', is_ident_field=True)
+    doses: FrozenSet[YieldingDose]
+    value: Optional[int] = Feature(input_key=('value',), transformer=yielding_int)
+
+
+class Survey(FeatureDataclass):
+    patient: str = Feature(input_key='patient', is_ident_field=True)
+    smoker: bool = Feature(input_key='smoker')
+    drinker: Optional[bool] = Feature(input_key='drinker', null_defaults=frozenset({'n/a'}))
+    sex: Optional[str] = Feature(input_key='sex', code_map={'1': 'male', '2': 'female'}, null_defaults=frozenset({'9'}))
+
+
+def data_dict(patient: str, value: str = '1.5', threshold: str = '2.0', flag: str = 'yes'):
+    return {'patient': patient, 'value': value, 'threshold': threshold, 'unit': 'mg', 'flag': flag}
+
+
+class TestFeatureDataclassFactory(unittest.TestCase):
+
+    def test_generator(self):
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+        measurement, errors = factory.generator(feature_dataclass=Measurement, data_dict=data_dict('p1'))
+
+        self.assertIsNone(errors)
+        self.assertEqual(Measurement(patient='p1', config=Config(threshold=2., unit='mg'), value=1.5, flag=True),
+                         measurement)
+
+        measurement, errors = factory.generator(feature_dataclass=Measurement, data_dict=data_dict('p1', flag=''))
+        self.assertIsNone(measurement.flag)
+
+    def test_cached_hash(self):
+        config = Config(threshold=2., unit='mg')
+        self.assertEqual(hash(config), hash(Config(threshold=2., unit='mg')))
+        self.assertEqual(hash(config), hash(config))
+
+        # the cached hash is not part of the pickled state
+        self.assertNotIn(hash(config), config.__getstate__())
+        unpickled = pickle.loads(pickle.dumps(config))
+        self.assertEqual(config, unpickled)
+        self.assertEqual(hash(config), hash(unpickled))
+
+    def test_intern(self):
+        with self.subTest("without intern table"):
+            factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+            m1, _ = factory.generator(feature_dataclass=Measurement, data_dict=data_dict('p1'))
+            m2, _ = factory.generator(feature_dataclass=Measurement, data_dict=data_dict('p2'))
+            self.assertEqual(m1.config, m2.config)
+            self.assertIsNot(m1.config, m2.config)
+
+        with self.subTest("with intern table"):
+            factory = FeatureDataclassFactory(boolean_cases=boolean_cases, intern=True)
+            m1, _ = factory.generator(feature_dataclass=Measurement, data_dict=data_dict('p1'))
+            m2, _ = factory.generator(feature_dataclass=Measurement, data_dict=data_dict('p2'))
+            m3, _ = factory.generator(feature_dataclass=Measurement, data_dict=data_dict('p3', threshold='3'))
+            self.assertIs(m1.config, m2.config)
+            self.assertIsNot(m1.config, m3.config)
+
+            factory.clear_intern_table()
+            m4, _ = factory.generator(feature_dataclass=Measurement, data_dict=data_dict('p4'))
+            self.assertIsNot(m1.config, m4.config)
+
+    def test_pure_transformer(self):
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+        field = Questionnaire.features_by_name['score']
+        field.transformer_cache_clear()
+        score_calls.clear()
+
+        answers = ['never', 'often', 'never', 'often', 'sometimes', 'never']
+        results = [factory.generator(feature_dataclass=Questionnaire, data_dict={'patient': 'p', 'answer': a})[0]
+                   for a in answers]
+
+        self.assertEqual([0, 2, 0, 2, 1, 0], [r.score for r in results])
+        self.assertEqual(['never', 'often', 'sometimes', 'never'], score_calls)
+        hits, misses, maxsize, size = field.transformer_cache_info()
+        self.assertEqual((2, 4, 2, 2), (hits, misses, maxsize, size))
+
+        with self.subTest("errors are not cached"):
+            for _ in range(2):
+                result, errors = factory.generator(feature_dataclass=Questionnaire,
+                                                   data_dict={'patient': 'p', 'answer': 'always'})
+                self.assertIsNone(result)
+                self.assertEqual(str({'score': "Transformer failed for score with keys=('answer',) "
+                                               "and input=('always',)"}), errors)
+            self.assertEqual(['always', 'always'], score_calls[-2:])
+
+        with self.assertRaises(ValueError):
+            Feature(input_key=('answer',), pure_transformer=True)
+
+    def test_batch_transformer(self):
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+        rows = [{'patient': 'p1', 'weight': '70', 'unit': 'kg'},
+                {'patient': 'p2', 'weight': '-1', 'unit': 'kg'},
+                {'patient': 'p3', 'weight': '500', 'unit': 'g'}]
+
+        batch_calls.clear()
+        results = factory.batch_generator(feature_dataclass=Weighing, data_dicts=rows)
+        self.assertEqual([3], batch_calls)
+        self.assertEqual([factory.generator(feature_dataclass=Weighing, data_dict=row) for row in rows], results)
+        self.assertEqual(70., results[0][0].weight)
+        self.assertIsNone(results[1][0])
+        self.assertEqual(str({'weight': "Transformer failed for weight with keys=('weight', 'unit') "
+                                        "and input=('-1', 'kg')"}), results[1][1])
+        self.assertAlmostEqual(.5, results[2][0].weight)
+
+        with self.subTest("fall back to rows"):
+            batch_calls.clear()
+            results = factory.batch_generator(feature_dataclass=Weighing,
+                                              data_dicts=rows + [{'patient': 'p4', 'weight': '1', 'unit': 'lb'}])
+            self.assertEqual([4, 1, 1, 1, 1], batch_calls)
+            self.assertEqual([70., None, .5, None], [None if r is None else r.weight for r, _ in results])
+            self.assertIsNotNone(results[3][1])
+
+        with self.assertRaises(ValueError):
+            Feature(input_key=('weight', 'unit'), transformer=float, batch_transformer=to_weight)
+
+    def test_depends_on(self):
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+        visit, errors = factory.generator(feature_dataclass=Visit, data_dict={'patient': 'p1',
+                                                                              'birth_date': '1980-06-15',
+                                                                              'visit_date': '2020-06-14'})
+        self.assertIsNone(errors)
+        self.assertEqual(Visit(patient='p1', age=39, birth_date=date(1980, 6, 15), visit_date=date(2020, 6, 14)),
+                         visit)
+
+        # a failed dependency is recorded once, the derived field is not transformed
+        row = {'patient': 'p1', 'birth_date': 'unknown', 'visit_date': '2020-06-14'}
+        visit, errors = factory.generator(feature_dataclass=Visit, data_dict=row, render_errors=False)
+        self.assertIsNone(visit)
+        self.assertEqual([(('birth_date',), ErrorKind.INVALID_DATE)],
+                         [(record.path, record.kind) for record in errors.records()])
+        record = factory.lazy(Visit, row)
+        self.assertIsNone(record.age)
+        self.assertIsNone(record.field_error('age'))
+        self.assertEqual(ErrorKind.INVALID_DATE, record.field_error('birth_date').kind)
+
+    def test_required_input_keys(self):
+        keys = required_input_keys(Treatment)
+        self.assertEqual({'patient', 'value', 'threshold', 'unit', 'flag', 'dose_1', 'dose_2', 'unit_1', 'weight'},
+                         keys)
+
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+        row = {**data_dict('p1'), 'dose_1': '1.', 'dose_2': '2.', 'unit_1': 'mg', 'weight': '2', 'unit': 'kg'}
+        treatment, errors = factory.generator(feature_dataclass=Treatment,
+                                              data_dict={key: row[key] for key in keys})
+        self.assertIsNone(errors)
+        self.assertEqual(2, len(treatment.doses))
+
+    def test_bind(self):
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+        header = ['unused', 'flag', 'value', 'patient', 'unit', 'threshold']
+        bound = factory.bind(Measurement, header)
+
+        rows = [['x', 'yes', '1.5', 'p1', 'mg', '2.0'], ['x', '', '3', 'p2', 'mg', '2.0']]
+        for row in rows:
+            self.assertEqual(factory.generator(feature_dataclass=Measurement, data_dict=dict(zip(header, row))),
+                             bound.generator(row))
+        self.assertEqual([bound.generator(row) for row in rows], bound.batch_generator(rows))
+
+        with self.assertRaises(ValueError):
+            bound.generator(rows[0][1:])
+        with self.assertRaises(KeyError):
+            factory.bind(Measurement, header[1:-1])
+        with self.assertRaises(ValueError):
+            factory.bind(Measurement, header + ['value'])
+
+    def test_structured_errors(self):
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+        row = data_dict('p1', value='abc', threshold='x', flag='maybe')
+        _, errors_str = factory.generator(feature_dataclass=Measurement, data_dict=row)
+        _, errors = factory.generator(feature_dataclass=Measurement, data_dict=row, render_errors=False)
+
+        self.assertEqual(str({'config': str({'threshold': 'Invalid numeric: {threshold:x}'}),
+                              'value': 'Invalid numeric: {value:abc}',
+                              'flag': 'Unknown boolean: {flag:maybe}'}), errors_str)
+        self.assertEqual(errors_str, str(errors))
+        self.assertEqual([(('config', 'threshold'), ErrorKind.INVALID_NUMERIC, 'x'),
+                          (('value',), ErrorKind.INVALID_NUMERIC, 'abc'),
+                          (('flag',), ErrorKind.UNKNOWN_BOOLEAN, 'maybe')],
+                         [(record.path, record.kind, record.raw_value) for record in errors.records()])
+
+    def test_concurrent_generation(self):
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases, intern=True)
+        rows = [{'patient': f'p{i}', 'value': str(i) if i % 3 else f'x{i}',
+                 'dose_1': str(i) if i % 2 else f'x{i}', 'dose_2': str(i) if i % 5 else f'y{i}'} for i in range(200)]
+        expected = [FeatureDataclassFactory(boolean_cases=boolean_cases).generator(Yielding, row) for row in rows]
+
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                for _ in range(3):
+                    results = list(executor.map(lambda row: factory.generator(Yielding, row), rows))
+                    self.assertEqual(expected, results)
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+    def test_fall_back(self):
+        fall_back = FeatureDataclassFactory._dataclass_fall_back(Measurement)
+        self.assertIs(fall_back, FeatureDataclassFactory._dataclass_fall_back(Measurement))
+        self.assertIs(fall_back.config, FeatureDataclassFactory._dataclass_fall_back(Config))
+        self.assertEqual(FeatureDataclassFactory.value_fall_back[float], fall_back.value)
+        self.assertIsNone(fall_back.flag)
+
+        self.assertTrue(FeatureDataclassFactory.is_fall_back(fall_back))
+        self.assertTrue(FeatureDataclassFactory.is_fall_back(fall_back.config))
+        self.assertFalse(FeatureDataclassFactory.is_fall_back(Config(threshold=fall_back.config.threshold,
+                                                                     unit=fall_back.config.unit)))
+        self.assertFalse(FeatureDataclassFactory.is_fall_back(None))
+
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+        treatment, _ = factory.generator(Treatment, {'patient': 'p', 'threshold': '1', 'unit': 'kg', 'value': '2',
+                                                     'flag': '', 'dose_1': '1', 'unit_1': '', 'dose_2': '2',
+                                                     'weight': '70'})
+        self.assertIs(type(treatment.doses), type(FeatureDataclassFactory._dataclass_fall_back(Treatment).doses))
+
+        # classes of equal schema_fingerprint own distinct fall backs, which are released together with the class
+        def twin():
+            class Twin(UniqueCommonFeatureDataclass):
+                unit: str = Feature(input_key='unit')
+            return Twin
+        first, second = twin(), twin()
+        self.assertEqual(first, second)
+        self.assertIs(first, type(FeatureDataclassFactory._dataclass_fall_back(first)))
+        self.assertIs(second, type(FeatureDataclassFactory._dataclass_fall_back(second)))
+        self.assertTrue(FeatureDataclassFactory.is_fall_back(FeatureDataclassFactory._dataclass_fall_back(second)))
+        self.assertFalse(FeatureDataclassFactory.is_fall_back(second(unit='112358')))
+        ref = weakref.ref(first)
+        del first
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_decoder(self):
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+        survey, errors = factory.generator(Survey, {'patient': 'p', 'smoker': 'yes', 'drinker': '', 'sex': '2'})
+        self.assertIsNone(errors)
+        self.assertEqual(Survey(patient='p', smoker=True, drinker=None, sex='female'), survey)
+
+        survey, errors = factory.generator(Survey, {'patient': 'p', 'smoker': '', 'drinker': 'n/a', 'sex': '3'})
+        self.assertIsNone(survey)
+        self.assertEqual(str({'smoker': 'Unknown boolean: {smoker:}', 'sex': 'Unknown code: {sex:3}'}), errors)
+
+        decoder = factory.decoder(Survey.features_by_name['sex'])
+        self.assertIs(decoder, factory.decoder(Survey.features_by_name['sex']))
+        self.assertEqual((['male', None, None], [False, False, True]), decoder.map(['1', '9', '3']))
+
+        # the batched generation decodes whole columns
+        rows = [{'patient': 'p', 'smoker': smoker, 'drinker': drinker, 'sex': sex}
+                for smoker, drinker, sex in [('yes', '', '2'), ('', 'n/a', '3'), ('no', 'maybe', '9'), ('1', '0', '1')]]
+        self.assertEqual([factory.generator(Survey, row) for row in rows], factory.batch_generator(Survey, rows))
+
+        with self.assertRaises(TypeError):
+            class InvalidCodes(FeatureDataclass):
+                sex: str = Feature(input_key='sex', code_map={'1': 1})
+
+    def test_intern_strings(self):
+        class Answer(FeatureDataclass):
+            patient: str = Feature(input_key='patient', is_ident_field=True)
+            answer: str = Feature(input_key='answer')
+            center: str = Feature(input_key='center', intern_strings=True)
+            comment: str = Feature(input_key='comment', intern_strings=False)
+            visit: str = Feature(input_key='visit')
+
+        def generate(factory, i):
+            # join builds a fresh string object per row
+            row = {'patient': f'p{i}', 'answer': ''.join(['ne', 'ver']), 'center': ''.join(['c', str(i % 2)]),
+                   'comment': ''.join(['no', 'ne']), 'visit': f'v{i}'}
+            return factory.generator(Answer, row)[0]
+
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases, string_intern_limit=3)
+        answers = [generate(factory, i) for i in range(6)]
+        self.assertIs(answers[0].answer, answers[5].answer)
+        self.assertIs(answers[0].center, answers[4].center)
+        self.assertIsNot(answers[0].center, answers[1].center)
+        self.assertIsNot(answers[0].comment, answers[1].comment)
+        # the visit field exceeds the limit
+        self.assertIsNone(factory.decoder(Answer.features_by_name['visit']).string_limit)
+        self.assertEqual(3, factory.decoder(Answer.features_by_name['answer']).string_limit)
+
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+        answers = [generate(factory, i) for i in range(3)]
+        self.assertIsNot(answers[0].answer, answers[1].answer)
+        self.assertIs(answers[0].center, answers[2].center)
+
+        with self.assertRaises(TypeError):
+            class InvalidIntern(FeatureDataclass):
+                value: float = Feature(input_key='value', intern_strings=True)
+
+        with self.subTest("threads"):
+            factory = FeatureDataclassFactory(boolean_cases=boolean_cases, string_intern_limit=50)
+            switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-6)
+            try:
+                with ThreadPoolExecutor(max_workers=8) as executor:
+                    answers = list(executor.map(lambda i: generate(factory, i), range(400)))
+            finally:
+                sys.setswitchinterval(switch_interval)
+            decoder = factory.decoder(Answer.features_by_name['visit'])
+            self.assertIsNone(decoder.string_limit)
+            self.assertEqual(50, len(decoder.table))
+            self.assertEqual([f'v{i}' for i in range(400)], [answer.visit for answer in answers])
+            self.assertEqual('v', decoder.learn('v'))
+
+    def test_unique_common_memo(self):
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases, unique_common_memo_limit=2)
+        rows = [{'patient': f'p{i}', 'threshold': ['1.5', 'x', '2.5'][i % 3], 'unit': 'mg', 'value': str(i),
+                 'flag': ''} for i in range(9)]
+        expected = [FeatureDataclassFactory(boolean_cases=boolean_cases).generator(Measurement, row) for row in rows]
+        results = [factory.generator(Measurement, row) for row in rows]
+        self.assertEqual(expected, results)
+        self.assertIs(results[0][0].config, results[3][0].config)
+        # the errors of a failed config are replayed for each row
+        self.assertIsNone(results[4][0].config)
+        self.assertEqual(str({'config': str({'threshold': 'Invalid numeric: {threshold:x}'})}), results[4][1])
+        # the third distinct config exceeds the limit
+        self.assertIsNot(results[2][0].config, results[5][0].config)
+        self.assertEqual(2, len(factory._memo(Config, None).entries))
+
+        factory.clear_memo()
+        self.assertEqual(0, len(factory._memos))
+
+    def test_lazy(self):
+        factory = FeatureDataclassFactory(boolean_cases=boolean_cases)
+        row = {'patient': 'p', 'threshold': '1.5', 'unit': 'mg', 'value': 'abc', 'flag': 'yes'}
+        record = factory.lazy(Measurement, row)
+        self.assertTrue(record.flag)
+        self.assertEqual(['flag'], list(record._fields))
+        self.assertEqual(Config(threshold=1.5, unit='mg'), record.config)
+        self.assertEqual(FeatureDataclassFactory.value_fall_back[float], record.value)
+        self.assertEqual(ErrorKind.INVALID_NUMERIC, record.field_error('value').kind)
+        self.assertIsNone(record.field_error('config'))
+        self.assertEqual(factory.generator(Measurement, row), record.materialize())
+        with self.assertRaises(AttributeError):
+            record.unknown
+
+        record = factory.lazy(Visit, {'patient': 'p', 'birth_date': '2000-05-01', 'visit_date': '2020-04-30'})
+        self.assertEqual(19, record.age)
+        self.assertEqual({'age', 'birth_date', 'visit_date'}, set(record._fields))
+
+        bound = factory.bind(Yielding, ['patient', 'value', 'dose_1', 'dose_2'])
+        record = bound.lazy(['p', '3', '1', 'x'])
+        self.assertEqual(3, record.value)
+        self.assertEqual(bound.generator(['p', '3', '1', 'x']), record.materialize())
+
+        with self.subTest("materialize reuses generated fields"):
+            calls = []
+
+            def counted(value: str) -> int:
+                calls.append(value)
+                return int(value)
+
+            class Counted(FeatureDataclass):
+                patient: str = Feature(input_key='patient', is_ident_field=True)
+                value: int = Feature(input_key=('value',), transformer=counted)
+                other: int = Feature(input_key=('other',), transformer=counted)
+
+            record = factory.lazy(Counted, {'patient': 'p', 'value': '1', 'other': '2'})
+            self.assertEqual(1, record.value)
+            self.assertEqual((Counted(patient='p', value=1, other=2), None), record.materialize())
+            self.assertEqual(['1', '2'], calls)
+            self.assertEqual((Counted(patient='p', value=1, other=2), None), record.materialize())
+            self.assertEqual(2, record.other)
+            self.assertEqual(['1', '2'], calls)
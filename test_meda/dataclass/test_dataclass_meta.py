@@ -1,9 +1,10 @@
 import unittest
 import dataclasses
-from typing import Tuple
+from typing import Tuple, Optional, FrozenSet, Mapping, Any
 
-from meda.dataclass.dataclass import FeatureDataclass, get_feature
-from meda.dataclass.feature import Feature
+from meda.dataclass.dataclass import FeatureDataclass, HeadSeriesFeatureDataclass, UniqueCommonFeatureDataclass, \
+    get_feature, dynamic_series_ident, _stable_repr
+from meda.dataclass.feature import Feature, TypeCategory
 
 
 class SubClass(FeatureDataclass):
@@ -17,6 +18,19 @@ class ThisMustBePickleable(FeatureDataclass):
     foo: str = Feature(default='abc')
 
 
+class CompactClass(FeatureDataclass, compact=True):
+    bar: int = Feature(comment="m", input_key='')
+    foo: str = Feature(default='abc')
+
+
+class CompactSubClass(CompactClass):
+    key: float = Feature(temporary=True, default=None)
+
+
+class CompactSeries(HeadSeriesFeatureDataclass, compact=True):
+    value: float = Feature(input_key=(('s1', 'value_1'), ('s2', 'value_2')))
+
+
 class TestDataclassMeta(unittest.TestCase):
     def test_field_conversion(self):
         class SomeClass(FeatureDataclass):
@@ -150,3 +164,228 @@ class TestDataclassMeta(unittest.TestCase):
         u = UnitClass(foo=2)
 
         self.assertEqual('m', get_feature(type(u), 'foo').comment)
+
+    def test_compact(self):
+        import pickle
+
+        c = CompactClass(bar=1)
+        self.assertFalse(hasattr(c, '__dict__'))
+        self.assertEqual(c, CompactClass(bar=1, foo='abc'))
+        self.assertNotEqual(c, CompactClass(bar=2))
+        self.assertEqual(hash(c), hash(CompactClass(bar=1)))
+        self.assertEqual('m', get_feature(CompactClass, 'bar').comment)
+
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            c.bar = 2
+
+        with self.subTest("subclass"):
+            s = CompactSubClass(bar=1, key=2.)
+            self.assertFalse(hasattr(s, '__dict__'))
+            self.assertEqual({"bar", "foo", "key"}, {f.name for f in dataclasses.fields(CompactSubClass)})
+            self.assertEqual(s, pickle.loads(pickle.dumps(s)))
+
+        with self.subTest("pickle"):
+            t = pickle.loads(pickle.dumps(c))
+            self.assertEqual(c, t)
+            self.assertIs(type(c), type(t))
+
+        with self.subTest("series"):
+            s = CompactSeries(value=1., series_ident=dynamic_series_ident(cls_name='CompactSeriesIdent', ident='s1'))
+            self.assertFalse(hasattr(s, '__dict__'))
+            t = pickle.loads(pickle.dumps(s))
+            self.assertEqual(s, t)
+            self.assertEqual(s.series_ident, t.series_ident)
+
+    def test_legacy_pickle_state(self):
+        s = ThisMustBePickleable(subclass=SubClass(foo='baz'), bar=1, key=2.)
+        c = CompactClass(bar=1, foo='xyz')
+        with self.subTest("dict state"):
+            state = {'subclass': s.subclass, 'bar': 1, 'key': 2., 'foo': 'abc', '__meda_hash__': 42}
+            t = object.__new__(ThisMustBePickleable)
+            t.__setstate__(state)
+            self.assertEqual(s, t)
+            self.assertEqual(hash(s), hash(t))
+
+        with self.subTest("slots state"):
+            t = object.__new__(CompactClass)
+            t.__setstate__((None, {'bar': 1, 'foo': 'xyz'}))
+            self.assertEqual(c, t)
+
+        with self.subTest("positional state"):
+            t = object.__new__(CompactClass)
+            t.__setstate__([1, 'xyz'])
+            self.assertEqual(c, t)
+            with self.assertRaises(ValueError):
+                object.__new__(CompactClass).__setstate__([1])
+
+        with self.subTest("name-keyed state"):
+            # the state is restored by name, missing fields take their default
+            self.assertEqual({'bar': 1, 'foo': 'xyz'}, c.__getstate__())
+            t = object.__new__(CompactClass)
+            t.__setstate__({'bar': 1})
+            self.assertEqual(CompactClass(bar=1), t)
+            with self.assertRaises(ValueError):
+                object.__new__(CompactClass).__setstate__({'foo': 'xyz'})
+
+        with self.subTest("hash cache"):
+            hash(s)
+            self.assertNotIn('__meda_hash__', vars(s))
+            self.assertEqual({'subclass', 'bar', 'key', 'foo'}, set(vars(s)))
+
+    def test_schema_fingerprint(self):
+        class SomeClass(FeatureDataclass):
+            value: str = Feature(default='abc', comment='foo')
+
+        fingerprint = SomeClass.schema_fingerprint
+        self.assertEqual(64, len(fingerprint))
+
+        class SomeClass(FeatureDataclass):
+            value: str = Feature(default='abc', comment='foo')
+
+        self.assertEqual(fingerprint, SomeClass.schema_fingerprint)
+        self.assertEqual(hash(fingerprint), hash(SomeClass))
+
+        class SomeClass(FeatureDataclass):
+            value: str = Feature(default='abc', comment='bar')
+
+        self.assertNotEqual(fingerprint, SomeClass.schema_fingerprint)
+
+        with self.subTest("nested dataclass"):
+            class Inner(FeatureDataclass):
+                foo: str = 'bar'
+
+            class Outer(FeatureDataclass):
+                sub: Inner
+
+            fingerprint = Outer.schema_fingerprint
+
+            class Inner(FeatureDataclass):
+                foo: str = 'baz'
+
+            class Outer(FeatureDataclass):
+                sub: Inner
+
+            self.assertNotEqual(fingerprint, Outer.schema_fingerprint)
+
+    def test_schema_fingerprint_transformer(self):
+        import functools
+
+        def scaled(value, factor):
+            return float(value) * factor
+
+        def transformed(transformer, transformer_key=None):
+            class SomeClass(FeatureDataclass):
+                value: float = Feature(input_key=('value',), transformer=transformer, transformer_key=transformer_key)
+
+            return SomeClass
+
+        with self.subTest("partial"):
+            one, other = functools.partial(scaled, factor=1), functools.partial(scaled, factor=2)
+            self.assertEqual(transformed(one), transformed(one))
+            self.assertNotEqual(transformed(one), transformed(other))
+            self.assertNotEqual(hash(transformed(one)), hash(transformed(other)))
+
+        with self.subTest("lambda"):
+            # the transformer body is not part of the fingerprint, lambdas are told apart by their transformer_key
+            one, other = (lambda v: float(v)), (lambda v: float(v) * 2)
+            self.assertEqual(transformed(one), transformed(other))
+            self.assertEqual(transformed(one, 'v1'), transformed(other, 'v1'))
+            self.assertNotEqual(transformed(one, 'v1'), transformed(other, 'v2'))
+            self.assertNotEqual(hash(transformed(one, 'v1')), hash(transformed(other, 'v2')))
+
+        with self.subTest("helper defined later"):
+            class Later(FeatureDataclass):
+                value: float = Feature(input_key=('value',), transformer=lambda v: helper(v))
+
+            def helper(value):
+                return float(value)
+
+            self.assertEqual(64, len(Later.schema_fingerprint))
+
+        with self.subTest("default repr"):
+            class Marker:
+                pass
+
+            class WithMarker(FeatureDataclass):
+                value: Any = Feature(input_key='', default=Marker(), temporary=True)
+
+            self.assertNotIn(' at 0x', _stable_repr(Marker()))
+            fingerprint = WithMarker.schema_fingerprint
+
+            class WithMarker(FeatureDataclass):
+                value: Any = Feature(input_key='', default=Marker(), temporary=True)
+
+            self.assertEqual(fingerprint, WithMarker.schema_fingerprint)
+
+    def test_type_info(self):
+        class Config(UniqueCommonFeatureDataclass):
+            value: float = Feature(input_key='')
+
+        class SomeClass(FeatureDataclass):
+            config: Optional[Config]
+            series: FrozenSet[CompactSeries]
+            sub: SubClass
+            number: Optional[int] = Feature(input_key='', null_defaults=frozenset())
+            json: Mapping[str, Any] = Feature(input_key='')
+            temp: Any = Feature(temporary=True)
+
+        infos = {name: field.type_info for name, field in SomeClass.features_by_name.items()}
+
+        self.assertEqual((Config, True, None, TypeCategory.UNIQUE_COMMON),
+                         (infos['config'].base_type, infos['config'].optional, infos['config'].container,
+                          infos['config'].category))
+        self.assertEqual((CompactSeries, False, frozenset, TypeCategory.HEAD_SERIES),
+                         (infos['series'].base_type, infos['series'].optional, infos['series'].container,
+                          infos['series'].category))
+        self.assertEqual(TypeCategory.FEATURE_DATACLASS, infos['sub'].category)
+        self.assertEqual((int, True, TypeCategory.BASE),
+                         (infos['number'].base_type, infos['number'].optional, infos['number'].category))
+        self.assertEqual(TypeCategory.JSON, infos['json'].category)
+        self.assertEqual(TypeCategory.OTHER, infos['temp'].category)
+        self.assertTrue(infos['series'].is_series)
+        self.assertTrue(infos['config'].is_unique_common)
+        self.assertTrue(infos['sub'].is_dataclass)
+        self.assertFalse(infos['number'].is_dataclass)
+
+        self.assertIs(SomeClass.features_by_name['number'], get_feature(SomeClass, 'number'))
+        with self.assertRaises(KeyError):
+            get_feature(SomeClass, 'unknown')
+
+    def test_cached_type_info(self):
+        from typing import Literal
+        from meda.dataclass.dataclass import _cached_type_info, is_feature_dataclass_meta
+
+        def define():
+            class Twin(FeatureDataclass):
+                value: float = Feature(input_key='')
+
+            return Twin
+
+        one, other = define(), define()
+        self.assertEqual(one, other)
+        self.assertIs(one, _cached_type_info(one).base_type)
+        self.assertIs(other, _cached_type_info(other).base_type)
+
+        self.assertFalse(is_feature_dataclass_meta(Literal[[1]]))
+        self.assertEqual(TypeCategory.OTHER, _cached_type_info(Literal[[1]]).category)
+
+    def test_generation_order(self):
+        class Derived(FeatureDataclass):
+            total: int = Feature(depends_on=('a', 'b'), transformer=lambda a, b: a + b)
+            a: int = Feature(input_key='a')
+            double: int = Feature(depends_on=('total',), transformer=lambda t: 2 * t)
+            b: int = Feature(input_key='b')
+
+        self.assertEqual(['a', 'b', 'total', 'double'], [field.name for field in Derived.generation_order])
+
+        with self.assertRaises(ValueError):
+            class Cyclic(FeatureDataclass):
+                a: int = Feature(depends_on=('b',), transformer=int)
+                b: int = Feature(depends_on=('a',), transformer=int)
+
+        with self.assertRaises(KeyError):
+            class Unknown(FeatureDataclass):
+                a: int = Feature(depends_on=('b',), transformer=int)
+
+        with self.assertRaises(ValueError):
+            Feature(input_key=('a',), depends_on=('b',), transformer=int)
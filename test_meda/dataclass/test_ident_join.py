@@ -0,0 +1,49 @@
+import unittest
+from typing import Optional
+
+from meda.dataclass.dataclass import FeatureDataclass
+from meda.dataclass.feature import Feature
+from meda.dataclass.ident_join import IdentJoin
+
+
+class Record(FeatureDataclass):
+    patient: str = Feature(input_key='patient', is_ident_field=True)
+    sex: Optional[str] = Feature(input_key='sex', null_defaults=frozenset({''}))
+    creatinine: Optional[float] = Feature(input_key='creatinine', null_defaults=frozenset({''}))
+    drug: Optional[str] = Feature(input_key='drug', null_defaults=frozenset({''}))
+
+
+class TestIdentJoin(unittest.TestCase):
+
+    def setUp(self):
+        self.demographics = [{'patient': f'p{i:02d}', 'sex': 'female'} for i in range(0, 30)]
+        self.labs = [{'patient': f'p{i:02d}', 'creatinine': str(i)} for i in range(0, 30, 2)]
+        self.medication = [{'patient': f'p{i:02d}', 'drug': 'tolvaptan'} for i in range(0, 30, 3)]
+        self.inner = [{'patient': f'p{i:02d}', 'sex': 'female', 'creatinine': str(i), 'drug': 'tolvaptan'}
+                      for i in range(0, 30, 6)]
+
+    def test_merge_join(self):
+        join = IdentJoin(Record, presorted=True)
+        self.assertEqual(self.inner, list(join(self.demographics, self.labs, self.medication)))
+        self.assertEqual(3, join.peak_rows)
+
+        outer = list(IdentJoin(Record, presorted=True, how='outer')(self.labs, self.medication))
+        self.assertEqual(20, len(outer))
+        self.assertEqual({'patient': 'p03', 'sex': '', 'creatinine': '', 'drug': 'tolvaptan'}, outer[2])
+
+        with self.assertRaises(ValueError):
+            list(join(self.demographics[::-1], self.labs))
+
+    def test_hash_join(self):
+        sources = (self.demographics[::-1], self.labs, self.medication[::-1])
+        join = IdentJoin(Record)
+        self.assertEqual(self.inner, sorted(join(*sources), key=lambda data_dict: data_dict['patient']))
+        self.assertEqual(0, join.spilled_rows)
+
+        join = IdentJoin(Record, max_rows=10, partitions=4)
+        self.assertEqual(self.inner, sorted(join(*sources), key=lambda data_dict: data_dict['patient']))
+        self.assertEqual(55, join.spilled_rows)
+        self.assertLess(join.peak_rows, 55)
+
+        with self.assertRaises(ValueError):
+            list(join(self.labs, self.labs[:1] + self.labs))
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import unittest
+from typing import Optional, FrozenSet
+
+from meda.dataclass.dataclass import FeatureDataclass, HeadSeriesFeatureDataclass
+from meda.dataclass.dataclass_factory import FeatureDataclassFactory
+from meda.dataclass.defaults import BooleanCases
+from meda.dataclass.feature import Feature
+from meda.dataclass.long_format import LongFormatPivot, series_data_keys
+
+
+class Lab(HeadSeriesFeatureDataclass):
+    creatinine: Optional[float] = Feature(input_key=(('1', 'crea_1'), ('2', 'crea_2')), null_defaults=frozenset({''}))
+    sodium: Optional[float] = Feature(input_key=(('1', ('na_1',)), ('2', ('na_2',))), transformer=float)
+
+
+class Patient(FeatureDataclass):
+    patient: str = Feature(input_key='patient', is_ident_field=True)
+    sex: Optional[str] = Feature(input_key='sex', null_defaults=frozenset({''}))
+    labs: FrozenSet[Lab]
+
+
+class TestLongFormatPivot(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = [{'id': 'p2', 'visit': '1', 'parameter': 'creatinine', 'value': '1.1'},
+                     {'id': 'p1', 'visit': '2', 'parameter': 'creatinine', 'value': '0.9'},
+                     {'id': 'p1', 'visit': '', 'parameter': 'sex', 'value': 'female'},
+                     {'id': 'p2', 'visit': '1', 'parameter': 'sodium', 'value': '140'},
+                     {'id': 'p1', 'visit': '2', 'parameter': 'sodium', 'value': '138'},
+                     {'id': 'p1', 'visit': '2', 'parameter': 'creatinine', 'value': '1.0'}]
+        self.rows = [{**row, 'patient': row['id']} for row in self.rows]
+
+    def test_series_data_keys(self):
+        self.assertEqual({('1', 'creatinine'): 'crea_1', ('2', 'creatinine'): 'crea_2',
+                          ('1', 'sodium'): 'na_1', ('2', 'sodium'): 'na_2'}, series_data_keys(Patient))
+
+        class Urine(HeadSeriesFeatureDataclass):
+            creatinine: Optional[float] = Feature(input_key=(('1', 'urine_crea_1'),), null_defaults=frozenset({''}))
+
+        class UrinePatient(FeatureDataclass):
+            patient: str = Feature(input_key='patient', is_ident_field=True)
+            labs: FrozenSet[Lab]
+            urines: FrozenSet[Urine]
+
+        with self.assertRaises(ValueError):
+            series_data_keys(UrinePatient)
+
+    def test_pivot(self):
+        expected = [{'patient': 'p1', 'sex': 'female', 'crea_1': '', 'crea_2': '1.0', 'na_1': '', 'na_2': '138'},
+                    {'patient': 'p2', 'sex': '', 'crea_1': '1.1', 'crea_2': '', 'na_1': '140', 'na_2': ''}]
+        pivot = LongFormatPivot(Patient, slot_key='visit', measurement_key='parameter', value_key='value')
+        self.assertEqual(expected, list(pivot(self.rows)))
+
+        with tempfile.TemporaryDirectory() as directory:
+            pivot = LongFormatPivot(Patient, slot_key='visit', measurement_key='parameter', value_key='value',
+                                    max_rows=2, directory=directory)
+            data_dicts = pivot(self.rows)
+            self.assertEqual(expected[0], next(data_dicts))
+            self.assertEqual(3, len(os.listdir(directory)))
+            self.assertEqual(expected[1:], list(data_dicts))
+            self.assertEqual([], os.listdir(directory))
+
+        factory = FeatureDataclassFactory(BooleanCases(true={'1'}, false={'0'}, null={''}))
+        patient, errors = factory.generator(Patient, expected[1])
+        self.assertEqual([(1.1, 140.0)], [(lab.creatinine, lab.sodium) for lab in patient.labs])
+
+        with self.assertRaises(KeyError):
+            list(pivot([{'patient': 'p1', 'visit': '3', 'parameter': 'creatinine', 'value': '1'}]))
@@ -42,3 +42,14 @@ class TestSeriesDataclassIdent(unittest.TestCase):
         self.assertEqual(ident_cls.__name__, 'Test')
         self.assertEqual(ident, pickle.loads(pickle.dumps(ident)))
         self.assertTrue(pickle.loads(pickle.dumps(ident)).__eq__(ident))
+
+    def test_class_cache(self):
+        from test_meda.dataclass.test_dataclass_factory import Dose
+
+        ident_cls = Dose.features_by_name['series_ident'].type_info.base_type
+        self.assertIs(ident_cls, dynamic_series_ident_cls(cls_name='DoseIdent'))
+        ident = ident_cls(series_ident='1')
+        self.assertIs(ident_cls, type(pickle.loads(pickle.dumps(ident))))
+
+        idents = pickle.loads(pickle.dumps([dynamic_series_ident(cls_name='Test', ident=str(i)) for i in range(3)]))
+        self.assertEqual(1, len({type(ident) for ident in idents}))
@@ -1,14 +1,18 @@
 import datetime
+import os
+import tempfile
 from typing import Optional, FrozenSet, Any, Mapping
 
 import numpy
-from sqlalchemy import Table, BigInteger, Column, Integer, String, MetaData
+from sqlalchemy import Table, BigInteger, Column, Integer, String, MetaData, func, event
 from meda.dataclass.dataclass import FeatureDataclass, UniqueCommonFeatureDataclass, \
     HeadSeriesFeatureDataclass, ExternMixin
 from meda.dataclass.dataclass_factory import FeatureDataclassFactory
 from meda.dataclass.defaults import BooleanCases
 from meda.dataclass.feature import Feature
+from meda.storage.sql.checkpoint import Checkpoint
 from meda.storage.sql.dto.dto_registry import DTORegistry
+from meda.utils.csv_reader import CsvReader
 from test_meda.storage.sql.dto import TestDTORegistryMixIn
 
 
@@ -477,3 +481,247 @@ class TestDTORegistry(TestDTORegistryMixIn):
         session.close()
 
         self.registry.metadata(PicklableAssessment).drop_all(bind=self.engine)
+
+    def test_chunked_write(self):
+        self.registry.register(feature_dataclass_cls=SubAssessment1,
+                               parent_table=(self.RootDTO.__table__, False))
+        self.registry.metadata(SubAssessment1).create_all(bind=self.engine, checkfirst=True)
+
+        configs = [SubConfig(min=0., max=1.), SubConfig(min=0., max=2.)]
+        assessments = (SubAssessment1(config=configs[i % 2], value=float(i)) for i in range(50))
+
+        session = self.sessionmaker()
+        written = self.registry.write(session=session, feature_dataclasses=assessments, chunk_size=7,
+                                      parent_ident=self.parent_ident)
+        self.assertEqual(written, 50)
+        self.assertTrue(session.expire_on_commit)
+
+        # only the unique common config DTOs remain in the session
+        self.assertEqual(len(session.identity_map), 2)
+        self.assertEqual(set(session.identity_map.values()), set(session._unique_cache.values()))
+
+        AssessmentDTO = self.registry[SubAssessment1]
+        ConfigDTO = AssessmentDTO._common_unique_dtos['config']
+        self.assertEqual(session.query(AssessmentDTO).count(), 50)
+        self.assertEqual(session.query(ConfigDTO).count(), 2)
+        self.assertEqual({dto.to_domain() for dto in session.query(AssessmentDTO)},
+                         {SubAssessment1(config=configs[i % 2], value=float(i)) for i in range(50)})
+
+        with self.assertRaises(ValueError):
+            self.registry.write(session=session, feature_dataclasses=[], chunk_size=0)
+
+        session.close()
+        self.registry.metadata(SubAssessment1).drop_all(bind=self.engine)
+
+    def test_unique_cache_bound(self):
+        self.registry.register(feature_dataclass_cls=SubAssessment1,
+                               parent_table=(self.RootDTO.__table__, False))
+        self.registry.metadata(SubAssessment1).create_all(bind=self.engine, checkfirst=True)
+
+        # 30 distinct configs, each used twice, with at most 5 cached configs
+        assessments = [SubAssessment1(config=SubConfig(min=0., max=float(i % 30)), value=float(i)) for i in range(60)]
+        session = self.sessionmaker()
+        written = self.registry.write(session=session, feature_dataclasses=assessments, chunk_size=4,
+                                      parent_ident=self.parent_ident, unique_cache_size=5)
+        self.assertEqual(60, written)
+        self.assertEqual(5, len(session._unique_cache))
+        self.assertEqual(5, len(session.identity_map))
+
+        # evicted configs are queried again instead of inserted twice
+        AssessmentDTO = self.registry[SubAssessment1]
+        self.assertEqual(30, session.query(AssessmentDTO._common_unique_dtos['config']).count())
+        self.assertEqual(set(assessments), {dto.to_domain() for dto in session.query(AssessmentDTO)})
+
+        with self.assertRaises(ValueError):
+            self.registry.write(session=session, feature_dataclasses=[], unique_cache_size=-1)
+
+        session.close()
+        self.registry.metadata(SubAssessment1).drop_all(bind=self.engine)
+
+    def test_resumable_write(self):
+        self.registry.register(feature_dataclass_cls=SubAssessment1,
+                               parent_table=(self.RootDTO.__table__, False))
+        metadata = self.registry.metadata(SubAssessment1)
+        checkpoint = Checkpoint('sub_assessments', metadata)
+        metadata.create_all(bind=self.engine, checkfirst=True)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'source.csv')
+            with open(path, 'w', newline='') as file:
+                file.write('min,max,value\n' + ''.join(f'0,{i % 2 + 1},{i}\n' for i in range(30)))
+
+            def records(offset, fail_at=None):
+                for offset, (min_, max_, value) in CsvReader(path).records(offset):
+                    if value == fail_at:
+                        raise RuntimeError('Error: the source failed')
+                    # odd rows are dropped, but advance the offset
+                    assessment = SubAssessment1(config=SubConfig(min=float(min_), max=float(max_)), value=float(value))
+                    yield offset, assessment if int(value) % 2 == 0 else None
+
+            session = self.sessionmaker()
+            with self.assertRaises(RuntimeError):
+                self.registry.write_resumable(session=session, checkpoint=checkpoint, chunk_size=4,
+                                              records=records(checkpoint.load(session).offset, fail_at='17'),
+                                              parent_ident=self.parent_ident)
+            session.rollback()
+            state = checkpoint.load(session)
+            self.assertEqual((4, 8), (state.batch, state.rows))
+
+            written = self.registry.write_resumable(session=session, checkpoint=checkpoint, chunk_size=4,
+                                                    records=records(state.offset), parent_ident=self.parent_ident)
+            self.assertEqual(7, written)
+            self.assertEqual((8, os.path.getsize(path), 15), tuple(checkpoint.load(session)))
+
+        AssessmentDTO = self.registry[SubAssessment1]
+        self.assertEqual(list(range(0, 30, 2)),
+                         sorted(int(dto.value) for dto in session.query(AssessmentDTO)))
+        session.close()
+        metadata.drop_all(bind=self.engine)
+
+    def test_lookup_table(self):
+        class LabResult(FeatureDataclass):
+            value: float = Feature(input_key='')
+            unit: str = Feature(input_key='', lookup_table=True)
+            center: Optional[str] = Feature(input_key='', lookup_table=True, null_defaults=frozenset())
+
+        self.registry.register(feature_dataclass_cls=LabResult,
+                               parent_table=(self.RootDTO.__table__, False))
+        self.assertIn('lab_result_unit_lookup', self.registry.all_tables.keys())
+        self.registry.metadata(LabResult).create_all(bind=self.engine, checkfirst=True)
+
+        results = [LabResult(value=float(i), unit=['mg', 'g'][i % 2], center=[None, 'c1', 'c2'][i % 3])
+                   for i in range(20)]
+        session = self.sessionmaker()
+        self.registry.write(session=session, feature_dataclasses=results, chunk_size=6,
+                            parent_ident=self.parent_ident)
+
+        ResultDTO = self.registry[LabResult]
+        UnitDTO = ResultDTO._lookup_dtos['unit']
+        self.assertEqual({'mg', 'g'}, {dto.value for dto in session.query(UnitDTO)})
+        self.assertEqual(results, sorted([dto.to_domain() for dto in session.query(ResultDTO)],
+                                         key=lambda result: result.value))
+        self.assertEqual(10, session.query(ResultDTO).filter(ResultDTO.unit_value == 'mg').count())
+        self.assertEqual({'mg': 10, 'g': 10},
+                         dict(session.query(UnitDTO.value, func.count(ResultDTO.ident))
+                              .join(ResultDTO.unit_dto).group_by(UnitDTO.value).all()))
+
+        # without session the lookup DTOs are shared by the calls given the same lookups dict
+        lookups = {}
+        dtos = [ResultDTO.from_domain(domain=LabResult(value=float(i), unit='kg', center=None), lookups=lookups)
+                for i in range(3)]
+        self.assertEqual(1, len({id(dto.unit_dto) for dto in dtos}))
+        for dto in dtos:
+            dto.parent = self.parent_ident
+        session.add_all(dtos)
+        session.commit()
+        self.assertEqual(1, session.query(UnitDTO).filter(UnitDTO.value == 'kg').count())
+
+        with self.assertRaises(ValueError):
+            Feature(input_key='', lookup_table=True, is_ident_field=True)
+
+        class UniqueLabResult(FeatureDataclass):
+            unit: str = Feature(input_key='', lookup_table=True, unique_index=True)
+
+        with self.assertRaises(TypeError):
+            DTORegistry().register(feature_dataclass_cls=UniqueLabResult)
+
+        class UniqueLabConfig(UniqueCommonFeatureDataclass):
+            unit: str = Feature(input_key='', lookup_table=True)
+
+        class LabAssessment(FeatureDataclass):
+            config: UniqueLabConfig
+
+        with self.assertRaises(TypeError):
+            DTORegistry().register(feature_dataclass_cls=LabAssessment)
+
+        session.close()
+        self.registry.metadata(LabResult).drop_all(bind=self.engine)
+
+    def test_get(self):
+        class PatientReading(HeadSeriesFeatureDataclass):
+            value: float = Feature(input_key=(('1', 'value_1'), ('2', 'value_2')))
+
+        class PatientVisit(FeatureDataclass):
+            config: SubConfig
+            value: float = Feature(input_key='')
+
+        class Patient(FeatureDataclass):
+            patient: str = Feature(input_key='', is_ident_field=True)
+            unit: str = Feature(input_key='', lookup_table=True)
+            visit: Optional[PatientVisit]
+            readings: FrozenSet[PatientReading]
+
+        registry = DTORegistry(cache_size=2)
+        registry.register(feature_dataclass_cls=Patient, parent_table=(self.RootDTO.__table__, False))
+        registry.metadata(Patient).create_all(bind=self.engine, checkfirst=True)
+        PatientDTO = registry[Patient]
+        self.assertTrue(any(index.columns.keys() == ['patient'] for index in PatientDTO.table().indexes))
+
+        def patient(ident, value):
+            return Patient(patient=ident, unit='mg',
+                           visit=PatientVisit(config=SubConfig(min=0., max=value), value=value),
+                           readings=frozenset({PatientReading(value=value), PatientReading(value=value + 1.)}))
+
+        session = self.sessionmaker()
+        registry.write(session=session, feature_dataclasses=[patient(f'p{i}', float(i)) for i in range(3)],
+                       parent_ident=self.parent_ident)
+        session.close()
+
+        statements = []
+
+        def count(connection, cursor, statement, *args):
+            statements.append(statement)
+
+        def get(ident):
+            statements.clear()
+            session = self.sessionmaker()
+            domain = registry.get(session, Patient, ident)
+            session.close()
+            return domain
+
+        event.listen(self.engine, 'before_cursor_execute', count)
+        with self.subTest("miss"):
+            # the whole tree is loaded by a single query
+            self.assertEqual(patient('p1', 1.), get('p1'))
+            self.assertEqual(1, len(statements))
+            self.assertIsNone(get('p9'))
+            self.assertEqual(1, len(statements))
+
+        with self.subTest("hit"):
+            cached = get('p1')
+            self.assertEqual([], statements)
+            self.assertIs(cached, get('p1'))
+            get('p0')
+            get('p2')
+            # the least recently used root is evicted
+            self.assertEqual([(Patient, 'p0'), (Patient, 'p2')], list(registry._cache.keys()))
+
+        with self.subTest("invalidation"):
+            registry.invalidate(Patient, 'p0')
+            self.assertEqual([(Patient, 'p2')], list(registry._cache.keys()))
+            get('p0')
+            self.assertEqual(1, len(statements))
+            registry.invalidate(Patient)
+            self.assertEqual(0, len(registry._cache))
+
+            # an invalidation during the query discards the result
+            def invalidate(*args):
+                registry.invalidate()
+
+            event.listen(self.engine, 'before_cursor_execute', invalidate)
+            self.assertEqual(patient('p1', 1.), get('p1'))
+            self.assertEqual(0, len(registry._cache))
+            event.remove(self.engine, 'before_cursor_execute', invalidate)
+
+        with self.subTest("duplicate ident"):
+            # the write of a cached ident invalidates its entry and the latest written row is returned
+            self.assertEqual(patient('p1', 1.), get('p1'))
+            session = self.sessionmaker()
+            registry.write(session=session, feature_dataclasses=[patient('p1', 5.)], parent_ident=self.parent_ident)
+            self.assertEqual(2, session.query(PatientDTO).filter(PatientDTO.patient == 'p1').count())
+            session.close()
+            self.assertEqual(patient('p1', 5.), get('p1'))
+            self.assertEqual(1, len(statements))
+
+        event.remove(self.engine, 'before_cursor_execute', count)
+        registry.metadata(Patient).drop_all(bind=self.engine)
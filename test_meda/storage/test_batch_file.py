@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta
+from typing import Optional, FrozenSet, Mapping, Any
+
+from meda.dataclass.dataclass import FeatureDataclass, UniqueCommonFeatureDataclass, HeadSeriesFeatureDataclass
+from meda.dataclass.dataclass_factory import FeatureDataclassFactory
+from meda.dataclass.defaults import BooleanCases
+from meda.dataclass.feature import Feature
+from meda.storage.batch_file import write_batch, BatchReader
+
+
+class Device(UniqueCommonFeatureDataclass):
+    name: str = Feature(input_key='device')
+    serial: bytes = Feature(input_key='')
+    calibrated: datetime = Feature(input_key='')
+    interval: timedelta = Feature(input_key='')
+    settings: Mapping[str, Any] = Feature()
+
+
+class Reading(HeadSeriesFeatureDataclass):
+    value: float = Feature(input_key=(('1', 'value_1'), ('2', 'value_2')))
+
+
+class Examination(FeatureDataclass):
+    patient: str = Feature(input_key='patient', is_ident_field=True)
+    device: Optional[Device]
+    readings: FrozenSet[Reading]
+    day: Optional[date] = Feature(input_key='day', null_defaults=frozenset({''}))
+    count: int = Feature(input_key='count')
+    fasting: Optional[bool] = Feature(input_key='fasting', null_defaults=frozenset({''}))
+
+
+class TestBatchFile(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._directory.name, 'batch.meda')
+        devices = [Device(name=f'd{i}', serial=bytes([i]), calibrated=datetime(2020, 1, i + 1, 12, 30, 1, 5),
+                          interval=timedelta(days=i, seconds=3), settings={'gain': i}) for i in range(2)]
+        factory = FeatureDataclassFactory(BooleanCases(true={'1'}, false={'0'}, null={''}))
+        self.examinations = [
+            Examination(patient=f'p{i}', device=devices[i % 2] if i % 3 else None,
+                        readings=tuple(factory._generator(Reading, {'value_1': str(i), 'value_2': '0.5'}, key)
+                                       for key in ['1', '2'][:i % 3]),
+                        day=date(2021, 3, i + 1) if i % 2 else None, count=i * 2 ** 40, fasting=[True, False, None][i % 3])
+            for i in range(10)]
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_round_trip(self):
+        write_batch(self.path, Examination, self.examinations)
+        with BatchReader(self.path, Examination) as reader:
+            self.assertEqual(10, len(reader))
+            self.assertEqual(self.examinations[3], reader[3])
+            self.assertEqual(self.examinations, list(reader))
+            # shared instances are rebuilt once
+            self.assertIs(reader[1].device, reader[7].device)
+            # root rows are not cached
+            self.assertIsNot(reader[3], reader[3])
+            self.assertNotIn('Examination', {name for name, _ in reader._instances})
+            self.assertEqual(type(self.examinations[0].readings), type(reader[0].readings))
+
+    def test_schema_fingerprint(self):
+        write_batch(self.path, Examination, self.examinations)
+
+        class Device(UniqueCommonFeatureDataclass):
+            name: str = Feature(input_key='device')
+
+        class Examination2(FeatureDataclass):
+            device: Optional[Device]
+
+        with self.assertRaises(ValueError):
+            BatchReader(self.path, Examination2)
+
+        with self.assertRaises(TypeError):
+            write_batch(self.path, Examination, [self.examinations[0].device])
@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from meda.utils.csv_reader import CsvReader
+from meda.utils.predicate import where
+
+
+class TestCsvReader(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._directory.name, 'source.csv')
+        with open(self.path, 'w', newline='') as file:
+            file.write('a,b,c,d\n1,2,3,4\n5,"6,7",8,9\n')
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def test_read(self):
+        reader = CsvReader(self.path)
+        self.assertEqual(('a', 'b', 'c', 'd'), reader.header)
+        self.assertEqual([{'a': '1', 'b': '2', 'c': '3', 'd': '4'}, {'a': '5', 'b': '6,7', 'c': '8', 'd': '9'}],
+                         list(reader))
+
+    def test_projection(self):
+        self.assertEqual([{'b': '2', 'd': '4'}, {'b': '6,7', 'd': '9'}], list(CsvReader(self.path, columns={'d', 'b'})))
+        self.assertEqual([{'c': '3'}, {'c': '8'}], list(CsvReader(self.path, columns=['c'])))
+
+        with self.assertRaises(KeyError):
+            list(CsvReader(self.path, columns={'a', 'e'}))
+
+    def test_rows(self):
+        self.assertEqual([['1', '2', '3', '4'], ['5', '6,7', '8', '9']], list(CsvReader(self.path).rows()))
+
+    def test_where(self):
+        reader = CsvReader(self.path, columns={'a'}, where=where('d', '>', 5) | where('b', '==', '2'))
+        self.assertEqual([{'a': '1'}, {'a': '5'}], list(reader))
+        reader = CsvReader(self.path, where=where('c', 'in', [8]))
+        self.assertEqual([['5', '6,7', '8', '9']], list(reader.rows()))
+        self.assertEqual([{'a': '5', 'b': '6,7', 'c': '8', 'd': '9'}], list(reader))
+
+    def test_records(self):
+        records = list(CsvReader(self.path).records())
+        self.assertEqual([['1', '2', '3', '4'], ['5', '6,7', '8', '9']], [row for _, row in records])
+        self.assertEqual(os.path.getsize(self.path), records[-1][0])
+        self.assertEqual(records[1:], list(CsvReader(self.path).records(records[0][0])))
+        self.assertEqual([], list(CsvReader(self.path).records(records[-1][0])))
+
+        with self.assertRaises(ValueError):
+            next(CsvReader(self.path, encoding='utf-16').records())
@@ -1,6 +1,6 @@
 import unittest
 
-from meda.utils.helper import camel_to_snake, numeric_type_of_string, string_to_numeric
+from meda.utils.helper import camel_to_snake, numeric_type_of_string, string_to_numeric, normalize_numeric
 
 
 class TestHelpers(unittest.TestCase):
@@ -25,3 +25,9 @@ class TestHelpers(unittest.TestCase):
         self.assertEqual(2.34, string_to_numeric('2,34'))
         self.assertEqual('2,,34', string_to_numeric('2,,34'))
         self.assertEqual('2,.34', string_to_numeric('2,.34'))
+
+    def test_normalize_numeric(self):
+        self.assertEqual('2.34', normalize_numeric('2,34', float))
+        self.assertEqual('2,34', normalize_numeric('2,34', int))
+        self.assertEqual('4', normalize_numeric('<4', int))
+        self.assertEqual('<<4', normalize_numeric('<<4', int))
@@ -0,0 +1,80 @@
+import unittest
+from datetime import date
+from typing import FrozenSet
+
+from meda.dataclass.dataclass import FeatureDataclass, HeadSeriesFeatureDataclass
+from meda.dataclass.feature import Feature
+from meda.utils.predicate import where, input_key_types
+
+
+class Dose(HeadSeriesFeatureDataclass):
+    amount: float = Feature(input_key=(('1', 'dose_1'), ('2', 'dose_2')))
+
+
+class Visit(FeatureDataclass):
+    site: str = Feature(input_key='site')
+    count: int = Feature(input_key='count')
+    visit: date = Feature(input_key='visit')
+    doses: FrozenSet[Dose]
+
+
+class TestPredicate(unittest.TestCase):
+
+    def test_comparison(self):
+        self.assertTrue(where('site', '==', 'S01')({'site': 'S01'}))
+        self.assertFalse(where('site', '!=', 'S01')({'site': 'S01'}))
+        self.assertTrue(where('site', 'in', ['S01', 'S02'])({'site': 'S02'}))
+        self.assertTrue(where('dose', '<', 5)({'dose': '<4'}))
+        self.assertTrue(where('weight', '>=', 70.5)({'weight': '70,5'}))
+        self.assertTrue(where('visit', '>', date(2020, 1, 1))({'visit': '02.01.2020'}))
+        self.assertTrue(where('visit', 'in', {date(2020, 1, 1)})({'visit': '2020-01-01'}))
+
+        # strings which can not be parsed fail the comparison
+        self.assertFalse(where('dose', '<', 5)({'dose': 'n/a'}))
+        self.assertTrue((~where('dose', '<', 5))({'dose': 'n/a'}))
+
+        with self.assertRaises(ValueError):
+            where('dose', '~', 5)
+        with self.assertRaises(TypeError):
+            where('dose', 'in', [1, 'a'])
+
+    def test_numeric(self):
+        # int and float values compare numerically with int and float strings
+        self.assertTrue(where('value', '>', 0)({'value': '0.8'}))
+        self.assertTrue(where('value', '<', 5)({'value': '4.5'}))
+        self.assertFalse(where('value', '<', 4.5)({'value': '5'}))
+        self.assertTrue(where('value', '==', 5)({'value': '5.0'}))
+        self.assertTrue(where('value', 'in', [1, 2.5])({'value': '2,5'}))
+        self.assertTrue(where('value', 'in', [1, 2.5])({'value': '1'}))
+
+    def test_compile_feature_dataclass(self):
+        self.assertEqual({'site': str, 'count': int, 'visit': date, 'dose_1': float, 'dose_2': float},
+                         input_key_types(Visit))
+
+        # the column parser follows the feature type, an int column does not accept floats like the factory
+        test = where('count', '<', 5.5).compile(feature_dataclass=Visit)
+        self.assertTrue(test({'count': '5'}))
+        self.assertFalse(test({'count': '4.5'}))
+        test = (where('dose_1', '>', 0) & where('visit', '>=', date(2020, 1, 1))).compile(['visit', 'dose_1'], Visit)
+        self.assertTrue(test(['01.01.2020', '0.8']))
+        self.assertFalse(test(['01.01.2019', '0.8']))
+
+        with self.assertRaises(TypeError):
+            where('site', '<', 5).compile(feature_dataclass=Visit)
+
+    def test_compose(self):
+        predicate = where('site', '==', 'S01') & (where('dose', '>', 5) | ~where('visit', '<', date(2020, 1, 1)))
+        self.assertEqual(frozenset({'site', 'dose', 'visit'}), predicate.input_keys)
+        self.assertTrue(predicate({'site': 'S01', 'dose': '6', 'visit': '01.01.2019'}))
+        self.assertTrue(predicate({'site': 'S01', 'dose': '1', 'visit': '01.01.2021'}))
+        self.assertFalse(predicate({'site': 'S01', 'dose': '1', 'visit': '01.01.2019'}))
+        self.assertFalse(predicate({'site': 'S02', 'dose': '6', 'visit': '01.01.2021'}))
+
+    def test_compile_header(self):
+        predicate = where('site', '==', 'S01') | where('dose', '>', 5)
+        test = predicate.compile(['dose', 'other', 'site'])
+        self.assertEqual([['1', 'x', 'S01'], ['9', 'x', 'S02']],
+                         list(filter(test, [['1', 'x', 'S01'], ['9', 'x', 'S02'], ['1', 'x', 'S02']])))
+
+        with self.assertRaises(KeyError):
+            predicate.compile(['dose', 'other'])